@@ -1,5 +1,13 @@
-from .adapter import ASGIAdapter
+from .adapter import ASGI3Adapter, ASGIAdapter
 from .conn import Conn, ConnWithWS, ConnType, WSState
 from .plug import Plug
 
-__all__ = ["ASGIAdapter", "Conn", "Plug", "ConnWithWS", "ConnType", "WSState"]
+__all__ = [
+    "ASGIAdapter",
+    "ASGI3Adapter",
+    "Conn",
+    "Plug",
+    "ConnWithWS",
+    "ConnType",
+    "WSState",
+]
@@ -0,0 +1,55 @@
+import argparse
+
+from .supervisor import SERVERS, Supervisor, SupervisorConfig
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m PythonPlug", description="Run an ASGI app in worker processes"
+    )
+    parser.add_argument("app", help="the app to serve, as module:attribute")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--server",
+        default="uvicorn",
+        help=f"one of {', '.join(sorted(SERVERS))}, or a module:Runner class",
+    )
+    parser.add_argument(
+        "--no-preload",
+        dest="preload",
+        action="store_false",
+        help="import the app in each worker instead of before forking",
+    )
+    parser.add_argument(
+        "--reuse-port",
+        action="store_true",
+        help="bind one SO_REUSEPORT socket per worker instead of sharing one",
+    )
+    parser.add_argument("--max-requests", type=int)
+    parser.add_argument("--max-requests-jitter", type=int, default=0)
+    parser.add_argument("--max-rss", type=int, help="recycle workers above (KiB)")
+    parser.add_argument("--graceful-timeout", type=float, default=30.0)
+    parser.add_argument("--reload-delay", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    config = SupervisorConfig(
+        args.app,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        server=args.server,
+        preload=args.preload,
+        reuse_port=args.reuse_port,
+        max_requests=args.max_requests,
+        max_requests_jitter=args.max_requests_jitter,
+        max_rss_kib=args.max_rss,
+        graceful_timeout=args.graceful_timeout,
+        reload_delay=args.reload_delay,
+    )
+    Supervisor(config).run()
+
+
+if __name__ == "__main__":
+    main()
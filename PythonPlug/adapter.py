@@ -1,19 +1,91 @@
-from typing import Optional
+from typing import TYPE_CHECKING, Awaitable, Callable, List, Optional
 
 from .conn import ConnWithWS
+from .exception import PythonPlugRuntimeError
 from .typing import CoroutineFunction
 
+if TYPE_CHECKING:
+    from .memory import AllocationTracker
+    from .tracing import Tracer
+
 
 # pylint: disable=too-few-public-methods
 class ASGIAdapter:
     """
     Converts a plug to an ASGI Application
+
+    ``timeout`` sets a deadline for every HTTP request; websocket sessions
+    are long lived and are not limited by it. With ``watch_disconnect``
+    a background task reads the ASGI messages for the plug and cancels it as
+    soon as the client disconnects; body chunks the plug has not read yet are
+    buffered meanwhile.
+
+    ``lifespan`` scopes run the coroutine functions registered with
+    ``on_startup`` and ``on_shutdown`` instead of the plug.
+
+    With a ``tracer`` (see ``PythonPlug.tracing``) sampled requests get a
+    root span, with child spans for plugs and routes. An
+    ``allocation_tracker`` (see ``PythonPlug.memory``) attributes memory to
+    plugs and routes on sampled requests.
     """
 
     ConnClass = ConnWithWS
 
-    def __init__(self, plug: CoroutineFunction) -> None:
+    # the last conn is kept as ``adapter.conn`` for tests and debugging
+    keep_conn = True
+
+    def __init__(
+        self,
+        plug: CoroutineFunction,
+        *,
+        timeout: Optional[float] = None,
+        watch_disconnect: bool = False,
+        tracer: Optional["Tracer"] = None,
+        allocation_tracker: Optional["AllocationTracker"] = None,
+    ) -> None:
         self.plug = plug
+        self.timeout = timeout
+        self.watch_disconnect = watch_disconnect
+        self.tracer = tracer
+        self.allocation_tracker = allocation_tracker
+        self.startup_handlers: List[Callable[[], Awaitable]] = []
+        self.shutdown_handlers: List[Callable[[], Awaitable]] = []
+
+    def on_startup(self, handler: Callable[[], Awaitable]):
+        self.startup_handlers.append(handler)
+        return handler
+
+    def on_shutdown(self, handler: Callable[[], Awaitable]):
+        self.shutdown_handlers.append(handler)
+        return handler
+
+    async def startup(self):
+        for handler in self.startup_handlers:
+            await handler()
+
+    async def shutdown(self):
+        # shut down in reverse order of startup
+        for handler in reversed(self.shutdown_handlers):
+            await handler()
+
+    async def lifespan(self, receive: CoroutineFunction, send: CoroutineFunction):
+        while True:
+            message = await receive()
+            message_type = message.get("type")
+            if message_type == "lifespan.startup":
+                step = self.startup
+            elif message_type == "lifespan.shutdown":
+                step = self.shutdown
+            else:
+                continue
+            try:
+                await step()
+            except Exception as e:  # pylint: disable=broad-except
+                await send({"type": f"{message_type}.failed", "message": repr(e)})
+                return
+            await send({"type": f"{message_type}.complete"})
+            if message_type == "lifespan.shutdown":
+                return
 
     def __call__(
         self,
@@ -37,7 +109,125 @@ class ASGIAdapter:
             send: CoroutineFunction,
             interface=ConnWithWS.ASGI2,
         ):
-            conn = self.adapter.ConnClass(scope=self.scope, receive=receive, send=send)
+            # deadlines and the disconnect watcher need asyncio, which is only
+            # imported once a request comes in
+            # pylint: disable=import-outside-toplevel
+            import asyncio
+
+            from .deadline import call_with_deadline
+
+            adapter = self.adapter
+            if self.scope.get("type") == "lifespan":
+                return await adapter.lifespan(receive, send)
+            watch = adapter.watch_disconnect and self.scope.get("type") == "http"
+            # unbounded, so the watcher keeps reading up to the disconnect
+            # even when the plug does not consume the body
+            queue: Optional[asyncio.Queue] = asyncio.Queue() if watch else None
+            conn = adapter.ConnClass(
+                scope=self.scope, receive=queue.get if watch else receive, send=send
+            )
             conn.interface = interface
-            await self.adapter.plug(conn)
-            self.adapter.conn = conn
+            if adapter.timeout is not None and self.scope.get("type") == "http":
+                conn.set_timeout(adapter.timeout)
+            span = conn.span = (
+                adapter.tracer.start_request(
+                    self.scope, conn.req_headers.get("traceparent")
+                )
+                if adapter.tracer is not None
+                else None
+            )
+            tracker = adapter.allocation_tracker
+            sampled = tracker is not None and tracker.start_request(conn)
+            try:
+                if watch:
+                    await self.run_watched(conn, receive, queue)
+                else:
+                    await call_with_deadline(conn, adapter.plug)
+            except BaseException as e:
+                if span is not None:
+                    span.error = repr(e)
+                raise
+            finally:
+                await conn.cleanup()
+                if span is not None:
+                    span.attributes["status"] = conn.status
+                    span.attributes["endpoint"] = conn.private.get("endpoint")
+                    span.finish()
+                if sampled:
+                    tracker.finish_request(conn)
+            if adapter.keep_conn:
+                adapter.conn = conn
+
+        async def run_watched(self, conn, receive, queue):
+            # pylint: disable=import-outside-toplevel
+            import asyncio
+
+            from .deadline import call_with_deadline
+
+            handler = asyncio.ensure_future(call_with_deadline(conn, self.adapter.plug))
+            watcher = asyncio.ensure_future(
+                self.watch_disconnect(conn, receive, queue, handler)
+            )
+            try:
+                await handler
+            except asyncio.CancelledError:
+                if not conn.client_disconnected:
+                    raise
+            finally:
+                watcher.cancel()
+                handler.cancel()
+
+        @staticmethod
+        async def watch_disconnect(conn, receive, queue, handler):
+            while True:
+                message = await receive()
+                if message.get("type") == "http.disconnect":
+                    conn.client_disconnected = True
+                    handler.cancel()
+                    return
+                queue.put_nowait(message)
+
+
+class ASGI3Adapter(ASGIAdapter):
+    """
+    ASGI 3 only adapter: ``__call__`` is itself the application coroutine,
+    so no handler object is built per request. Requests that need a
+    disconnect watcher, tracing or allocation tracking take the
+    ``ASGIHandler`` path. ``conn`` is not kept: the adapter is shared by
+    concurrent requests.
+    """
+
+    keep_conn = False
+
+    # ASGI 3 servers call the application with all three arguments, so the
+    # ASGI 2 form of the parent's __call__ is deliberately not supported
+    # pylint: disable=invalid-overridden-method,signature-differs
+    async def __call__(
+        self, scope: dict, receive: CoroutineFunction, send: CoroutineFunction
+    ):
+        scope_type = scope["type"]
+        if scope_type == "lifespan":
+            return await self.lifespan(receive, send)
+        if scope_type not in ("http", "websocket"):
+            raise PythonPlugRuntimeError(f"Unsupported ASGI scope type: {scope_type}")
+        if (
+            self.tracer is not None
+            or self.allocation_tracker is not None
+            or (self.watch_disconnect and scope_type == "http")
+        ):
+            handler = self.ASGIHandler(scope, self)
+            return await handler(receive, send, interface=ConnWithWS.ASGI3)
+        conn = self.ConnClass(scope=scope, receive=receive, send=send)
+        conn.interface = ConnWithWS.ASGI3
+        try:
+            if self.timeout is None or scope_type != "http":
+                await self.plug(conn)
+            else:
+                from .deadline import (  # pylint: disable=import-outside-toplevel
+                    call_with_deadline,
+                )
+
+                conn.set_timeout(self.timeout)
+                await call_with_deadline(conn, self.plug)
+        finally:
+            await conn.cleanup()
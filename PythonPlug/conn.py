@@ -1,22 +1,66 @@
+import time
 from enum import Enum
 from http import HTTPStatus
-from http.cookies import SimpleCookie
 from operator import itemgetter
-from typing import List, Optional, Union, ByteString
-from urllib.parse import parse_qsl
+from typing import TYPE_CHECKING, List, Optional, Union, ByteString
+from urllib.parse import parse_qsl, unquote_plus
 
-from multidict import CIMultiDict
+from multidict import CIMultiDict, MultiDict
 
 from .exception import HTTPRequestError, HTTPStateError, PythonPlugRuntimeError
 from .typing import CoroutineFunction
 
+if TYPE_CHECKING:
+    from http.cookies import SimpleCookie  # pylint: disable=ungrouped-imports
+
+# conn.private key of the [plug, start, end] traced memory of sampled requests,
+# set by PythonPlug.memory.AllocationTracker
+ALLOCATIONS_KEY = "allocations"
+
+_TRUTHY_VALUES = frozenset(["1", "true", "yes", "on"])
+_FALSY_VALUES = frozenset(["0", "false", "no", "off"])
+
+
+def _scan_query_string(query_string: bytes, key: str) -> Optional[str]:
+    """
+    Finds the first value of ``key`` in a raw query string without parsing
+    the whole string. Only the matching pair is decoded.
+    """
+    raw_key = key.encode("utf-8")
+    length = len(query_string)
+    start = 0
+    while start < length:
+        end = query_string.find(b"&", start)
+        if end == -1:
+            end = length
+        name, sep, value = query_string[start:end].partition(b"=")
+        start = end + 1
+        if b"%" in name or b"+" in name:
+            if unquote_plus(name.decode("utf-8")) != key:
+                continue
+        elif name != raw_key:
+            continue
+        if not sep or not value:
+            # parse_qsl drops blank values, so do we
+            continue
+        return unquote_plus(value.decode("utf-8"))
+    return None
+
+
+def _new_cookie() -> "SimpleCookie":
+    # http.cookies is only imported by conns that use cookies
+    from http.cookies import SimpleCookie  # pylint: disable=import-outside-toplevel
+
+    return SimpleCookie()
+
 
 class ConnType(Enum):
     ws = "websocket"
     http = "http"
 
 
-class Conn:  # pylint: disable=too-many-instance-attributes
+# Conn is the one object plugs work with, so its API is wide by design
+class Conn:  # pylint: disable=too-many-instance-attributes,too-many-public-methods
 
     ASGI2 = "ASGI2"
     ASGI3 = "ASGI3"
@@ -35,20 +79,28 @@ class Conn:  # pylint: disable=too-many-instance-attributes
         # request fields
         self._scope = scope
         self._req_headers: Optional[CIMultiDict] = None
-        self._req_cookies: SimpleCookie = SimpleCookie()
+        self._req_cookies: Optional["SimpleCookie"] = None
+        self._query_params: Optional[MultiDict] = None
         self.http_body = b""
         self.http_has_more_body = True
         self.http_received_body_length = 0
+        self.http_body_retained = True
 
         # response fields
         self.resp_charset: str = "utf-8"
-        self.resp_cookies: SimpleCookie = SimpleCookie()
+        self._resp_cookies: Optional["SimpleCookie"] = None
         self.resp_headers: CIMultiDict = CIMultiDict()
         self.status: Union[int, HTTPStatus] = 0
+        self.resp_body_length: int = 0
+        self.resp_trailers: Optional[CIMultiDict] = None
 
         # conn fields
         self.halted: bool = False
         self.started: bool = False
+        self.deadline: Optional[float] = None  # time.monotonic() based
+        self.client_disconnected: bool = False
+        self.span = None  # set by the adapter when the request is traced
+        self.plug_timings: Optional[list] = None  # [name, start, end] per plug
 
         # private fields
         self.private: dict = {}
@@ -57,6 +109,8 @@ class Conn:  # pylint: disable=too-many-instance-attributes
         self._after_start: List[CoroutineFunction] = []
         self._before_send: List[CoroutineFunction] = []
         self._after_send: List[CoroutineFunction] = []
+        self._before_trailers: List[CoroutineFunction] = []
+        self._cleanup: List[CoroutineFunction] = []
 
         # meta
         self.interface = Conn.ASGI2  # ASGI2, ASGI3
@@ -73,8 +127,9 @@ class Conn:  # pylint: disable=too-many-instance-attributes
         return self._req_headers
 
     @property
-    def req_cookies(self) -> SimpleCookie:
-        if not self._req_headers:
+    def req_cookies(self) -> "SimpleCookie":
+        if self._req_cookies is None:
+            self._req_cookies = _new_cookie()
             self._req_cookies.load(self.req_headers.get("cookie", {}))
         return self._req_cookies
 
@@ -82,6 +137,16 @@ class Conn:  # pylint: disable=too-many-instance-attributes
     def req_cookies_dict(self):
         return {key: m.value for key, m in self.req_cookies.items()}
 
+    @property
+    def resp_cookies(self) -> "SimpleCookie":
+        if self._resp_cookies is None:
+            self._resp_cookies = _new_cookie()
+        return self._resp_cookies
+
+    @resp_cookies.setter
+    def resp_cookies(self, cookies: "SimpleCookie"):
+        self._resp_cookies = cookies
+
     @property
     def scope(self):
         return self._scope
@@ -91,15 +156,72 @@ class Conn:  # pylint: disable=too-many-instance-attributes
         return ConnType.ws if self.scope.get("type") == "websocket" else ConnType.http
 
     @property
-    def query_params(self):
-        return CIMultiDict(
-            parse_qsl(self.scope.get("query_string", b"").decode("utf-8"))
-        )
+    def query_params(self) -> MultiDict:
+        if self._query_params is None:
+            self._query_params = MultiDict(
+                parse_qsl(self.scope.get("query_string", b"").decode("utf-8"))
+            )
+        return self._query_params
+
+    def query_param(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        if self._query_params is not None:
+            return self._query_params.get(key, default)
+        value = _scan_query_string(self.scope.get("query_string", b""), key)
+        return default if value is None else value
+
+    def query_int(self, key: str, default: Optional[int] = None) -> Optional[int]:
+        value = self.query_param(key)
+        if value is None:
+            return default
+        try:
+            return int(value)
+        except ValueError as exc:
+            raise HTTPRequestError(f"Query parameter {key} is not an integer") from exc
+
+    def query_bool(self, key: str, default: bool = False) -> bool:
+        value = self.query_param(key)
+        if value is None:
+            return default
+        value = value.lower()
+        if value in _TRUTHY_VALUES:
+            return True
+        if value in _FALSY_VALUES:
+            return False
+        raise HTTPRequestError(f"Query parameter {key} is not a boolean")
+
+    def query_list(self, key: str) -> List[str]:
+        return self.query_params.getall(key, [])
+
+    def set_timeout(self, seconds: float):
+        """
+        Sets a deadline ``seconds`` from now. An earlier deadline is kept.
+        """
+        deadline = time.monotonic() + seconds
+        if self.deadline is None or deadline < self.deadline:
+            self.deadline = deadline
+        return self
+
+    def time_remaining(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
 
     async def send(self, message, *args, **kwargs):
         if not self._send:
             raise HTTPStateError("Conn is not plugged.")
+        if self._before_send:
+            for callback in self._before_send:
+                await callback(self, message)
         await self._send(message, *args, **kwargs)
+        if message.get("type") == "http.response.body":
+            self.resp_body_length += len(message.get("body", b""))
+        if self.span is not None:
+            self.span.add_event(
+                message.get("type"),
+                status=message.get("status"),
+                bytes=len(message.get("body") or b""),
+                more_body=message.get("more_body", False),
+            )
         if not self.started and message.get("type") == "http.response.start":
             self.started = True
             for callback in self._after_start:
@@ -110,6 +232,8 @@ class Conn:  # pylint: disable=too-many-instance-attributes
             and message.get("more_body", False) is False
         ):
             self.halted = True
+            if self.resp_trailers is not None:
+                await self.send_trailers()
             for callback in self._after_send:
                 await callback(self)
         return self
@@ -119,12 +243,18 @@ class Conn:  # pylint: disable=too-many-instance-attributes
             raise HTTPStateError("Conn is not plugged.")
         return await self._receive()
 
-    async def body_iter(self):
+    async def body_iter(self, retain: bool = True):
+        """
+        Iterates over request body chunks. With ``retain=False`` chunks are not
+        kept on the conn, so the body can only be consumed once.
+        """
         if not self.type == ConnType.http:
             raise HTTPRequestError("Conn.type is not HTTP")
         if self.http_received_body_length > 0 and self.http_has_more_body:
             raise HTTPStateError("body iter is already started and is not finished")
         if self.http_received_body_length > 0 and not self.http_has_more_body:
+            if not self.http_body_retained:
+                raise HTTPStateError("body was consumed without being retained")
             yield self.http_body
         req_body_length = (
             int(self.req_headers.get("content-length", "0"))
@@ -142,7 +272,10 @@ class Conn:  # pylint: disable=too-many-instance-attributes
             chunk = message.get("body", b"")
             if not isinstance(chunk, bytes):
                 raise PythonPlugRuntimeError("Chunk is not bytes")
-            self.http_body += chunk
+            if retain:
+                self.http_body += chunk
+            else:
+                self.http_body_retained = False
             self.http_has_more_body = message.get("more_body", False) or False
             self.http_received_body_length += len(chunk)
             yield chunk
@@ -194,12 +327,52 @@ class Conn:  # pylint: disable=too-many-instance-attributes
         headers = [
             [k.encode("ascii"), v.encode("ascii")] for k, v in self.resp_headers.items()
         ]
-        for value in self.resp_cookies.values():
+        for value in (self._resp_cookies or {}).values():
             headers.append([b"Set-Cookie", value.OutputString().encode("ascii")])
+        message = {
+            "type": "http.response.start",
+            "status": self.status,
+            "headers": headers,
+        }
+        if self.resp_trailers is not None:
+            message["trailers"] = True
+        await self.send(message)
+        return self
+
+    def enable_trailers(self, *names: str) -> bool:
+        """
+        Announces trailers ``names`` to be sent after the body, when the
+        server advertises the ``http.response.trailers`` extension. Must be
+        called before the response starts. Returns whether trailers are on.
+        """
+        if self.started or not self.has_extension("http.response.trailers"):
+            return False
+        if self.resp_trailers is None:
+            self.resp_trailers = CIMultiDict()
+        if names:
+            self.put_resp_header("trailer", ", ".join(names))
+        return True
+
+    def put_resp_trailer(self, key, value):
+        if self.resp_trailers is None:
+            raise HTTPStateError("Trailers are not enabled")
+        self.resp_trailers.add(key, value)
+        return self
+
+    async def send_trailers(self):
+        for callback in self._before_trailers:
+            await callback(self)
+        headers = [
+            [k.encode("ascii"), v.encode("ascii")]
+            for k, v in self.resp_trailers.items()
+        ]
         await self.send(
-            {"type": "http.response.start", "status": self.status, "headers": headers}
+            {
+                "type": "http.response.trailers",
+                "headers": headers,
+                "more_trailers": False,
+            }
         )
-        return self
 
     async def halt(self):
         if self.halted:
@@ -218,6 +391,43 @@ class Conn:  # pylint: disable=too-many-instance-attributes
         await self.send_resp(body, halt=True)
         return self
 
+    def has_extension(self, name: str) -> bool:
+        return name in (self._scope.get("extensions") or {})
+
+    async def push(self, path: str, headers: Optional[List[tuple]] = None) -> bool:
+        """
+        Sends an HTTP/2 server push for ``path`` when the server advertises
+        the ``http.response.push`` extension. Returns whether it was sent.
+        """
+        if self.halted or not self.has_extension("http.response.push"):
+            return False
+        await self.send(
+            {
+                "type": "http.response.push",
+                "path": path,
+                "headers": [
+                    [k.encode("ascii"), v.encode("ascii")] for k, v in headers or []
+                ],
+            }
+        )
+        return True
+
+    async def send_early_hints(self, links: List[str]) -> bool:
+        """
+        Sends a 103 Early Hints response with ``links`` (``link`` header
+        values) when the server advertises the ``http.response.early_hint``
+        extension. Only possible before the response started.
+        """
+        if self.started or not self.has_extension("http.response.early_hint"):
+            return False
+        await self.send(
+            {
+                "type": "http.response.early_hint",
+                "links": [link.encode("ascii") for link in links],
+            }
+        )
+        return True
+
     async def call_asgi_app(self, asgi_app, interface=None):
         interface = interface or self.interface
         if interface == Conn.ASGI2:
@@ -226,12 +436,38 @@ class Conn:  # pylint: disable=too-many-instance-attributes
             await asgi_app(self.scope, self.receive, self.send)
         return self
 
+    def register_before_send(self, callback):
+        """
+        Registers ``callback(conn, message)``, awaited before every ASGI
+        message is sent.
+        """
+        self._before_send.append(callback)
+
+    def register_before_trailers(self, callback):
+        """
+        Registers a callback awaited right before the trailers are sent, the
+        last chance to ``put_resp_trailer``.
+        """
+        self._before_trailers.append(callback)
+
     def register_after_send(self, callback):
         self._after_send.append(callback)
 
     def register_after_start(self, callback):
         self._after_start.append(callback)
 
+    def register_cleanup(self, callback):
+        """
+        Registers a callback that the adapter runs once the plug returned or
+        raised, whether or not a response was sent.
+        """
+        self._cleanup.append(callback)
+
+    async def cleanup(self):
+        callbacks, self._cleanup = self._cleanup, []
+        for callback in reversed(callbacks):
+            await callback(self)
+
     def __getattr__(self, name):
         try:
             return itemgetter(name)(self.private)
@@ -0,0 +1,307 @@
+import re
+import tempfile
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from multidict import CIMultiDict, MultiDict
+
+from PythonPlug.conn import Conn
+from PythonPlug.exception import HTTPRequestError, RequestBodyTooLarge
+
+MULTIPART = "multipart/form-data"
+URLENCODED = "application/x-www-form-urlencoded"
+
+PART_BEGIN = "part_begin"
+PART_DATA = "part_data"
+PART_END = "part_end"
+
+_OPTION_RE = re.compile(r';\s*([^\s=;]+)\s*=\s*("(?:[^"\\]|\\.)*"|[^;]*)')
+
+
+def parse_options_header(value: str) -> Tuple[str, Dict[str, str]]:
+    """
+    Parses headers like ``content-type`` and ``content-disposition`` into the
+    main value and a dict of options.
+    """
+    main, _, rest = value.partition(";")
+    options = {}
+    for key, option in _OPTION_RE.findall(";" + rest):
+        option = option.strip()
+        if option[:1] == option[-1:] == '"' and len(option) >= 2:
+            option = option[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+        options[key.lower()] = option
+    return main.strip().lower(), options
+
+
+class UploadFile:
+    def __init__(self, name: str, filename: str, content_type: str, headers):
+        self.name = name
+        self.filename = filename
+        self.content_type = content_type
+        self.headers = headers
+        self.size = 0
+        self.file = None
+
+    def __repr__(self):
+        return f"<UploadFile {self.name}: {self.filename} ({self.size} bytes)>"
+
+
+class MultipartParser:
+    """
+    Incremental multipart parser. ``feed`` takes chunks of the body and returns
+    a list of ``(event, value)`` tuples. Bytes that cannot be part of a boundary
+    are emitted right away, so every byte is searched at most twice.
+    """
+
+    PREAMBLE, DELIMITER, HEADERS, BODY, EPILOGUE = range(5)
+
+    def __init__(self, boundary: bytes, *, max_header_size: int = 16 * 1024):
+        if not boundary:
+            raise HTTPRequestError("Multipart boundary is missing")
+        self.delimiter = b"\r\n--" + boundary
+        self.max_header_size = max_header_size
+        # the first boundary is not preceded by CRLF, pretend it is
+        self.buffer = bytearray(b"\r\n")
+        self.state = self.PREAMBLE
+        self._search_start = 0
+
+    def feed(self, data: bytes) -> List[Tuple[str, object]]:
+        self.buffer += data
+        events: List[Tuple[str, object]] = []
+        while self.buffer:
+            if self.state in (self.PREAMBLE, self.BODY):
+                if not self._feed_body(events):
+                    break
+            elif self.state == self.DELIMITER:
+                if not self._feed_delimiter(events):
+                    break
+            elif self.state == self.HEADERS:
+                if not self._feed_headers(events):
+                    break
+            else:
+                # epilogue is ignored
+                del self.buffer[:]
+        return events
+
+    def close(self):
+        if self.state != self.EPILOGUE:
+            raise HTTPRequestError("Multipart body is incomplete")
+
+    def _feed_body(self, events) -> bool:
+        index = self.buffer.find(self.delimiter)
+        if index == -1:
+            keep = len(self.delimiter) - 1
+            if len(self.buffer) > keep:
+                if self.state == self.BODY:
+                    events.append((PART_DATA, bytes(self.buffer[:-keep])))
+                del self.buffer[:-keep]
+            return False
+        if self.state == self.BODY:
+            if index:
+                events.append((PART_DATA, bytes(self.buffer[:index])))
+            events.append((PART_END, None))
+        del self.buffer[: index + len(self.delimiter)]
+        self.state = self.DELIMITER
+        return True
+
+    def _feed_delimiter(self, events) -> bool:
+        # skip transport padding
+        while self.buffer[:1] in (b" ", b"\t"):
+            del self.buffer[:1]
+        if len(self.buffer) < 2:
+            return False
+        marker = bytes(self.buffer[:2])
+        if marker == b"--":
+            self.state = self.EPILOGUE
+        elif marker == b"\r\n":
+            self.state = self.HEADERS
+            self._search_start = 0
+        else:
+            raise HTTPRequestError("Malformed multipart boundary")
+        return True
+
+    def _feed_headers(self, events) -> bool:
+        # the buffer starts with the CRLF that ends the boundary line
+        index = self.buffer.find(b"\r\n\r\n", self._search_start)
+        if index == -1:
+            if len(self.buffer) > self.max_header_size:
+                raise RequestBodyTooLarge("Multipart headers are too large")
+            self._search_start = max(0, len(self.buffer) - 3)
+            return False
+        headers = CIMultiDict()
+        for line in bytes(self.buffer[2:index]).split(b"\r\n"):
+            if not line:
+                continue
+            name, sep, value = line.partition(b":")
+            if not sep:
+                raise HTTPRequestError("Malformed multipart header")
+            headers.add(name.decode("latin-1").strip(), value.decode("latin-1").strip())
+        del self.buffer[: index + 4]
+        events.append((PART_BEGIN, headers))
+        self.state = self.BODY
+        return True
+
+
+class URLEncodedParser:
+    """
+    Incremental ``application/x-www-form-urlencoded`` parser. Only complete
+    ``name=value`` pairs are decoded, the rest is kept until the next chunk.
+    """
+
+    def __init__(self, *, max_field_size: Optional[int] = None):
+        self.buffer = bytearray()
+        self.max_field_size = max_field_size
+
+    def feed(self, data: bytes) -> List[Tuple[str, str]]:
+        start = len(self.buffer)
+        self.buffer += data
+        index = self.buffer.rfind(b"&", start)
+        if index == -1:
+            if self.max_field_size and len(self.buffer) > self.max_field_size:
+                raise RequestBodyTooLarge("Form field is too large")
+            return []
+        pairs = self._parse(bytes(self.buffer[:index]))
+        del self.buffer[: index + 1]
+        return pairs
+
+    def close(self) -> List[Tuple[str, str]]:
+        pairs = self._parse(bytes(self.buffer))
+        del self.buffer[:]
+        return pairs
+
+    @staticmethod
+    def _parse(data: bytes) -> List[Tuple[str, str]]:
+        return parse_qsl(data.decode("utf-8"), keep_blank_values=True)
+
+
+def _check_declared_length(conn: Conn, max_body_size: Optional[int]):
+    if not max_body_size:
+        return
+    declared = conn.req_headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_body_size:
+        raise RequestBodyTooLarge("Request body is too large")
+
+
+async def _iter_limited(conn: Conn, max_body_size: Optional[int]):
+    _check_declared_length(conn, max_body_size)
+    total = 0
+    async for chunk in conn.body_iter(retain=False):
+        total += len(chunk)
+        if max_body_size and total > max_body_size:
+            raise RequestBodyTooLarge("Request body is too large")
+        yield chunk
+
+
+async def parse_urlencoded(
+    conn: Conn,
+    *,
+    max_part_size: Optional[int] = None,
+    max_body_size: Optional[int] = None,
+):
+    form = MultiDict()
+    parser = URLEncodedParser(max_field_size=max_part_size)
+    async for chunk in _iter_limited(conn, max_body_size):
+        form.extend(parser.feed(chunk))
+    form.extend(parser.close())
+    conn.private["form"] = form
+    conn.private["files"] = MultiDict()
+    return conn
+
+
+async def parse_multipart(
+    conn: Conn,
+    boundary: str,
+    *,
+    upload_dir: Optional[str] = None,
+    on_file: Optional[Callable[[UploadFile, bytes], Awaitable]] = None,
+    max_part_size: Optional[int] = None,
+    max_body_size: Optional[int] = None,
+):
+    """
+    Streams a multipart body. Plain fields are collected into
+    ``conn.private["form"]``; file parts are written to temporary files in
+    ``upload_dir``, or passed chunk by chunk to ``on_file`` (an empty chunk
+    marks the end of a file), and collected into ``conn.private["files"]``.
+    """
+    form = MultiDict()
+    files = MultiDict()
+    parser = MultipartParser(boundary.encode("latin-1"))
+    upload: Optional[UploadFile] = None
+    field_name = ""
+    field_data = bytearray()
+    field_charset = "utf-8"
+    part_size = 0
+    try:
+        async for chunk in _iter_limited(conn, max_body_size):
+            for event, value in parser.feed(chunk):
+                if event == PART_BEGIN:
+                    disposition, options = parse_options_header(
+                        value.get("content-disposition", "")
+                    )
+                    if disposition != "form-data" or "name" not in options:
+                        raise HTTPRequestError(
+                            "Malformed multipart content-disposition"
+                        )
+                    content_type, type_options = parse_options_header(
+                        value.get("content-type", "text/plain")
+                    )
+                    part_size = 0
+                    if "filename" in options:
+                        upload = UploadFile(
+                            options["name"], options["filename"], content_type, value
+                        )
+                        if not on_file:
+                            upload.file = tempfile.TemporaryFile(dir=upload_dir)
+                    else:
+                        upload = None
+                        field_name = options["name"]
+                        field_charset = type_options.get("charset", "utf-8")
+                        del field_data[:]
+                elif event == PART_DATA:
+                    part_size += len(value)
+                    if max_part_size and part_size > max_part_size:
+                        raise RequestBodyTooLarge("Multipart part is too large")
+                    if upload is None:
+                        field_data += value
+                    elif on_file:
+                        await on_file(upload, value)
+                    else:
+                        upload.file.write(value)
+                elif event == PART_END:
+                    if upload is None:
+                        form.add(field_name, field_data.decode(field_charset))
+                        continue
+                    upload.size = part_size
+                    if on_file:
+                        await on_file(upload, b"")
+                    else:
+                        upload.file.seek(0)
+                    files.add(upload.name, upload)
+        parser.close()
+    except BaseException:
+        # don't leave the temporary files of the parts read so far open
+        for collected in [upload, *files.values()]:
+            if collected is not None and collected.file is not None:
+                collected.file.close()
+        raise
+    conn.private["form"] = form
+    conn.private["files"] = files
+    return conn
+
+
+async def parse_form(conn: Conn, **kwargs):
+    """
+    Parses ``multipart/form-data`` and ``application/x-www-form-urlencoded``
+    bodies into ``conn.private["form"]`` and ``conn.private["files"]``.
+    See ``parse_multipart`` for the accepted keyword arguments.
+    """
+    content_type, options = parse_options_header(
+        conn.req_headers.get("content-type", "")
+    )
+    if content_type == MULTIPART:
+        return await parse_multipart(conn, options.get("boundary", ""), **kwargs)
+    if content_type == URLENCODED:
+        kwargs.pop("upload_dir", None)
+        kwargs.pop("on_file", None)
+        return await parse_urlencoded(conn, **kwargs)
+    return conn
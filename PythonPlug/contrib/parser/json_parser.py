@@ -1,9 +1,173 @@
+import codecs
 import json
+import re
+from typing import List, Optional
 
 from PythonPlug.conn import Conn
+from PythonPlug.exception import HTTPRequestError, RequestBodyTooLarge
+
+_STRUCTURAL_RE = re.compile(r'[\[\]{}",]')
+_STRING_RE = re.compile(r'["\\]')
+
+
+def _content_type(conn: Conn) -> str:
+    return conn.req_headers.get("content-type", "").partition(";")[0].strip().lower()
+
+
+def _loads(data):
+    try:
+        return json.loads(data)
+    except ValueError as e:
+        raise HTTPRequestError(f"Malformed JSON: {e}") from e
 
 
 async def parse_json(conn: Conn):
-    if not conn.req_headers.get("content-type") != "application/json":
-        conn.private["json"] = json.loads(await conn.body())
+    if _content_type(conn) == "application/json":
+        conn.private["json"] = _loads(await conn.body())
     return conn
+
+
+class JSONArrayParser:
+    """
+    Incremental parser for a top level JSON array. ``feed`` returns the
+    elements completed by the chunk; only the element being received is kept
+    in memory, and each character is scanned once.
+    """
+
+    START, ITEMS, END = range(3)
+
+    def __init__(self, *, max_item_size: Optional[int] = None):
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.max_item_size = max_item_size
+        self.buffer = ""
+        self.state = self.START
+        self.pos = 0
+        self.item_start = 0
+        self.depth = 0
+        self.in_string = False
+        self.expect_item = False
+
+    def feed(self, data: bytes) -> List[object]:
+        self.buffer += self.decoder.decode(data)
+        items: List[object] = []
+        buffer = self.buffer
+        while self.pos < len(buffer):
+            if self.state == self.START:
+                self._feed_start(buffer)
+            elif self.state == self.END:
+                if buffer[self.pos :].strip():
+                    raise HTTPRequestError("Unexpected data after JSON array")
+                self.pos = len(buffer)
+            elif self.in_string:
+                match = _STRING_RE.search(buffer, self.pos)
+                if match is None:
+                    self.pos = len(buffer)
+                elif match.group() == '"':
+                    self.in_string = False
+                    self.pos = match.end()
+                elif match.end() < len(buffer):
+                    # skip the escaped character
+                    self.pos = match.end() + 1
+                else:
+                    # wait for the escaped character
+                    self.pos = match.start()
+                    break
+            else:
+                match = _STRUCTURAL_RE.search(buffer, self.pos)
+                if match is None:
+                    self.pos = len(buffer)
+                    break
+                self.pos = match.end()
+                self._feed_structural(buffer, match.group(), items)
+        if self.max_item_size and self.pos - self.item_start > self.max_item_size:
+            raise RequestBodyTooLarge("JSON array element is too large")
+        self.buffer = buffer[self.item_start :]
+        self.pos -= self.item_start
+        self.item_start = 0
+        return items
+
+    def close(self):
+        self.feed(b"")
+        self.decoder.decode(b"", final=True)
+        if self.state != self.END:
+            raise HTTPRequestError("JSON array is incomplete")
+
+    def _feed_start(self, buffer: str):
+        stripped = buffer[self.pos :].lstrip()
+        if not stripped:
+            self.pos = self.item_start = len(buffer)
+            return
+        if stripped[0] != "[":
+            raise HTTPRequestError("Expecting a JSON array")
+        self.pos = self.item_start = len(buffer) - len(stripped) + 1
+        self.state = self.ITEMS
+
+    def _feed_structural(self, buffer: str, char: str, items: List[object]):
+        if char == '"':
+            self.in_string = True
+        elif char in "[{":
+            self.depth += 1
+        elif self.depth and char in "]}":
+            self.depth -= 1
+        elif not self.depth and char in ",]":
+            item = buffer[self.item_start : self.pos - 1]
+            if item.strip():
+                items.append(_loads(item))
+            elif char == "," or self.expect_item:
+                raise HTTPRequestError("Malformed JSON: missing array element")
+            self.expect_item = char == ","
+            self.item_start = self.pos
+            if char == "]":
+                self.state = self.END
+
+
+class JSONLinesParser:
+    """
+    Incremental parser for newline delimited JSON records.
+    """
+
+    def __init__(self, *, max_item_size: Optional[int] = None):
+        self.buffer = bytearray()
+        self.max_item_size = max_item_size
+
+    def feed(self, data: bytes) -> List[object]:
+        start = len(self.buffer)
+        self.buffer += data
+        index = self.buffer.rfind(b"\n", start)
+        if index == -1:
+            if self.max_item_size and len(self.buffer) > self.max_item_size:
+                raise RequestBodyTooLarge("JSON record is too large")
+            return []
+        lines = bytes(self.buffer[:index]).split(b"\n")
+        del self.buffer[: index + 1]
+        return [_loads(line) for line in lines if line.strip()]
+
+    def close(self) -> List[object]:
+        line = bytes(self.buffer)
+        del self.buffer[:]
+        return [_loads(line)] if line.strip() else []
+
+
+async def iter_json_array(conn: Conn, *, max_item_size: Optional[int] = None):
+    """
+    Yields the elements of a top level JSON array body as they arrive. The
+    body is not retained on the conn.
+    """
+    parser = JSONArrayParser(max_item_size=max_item_size)
+    async for chunk in conn.body_iter(retain=False):
+        for item in parser.feed(chunk):
+            yield item
+    parser.close()
+
+
+async def iter_json_lines(conn: Conn, *, max_item_size: Optional[int] = None):
+    """
+    Yields the records of a JSON lines body as they arrive. The body is not
+    retained on the conn.
+    """
+    parser = JSONLinesParser(max_item_size=max_item_size)
+    async for chunk in conn.body_iter(retain=False):
+        for item in parser.feed(chunk):
+            yield item
+    for item in parser.close():
+        yield item
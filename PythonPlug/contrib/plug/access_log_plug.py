@@ -0,0 +1,139 @@
+import json
+import random
+import sys
+import time
+from typing import Dict, List, Optional, TextIO, Union
+
+from PythonPlug.conn import Conn
+from PythonPlug.plug import Plug
+from PythonPlug.utils.batch import BatchWriter
+
+FIELDS = (
+    "time",
+    "method",
+    "path",
+    "query",
+    "status",
+    "bytes",
+    "duration_ms",
+    "client",
+    "endpoint",
+)
+
+
+class AccessLogPlug(Plug):
+    """
+    Logs one JSON line per request, once the response is fully sent. The
+    event loop only appends a tuple to a ``BatchWriter`` ring buffer; its
+    background thread serialises and writes records in batches every
+    ``flush_interval`` seconds. When the buffer is full the oldest records
+    are dropped and counted in ``dropped``, and records that failed to be
+    written are counted in ``failed``.
+
+    ``sample_rate`` keeps that fraction of requests, ``endpoint_sample_rates``
+    overrides it per ``RouterPlug`` endpoint. Responses with a status of 500
+    or more are always logged.
+    """
+
+    def __init__(
+        self,
+        output: Union[str, TextIO, None] = None,
+        *,
+        buffer_size: int = 8192,
+        batch_size: int = 512,
+        flush_interval: float = 1.0,
+        sample_rate: float = 1.0,
+        endpoint_sample_rates: Optional[Dict[str, float]] = None,
+    ):
+        super().__init__()
+        self.output = output
+        self.batches = BatchWriter(
+            self.write_records,
+            name="access-log",
+            buffer_size=buffer_size,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+        )
+        self.sample_rate = sample_rate
+        self.endpoint_sample_rates = endpoint_sample_rates or {}
+        self._stream: Optional[TextIO] = None
+
+    @property
+    def dropped(self) -> int:
+        return self.batches.dropped
+
+    @property
+    def written(self) -> int:
+        return self.batches.written
+
+    @property
+    def failed(self) -> int:
+        return self.batches.failed
+
+    async def call(self, conn: Conn):
+        conn.private["access_log_start"] = (time.time(), time.perf_counter())
+        conn.register_after_send(self.after_send)
+        return conn
+
+    async def after_send(self, conn: Conn):
+        endpoint = conn.private.get("endpoint")
+        if conn.status < 500:
+            rate = self.endpoint_sample_rates.get(endpoint, self.sample_rate)
+            if rate < 1.0 and random.random() >= rate:
+                return
+        started, perf_started = conn.private["access_log_start"]
+        scope = conn.scope
+        client = scope.get("client")
+        record = (
+            started,
+            scope.get("method"),
+            scope.get("path"),
+            scope.get("query_string", b""),
+            conn.status,
+            conn.resp_body_length,
+            (time.perf_counter() - perf_started) * 1000,
+            client[0] if client else None,
+            endpoint,
+        )
+        self.batches.put(record)
+
+    @property
+    def stream(self) -> TextIO:
+        if self._stream is None:
+            if self.output is None:
+                self._stream = sys.stderr
+            elif isinstance(self.output, str):
+                self._stream = open(
+                    self.output, "a", buffering=1 << 16, encoding="utf-8"
+                )
+            else:
+                self._stream = self.output
+        return self._stream
+
+    def write_records(self, records: List[tuple]):
+        lines = []
+        for values in records:
+            record = dict(zip(FIELDS, values))
+            record["query"] = record["query"].decode("latin-1")
+            lines.append(json.dumps(record, separators=(",", ":")))
+        self.stream.write("\n".join(lines) + "\n")
+        self.stream.flush()
+
+    def flush(self):
+        """
+        Writes out everything buffered so far; safe to call from anywhere.
+        """
+        self.batches.flush()
+
+    def close(self):
+        self.batches.close()
+        if isinstance(self.output, str) and self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    def install(self, adapter):
+        async def close():
+            self.close()
+
+        adapter.on_shutdown(close)
+        return adapter
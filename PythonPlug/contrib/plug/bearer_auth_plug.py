@@ -0,0 +1,45 @@
+import hmac
+from http import HTTPStatus
+from typing import Callable, Optional
+
+from PythonPlug.conn import Conn
+from PythonPlug.plug import Plug
+
+
+def bearer_token_matches(conn: Conn, token: str) -> bool:
+    scheme, _, credentials = conn.req_headers.get("authorization", "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(
+        credentials.encode(), token.encode()
+    )
+
+
+class BearerAuthPlug(Plug):
+    """
+    Guards admin endpoints: requests must carry ``authorization: Bearer
+    <token>``, or pass the ``authorize(conn)`` check when one is given.
+    Responds 401 without credentials and 403 with wrong ones.
+    """
+
+    def __init__(
+        self,
+        *,
+        token: Optional[str] = None,
+        authorize: Optional[Callable[[Conn], bool]] = None,
+    ):
+        super().__init__()
+        assert token or authorize, "BearerAuthPlug needs a token or authorize()"
+        self.token = token
+        self.authorize = authorize
+
+    def authorized(self, conn: Conn) -> bool:
+        if self.authorize is not None:
+            return self.authorize(conn)
+        return bearer_token_matches(conn, self.token)
+
+    async def call(self, conn: Conn):
+        if "authorization" not in conn.req_headers and self.authorize is None:
+            conn.put_resp_header("www-authenticate", "Bearer")
+            return await conn.send_resp(b"", HTTPStatus.UNAUTHORIZED, halt=True)
+        if not self.authorized(conn):
+            return await conn.send_resp(b"", HTTPStatus.FORBIDDEN, halt=True)
+        return conn
@@ -0,0 +1,202 @@
+import zlib
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from typing import List, Optional, Union
+
+from PythonPlug.conn import Conn
+from PythonPlug.plug import Plug
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _opaque_tag(etag: str) -> str:
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def is_fresh(conn: Conn, etag: Optional[str], last_modified: Optional[str]) -> bool:
+    """
+    Whether the client's cached copy, described by the ``if-none-match`` or
+    ``if-modified-since`` request headers, is still current. Tags compare
+    weakly and ``if-modified-since`` is ignored when ``if-none-match`` is
+    present, as in RFC 7232.
+    """
+    if_none_match = conn.req_headers.get("if-none-match")
+    if if_none_match is not None:
+        if etag is None:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        tag = _opaque_tag(etag)
+        return any(_opaque_tag(t) == tag for t in if_none_match.split(","))
+    since = _parse_http_date(conn.req_headers.get("if-modified-since"))
+    modified = _parse_http_date(last_modified)
+    return since is not None and modified is not None and modified <= since
+
+
+async def not_modified(
+    conn: Conn,
+    etag: Optional[str] = None,
+    last_modified: Union[None, str, float, datetime] = None,
+) -> bool:
+    """
+    Sets ``etag`` and ``last-modified`` from a version the handler already
+    knows (a row version, an mtime...) and, when the client's copy is
+    current, responds 304 and returns True, so the body is never rendered:
+
+        if await not_modified(conn, etag=f'W/"{post.version}"'):
+            return conn
+    """
+    if isinstance(last_modified, datetime):
+        last_modified = formatdate(last_modified.timestamp(), usegmt=True)
+    elif isinstance(last_modified, (int, float)):
+        last_modified = formatdate(last_modified, usegmt=True)
+    if etag is not None:
+        conn.put_resp_header("etag", etag)
+    if last_modified is not None:
+        conn.put_resp_header("last-modified", last_modified)
+    if conn.scope.get("method") not in ("GET", "HEAD") or not is_fresh(
+        conn, etag, last_modified
+    ):
+        return False
+    conn.status = HTTPStatus.NOT_MODIFIED
+    await conn.start_resp()
+    await conn.halt()
+    return True
+
+
+def _media_range_matches(media_range: str, offer: str) -> bool:
+    if media_range == "*/*":
+        return True
+    range_type, _, range_subtype = media_range.partition("/")
+    offer_type, _, offer_subtype = offer.partition("/")
+    return range_type == offer_type and range_subtype in ("*", offer_subtype)
+
+
+def negotiate(conn: Conn, offers: List[str]) -> Optional[str]:
+    """
+    Picks the offered media type the ``accept`` header prefers, the first
+    offer when there is no header, or None when nothing is acceptable.
+    Adds ``vary: accept`` so caches key on it.
+    """
+    conn.put_resp_header("vary", "accept")
+    accept = conn.req_headers.get("accept")
+    if not accept:
+        return offers[0] if offers else None
+    ranges = []
+    for item in accept.split(","):
+        media_range, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        # more specific ranges take precedence over wildcards
+        ranges.append((media_range.count("*"), media_range.lower(), quality))
+    ranges.sort(key=lambda r: r[0])
+    best, best_quality = None, 0.0
+    for offer in offers:
+        for _, media_range, quality in ranges:
+            if _media_range_matches(media_range, offer.lower()):
+                if quality > best_quality:
+                    best, best_quality = offer, quality
+                break
+    return best
+
+
+class ConditionalGetPlug(Plug):
+    """
+    Adds a weak ``etag`` to 200 responses to GET requests and turns them
+    into empty 304s when the client's ``if-none-match`` (or
+    ``if-modified-since`` against the response's ``last-modified``) says its
+    copy is current.
+
+    The tag is a CRC-32 of the body, so only bodies sent whole in their
+    first message (the last one, or one matching the ``content-length`` as
+    ``send_resp(..., halt=True)`` sends them) of at most ``buffer_limit``
+    bytes are tagged; the start message is held back until then. Streamed
+    bodies, event streams and larger bodies pass through untagged as they
+    come. Responses that already carry an ``etag`` are left alone, so
+    handlers that know their version can use ``not_modified()`` to skip
+    rendering entirely.
+    """
+
+    def __init__(self, buffer_limit: int = 256 * 1024):
+        super().__init__()
+        self.buffer_limit = buffer_limit
+
+    async def call(self, conn: Conn):
+        if conn.scope.get("type") != "http" or conn.scope.get("method") != "GET":
+            return conn
+        conn._send = self.wrap_send(  # pylint: disable=protected-access
+            conn, conn._send  # pylint: disable=protected-access
+        )
+        return conn
+
+    def wrap_send(self, conn: Conn, send):
+        held: Optional[dict] = None
+        declared: Optional[bytes] = None
+        passthrough = False
+
+        async def conditional_send(message, *args, **kwargs):
+            nonlocal held, declared, passthrough
+            message_type = message.get("type")
+            if passthrough or message_type not in (
+                "http.response.start",
+                "http.response.body",
+            ):
+                return await send(message, *args, **kwargs)
+            if message_type == "http.response.start":
+                headers = dict((k.lower(), v) for k, v in message.get("headers", []))
+                if (
+                    message.get("status") != 200
+                    or b"etag" in headers
+                    or headers.get(b"content-type", b"").startswith(
+                        b"text/event-stream"
+                    )
+                ):
+                    passthrough = True
+                    return await send(message, *args, **kwargs)
+                held = message
+                declared = headers.get(b"content-length")
+                return None
+            passthrough = True
+            body = message.get("body", b"")
+            whole = not message.get("more_body", False) or declared == str(
+                len(body)
+            ).encode("ascii")
+            if not whole or len(body) > self.buffer_limit:
+                await send(held)
+                return await send(message, *args, **kwargs)
+            etag = f'W/"{len(body):x}-{zlib.crc32(body):08x}"'
+            last_modified = None
+            for key, value in held["headers"]:
+                if key.lower() == b"last-modified":
+                    last_modified = value.decode("latin-1")
+            tag = [b"etag", etag.encode("ascii")]
+            if not is_fresh(conn, etag, last_modified):
+                await send({**held, "headers": list(held["headers"]) + [tag]})
+                return await send(message, *args, **kwargs)
+            conn.status = HTTPStatus.NOT_MODIFIED.value
+            headers = [
+                [k, v] for k, v in held["headers"] if k.lower() != b"content-length"
+            ]
+            await send({**held, "status": conn.status, "headers": headers + [tag]})
+            # Conn.send counts this message's body once we return; none of it
+            # reaches the client
+            conn.resp_body_length -= len(body)
+            return await send({**message, "body": b""})
+
+        return conditional_send
@@ -1,19 +1,182 @@
+import heapq
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
 from PythonPlug.plug import Plug
 
 
+def dimension_value(conn, dimension: str):
+    if dimension.startswith("header:"):
+        return conn.req_headers.get(dimension[7:])
+    return conn.scope.get(dimension)
+
+
+class Predicate(ABC):
+    """
+    A declarative guard condition. Predicates with a ``key`` of
+    ``(dimension, value)`` are dispatched through a hash table instead of
+    being called; ``residual`` is what remains to be checked once the key
+    matched. Combine predicates with ``&``.
+    """
+
+    key: Optional[Tuple[str, Any]] = None
+    residual: Optional["Predicate"] = None
+
+    @abstractmethod
+    def __call__(self, conn) -> bool:
+        "whether the conn satisfies the predicate"
+
+    def __and__(self, other):
+        return AllOf(self, other)
+
+
+class Equals(Predicate):
+    def __init__(self, dimension: str, value):
+        self.key = (dimension, value)
+
+    def __call__(self, conn) -> bool:
+        return dimension_value(conn, self.key[0]) == self.key[1]
+
+    def __repr__(self):
+        return "%s == %r" % self.key
+
+
+class PathPrefix(Predicate):
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+
+    def __call__(self, conn) -> bool:
+        return conn.scope.get("path", "").startswith(self.prefix)
+
+    def __repr__(self):
+        return f"path startswith {self.prefix!r}"
+
+
+class AllOf(Predicate):
+    def __init__(self, *predicates: Callable):
+        # a & b & c nests; flatten it so no operand's residual gets lost
+        self.predicates = tuple(
+            operand
+            for predicate in predicates
+            for operand in (
+                predicate.predicates if isinstance(predicate, AllOf) else (predicate,)
+            )
+        )
+        indexed = [p for p in self.predicates if getattr(p, "key", None) is not None]
+        if indexed:
+            first = indexed[0]
+            self.key = first.key
+            rest = [p for p in self.predicates if p is not first]
+            if getattr(first, "residual", None) is not None:
+                rest.insert(0, first.residual)
+            if rest:
+                self.residual = rest[0] if len(rest) == 1 else AllOf(*rest)
+
+    def __call__(self, conn) -> bool:
+        return all(predicate(conn) for predicate in self.predicates)
+
+    def __repr__(self):
+        return " & ".join(map(repr, self.predicates))
+
+
+def method_is(method: str) -> Predicate:
+    return Equals("method", method.upper())
+
+
+def path_is(path: str) -> Predicate:
+    return Equals("path", path)
+
+
+def path_prefix(prefix: str) -> Predicate:
+    return PathPrefix(prefix)
+
+
+def header_is(name: str, value: str) -> Predicate:
+    return Equals("header:" + name.lower(), value)
+
+
+def host_is(host: str) -> Predicate:
+    return header_is("host", host)
+
+
+def is_websocket() -> Predicate:
+    return Equals("type", "websocket")
+
+
+def is_http() -> Predicate:
+    return Equals("type", "http")
+
+
 class GuardPlug(Plug):
+    """
+    Runs the plug of the first case whose predicate matches the conn.
+
+    Cases built from the predicates in this module (``method_is``,
+    ``header_is``, ``path_is``, ``is_websocket``...) are compiled into one
+    hash table per dimension, so a request costs a lookup per dimension
+    rather than a call per case. Plain callables still work and are
+    evaluated in order with the candidates from the tables. ``stats()``
+    reports how often each case matched. Cases added to ``cases`` directly
+    are picked up on the next request.
+    """
+
     def __init__(self):
         super().__init__()
         self.cases = []
+        self.hits: List[int] = []
+        self._compiled = None
 
     async def call(self, conn):
-        for predicate, plug in self.cases:
-            if predicate(conn):
-                return await plug(conn)
+        if self._compiled is None or self._compiled[0] != len(self.cases):
+            self.compile()
+        _, tables, linear, residuals = self._compiled
+        candidates = [linear] if linear else []
+        for dimension, table in tables.items():
+            found = table.get(dimension_value(conn, dimension))
+            if found:
+                candidates.append(found)
+        if not candidates:
+            return conn
+        ordered = candidates[0] if len(candidates) == 1 else heapq.merge(*candidates)
+        for index in ordered:
+            check = residuals[index]
+            if check is None or check(conn):
+                self.hits[index] += 1
+                return await self.cases[index][1](conn)
+        return conn
+
+    def compile(self):
+        tables: Dict[str, Dict[Any, List[int]]] = {}
+        linear: List[int] = []
+        residuals: List[Optional[Callable]] = []
+        for index, (predicate, _) in enumerate(self.cases):
+            key = getattr(predicate, "key", None)
+            if key is None:
+                linear.append(index)
+                residuals.append(predicate)
+            else:
+                dimension, value = key
+                tables.setdefault(dimension, {}).setdefault(value, []).append(index)
+                residuals.append(predicate.residual)
+        del self.hits[len(self.cases) :]
+        self.hits.extend([0] * (len(self.cases) - len(self.hits)))
+        self._compiled = (len(self.cases), tables, linear, residuals)
 
     def case(self, predicate):
         def _decorator(plug):
             self.cases.append((predicate, plug))
+            self.hits.append(0)
+            self._compiled = None
             return plug
 
         return _decorator
+
+    def stats(self) -> List[dict]:
+        return [
+            {
+                "case": repr(predicate),
+                "plug": getattr(plug, "__name__", type(plug).__name__),
+                "hits": hits,
+            }
+            for (predicate, plug), hits in zip(self.cases, self.hits)
+        ]
@@ -0,0 +1,38 @@
+from typing import Callable, Optional
+
+from PythonPlug.conn import Conn
+from PythonPlug.contrib.plug.bearer_auth_plug import BearerAuthPlug
+from PythonPlug.memory import AllocationTracker
+from PythonPlug.plug import Plug
+from PythonPlug.utils.conn import send_json
+
+
+class MemoryReportPlug(Plug):
+    """
+    Admin endpoint responding with ``tracker.report()`` as JSON, the top
+    ``?limit=`` (default 20) entries of each table. Route it next to the
+    adapter's tracker:
+
+        tracker = AllocationTracker(sample_every=500)
+        router.add_route(rule_string="/_admin/memory",
+                         plug=MemoryReportPlug(tracker, token=TOKEN))
+        app = ASGIAdapter(Entry(), allocation_tracker=tracker)
+
+    Access is checked like ``ProfilerPlug``'s, by a ``BearerAuthPlug`` built
+    from ``token`` and ``authorize``.
+    """
+
+    def __init__(
+        self,
+        tracker: AllocationTracker,
+        *,
+        token: Optional[str] = None,
+        authorize: Optional[Callable[[Conn], bool]] = None,
+    ):
+        super().__init__()
+        self.plugs = [BearerAuthPlug(token=token, authorize=authorize)]
+        self.tracker = tracker
+
+    async def call(self, conn: Conn):
+        limit = conn.query_int("limit", 20)
+        return await send_json(conn, self.tracker.report(limit))
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from http import HTTPStatus
+from typing import Callable, Optional
+
+from PythonPlug.conn import Conn
+from PythonPlug.contrib.plug.bearer_auth_plug import BearerAuthPlug
+from PythonPlug.contrib.plug.router_plug import RouterPlug
+from PythonPlug.plug import Plug
+
+_PLUG_CODE = Plug.call_plug.__code__
+_ENDPOINT_CODE = RouterPlug.call_endpoint.__code__
+
+
+def frame_label(code) -> str:
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+class StackSampler:
+    """
+    Samples the stack of one thread (the event loop's by default) every
+    ``interval`` seconds from a background thread. Stacks are counted in
+    collapsed form, root first, with ``plug:<class>`` and ``route:<endpoint>``
+    frames marking the plug and ``RouterPlug`` endpoint that were running.
+    Samples of an idle loop (waiting in ``selectors``) are skipped.
+    """
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = 0.005):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._labels: dict = {}
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            frame = sys._current_frames().get(  # pylint: disable=protected-access
+                self.thread_id
+            )
+            if frame is not None:
+                self.sample(frame)
+
+    def sample(self, frame):
+        if os.path.basename(frame.f_code.co_filename) == "selectors.py":
+            return
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            if code is _PLUG_CODE:
+                stack.append("plug:" + type(frame.f_locals.get("self")).__name__)
+            elif code is _ENDPOINT_CODE:
+                stack.append(f"route:{frame.f_locals.get('endpoint')}")
+            label = self._labels.get(code)
+            if label is None:
+                label = self._labels[code] = frame_label(code)
+            stack.append(label)
+            frame = frame.f_back
+        self.samples += 1
+        self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        """
+        The profile in the collapsed format read by flamegraph.pl and
+        speedscope: one ``frame;frame;frame count`` line per stack.
+        """
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+
+class ProfilerPlug(Plug):
+    """
+    Admin endpoint that samples the worker for ``?seconds=`` (default 10,
+    at most ``max_seconds``) at ``?interval_ms=`` and responds with a
+    collapsed-stack profile. Route it like any plug:
+
+        router.add_route(rule_string="/_admin/profile",
+                         plug=ProfilerPlug(token=os.environ["PROFILE_TOKEN"]))
+
+    Access is checked by a ``BearerAuthPlug`` built from ``token`` and
+    ``authorize``. Only one profile runs at a time per worker.
+    """
+
+    def __init__(
+        self,
+        *,
+        token: Optional[str] = None,
+        authorize: Optional[Callable[[Conn], bool]] = None,
+        max_seconds: float = 60.0,
+    ):
+        super().__init__()
+        self.plugs = [BearerAuthPlug(token=token, authorize=authorize)]
+        self.max_seconds = max_seconds
+        self.running = False
+
+    async def call(self, conn: Conn):
+        try:
+            seconds = float(conn.query_param("seconds") or 10)
+            interval = float(conn.query_param("interval_ms") or 5) / 1000
+        except ValueError:
+            return await conn.send_resp(b"", HTTPStatus.BAD_REQUEST, halt=True)
+        if self.running:
+            return await conn.send_resp(b"", HTTPStatus.CONFLICT, halt=True)
+        sampler = StackSampler(interval=max(interval, 0.001))
+        self.running = True
+        started = time.monotonic()
+        sampler.start()
+        try:
+            await asyncio.sleep(min(seconds, self.max_seconds))
+        finally:
+            sampler.stop()
+            self.running = False
+        conn.put_resp_header("content-type", "text/plain; charset=utf-8")
+        conn.put_resp_header("x-profile-samples", str(sampler.samples))
+        conn.put_resp_header("x-profile-seconds", "%.3f" % (time.monotonic() - started))
+        return await conn.send_resp(sampler.collapsed().encode("utf-8"), halt=True)
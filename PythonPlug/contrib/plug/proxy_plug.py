@@ -0,0 +1,406 @@
+import asyncio
+import time
+from http import HTTPStatus
+from typing import Iterable, List, Optional, Union
+from urllib.parse import quote, urlsplit
+
+from PythonPlug.conn import Conn
+from PythonPlug.exception import UpstreamError
+from PythonPlug.plug import Plug
+
+HOP_BY_HOP_HEADERS = frozenset(
+    [
+        "connection",
+        "keep-alive",
+        "proxy-authenticate",
+        "proxy-authorization",
+        "te",
+        "trailer",
+        "trailers",
+        "transfer-encoding",
+        "upgrade",
+    ]
+)
+
+_PATH_SAFE = "/%:@!$&'()*+,;=-._~"
+
+
+def hop_by_hop(connection_values: Iterable[str]) -> frozenset:
+    """
+    The headers not to forward: the standard hop-by-hop ones plus those the
+    ``Connection`` header lists as applying to this hop only.
+    """
+    listed = (
+        token.strip().lower()
+        for value in connection_values
+        for token in value.split(",")
+    )
+    return HOP_BY_HOP_HEADERS.union(token for token in listed if token)
+
+
+class Upstream:  # pylint: disable=too-many-instance-attributes
+    """
+    An upstream server with a pool of idle keep-alive connections. After
+    ``max_fails`` consecutive failures it is skipped for ``fail_timeout``
+    seconds.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        weight: int = 1,
+        max_idle: int = 10,
+        max_fails: int = 3,
+        fail_timeout: float = 10.0,
+    ):
+        parts = urlsplit(url if "//" in url else "http://" + url)
+        if parts.scheme != "http":
+            raise ValueError(f"Only http upstreams are supported: {url}")
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.base_path = parts.path.rstrip("/")
+        self.weight = weight
+        self.max_idle = max_idle
+        self.max_fails = max_fails
+        self.fail_timeout = fail_timeout
+
+        self.idle: List[tuple] = []
+        self.active = 0
+        self.current_weight = 0
+        self.fails = 0
+        self.down_until = 0.0
+
+        self.requests = 0
+        self.connects = 0
+        self.reuses = 0
+        self.failures = 0
+
+    @property
+    def netloc(self) -> str:
+        return self.host if self.port == 80 else f"{self.host}:{self.port}"
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    async def connect(self, timeout: Optional[float]):
+        while self.idle:
+            reader, writer = self.idle.pop()
+            # StreamWriter.is_closing() is only there from Python 3.7
+            if not reader.at_eof() and not writer.transport.is_closing():
+                self.reuses += 1
+                return reader, writer, True
+            writer.close()
+        self.connects += 1
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), timeout
+        )
+        return reader, writer, False
+
+    def release(self, reader, writer, reusable: bool):
+        if reusable and len(self.idle) < self.max_idle:
+            self.idle.append((reader, writer))
+        else:
+            writer.close()
+
+    def mark_success(self):
+        self.fails = 0
+
+    def mark_failure(self):
+        self.failures += 1
+        self.fails += 1
+        if self.fails >= self.max_fails:
+            self.down_until = time.monotonic() + self.fail_timeout
+            self.fails = 0
+
+    def close(self):
+        while self.idle:
+            self.idle.pop()[1].close()
+
+    def stats(self) -> dict:
+        return {
+            "upstream": f"{self.host}:{self.port}",
+            "weight": self.weight,
+            "available": self.available,
+            "active": self.active,
+            "idle": len(self.idle),
+            "requests": self.requests,
+            "connects": self.connects,
+            "reuses": self.reuses,
+            "failures": self.failures,
+        }
+
+
+class _UpstreamFailed(Exception):
+    def __init__(self, retryable: bool):
+        super().__init__()
+        self.retryable = retryable
+
+
+class ProxyPlug(Plug):
+    """
+    Forwards requests to upstream HTTP/1.1 servers, streaming the request
+    body from the conn and the response body back without buffering either.
+    Mount it under a prefix with ``RouterPlug.forward(prefix, proxy,
+    change_path=True)``.
+
+    ``balance`` is ``"round_robin"`` (smooth weighted) or
+    ``"least_connections"``. Upstreams failing to connect or to answer are
+    taken out of rotation (see ``Upstream``); requests without a body are
+    retried on another upstream. Responds 502 when no upstream could answer
+    and 504 when the upstream timed out.
+    """
+
+    def __init__(
+        self,
+        upstreams: Iterable[Union[str, Upstream]],
+        *,
+        balance: str = "round_robin",
+        timeout: Optional[float] = 30.0,
+        preserve_host: bool = False,
+        retries: int = 1,
+        chunk_size: int = 64 * 1024,
+    ):
+        super().__init__()
+        self.upstreams = [
+            upstream if isinstance(upstream, Upstream) else Upstream(upstream)
+            for upstream in upstreams
+        ]
+        assert self.upstreams, "ProxyPlug needs at least one upstream"
+        assert balance in ("round_robin", "least_connections"), balance
+        self.balance = balance
+        self.timeout = timeout
+        self.preserve_host = preserve_host
+        self.retries = retries
+        self.chunk_size = chunk_size
+
+    def choose(self, exclude=()) -> Optional[Upstream]:
+        candidates = [
+            upstream
+            for upstream in self.upstreams
+            if upstream.available and upstream not in exclude
+        ]
+        if not candidates:
+            # everything is marked down; trying beats failing outright
+            candidates = [u for u in self.upstreams if u not in exclude]
+        if not candidates:
+            return None
+        if self.balance == "least_connections":
+            return min(candidates, key=lambda u: u.active / u.weight)
+        total = 0
+        best = None
+        for upstream in candidates:
+            upstream.current_weight += upstream.weight
+            total += upstream.weight
+            if best is None or upstream.current_weight > best.current_weight:
+                best = upstream
+        best.current_weight -= total
+        return best
+
+    def request_head(self, conn: Conn, upstream: Upstream, chunked: bool) -> bytes:
+        scope = conn.scope
+        target = upstream.base_path + quote(scope.get("path", "/"), safe=_PATH_SAFE)
+        if scope.get("query_string"):
+            target += "?" + scope["query_string"].decode("latin-1")
+        lines = [f"{scope.get('method', 'GET')} {target or '/'} HTTP/1.1"]
+        original_host = None
+        skipped = hop_by_hop(conn.req_headers.getall("connection", ()))
+        for key, value in conn.req_headers.items():
+            lower = key.lower()
+            if lower in skipped or (lower == "traceparent" and conn.span is not None):
+                continue
+            if lower == "host":
+                original_host = value
+                if not self.preserve_host:
+                    continue
+            lines.append(f"{key}: {value}")
+        if not self.preserve_host or original_host is None:
+            lines.append(f"host: {upstream.netloc}")
+        client = scope.get("client")
+        forwarded_for = conn.req_headers.get("x-forwarded-for")
+        if client:
+            forwarded_for = (
+                f"{forwarded_for}, {client[0]}" if forwarded_for else client[0]
+            )
+        if forwarded_for:
+            lines.append(f"x-forwarded-for: {forwarded_for}")
+        lines.append(f"x-forwarded-proto: {scope.get('scheme', 'http')}")
+        if original_host:
+            lines.append(f"x-forwarded-host: {original_host}")
+        if conn.span is not None:
+            lines.append(f"traceparent: {conn.span.traceparent}")
+        if chunked:
+            lines.append("transfer-encoding: chunked")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def call(self, conn: Conn):
+        has_body = conn.req_headers.get(
+            "transfer-encoding", ""
+        ).lower() == "chunked" or conn.req_headers.get("content-length", "0") not in (
+            "",
+            "0",
+        )
+        tried: List[Upstream] = []
+        for _ in range(self.retries + 1):
+            upstream = self.choose(tried)
+            if upstream is None:
+                break
+            tried.append(upstream)
+            try:
+                return await self.forward(conn, upstream, has_body)
+            except asyncio.TimeoutError:
+                upstream.mark_failure()
+                if conn.started:
+                    raise UpstreamError("Upstream timed out mid response")
+                return await conn.send_resp(b"", HTTPStatus.GATEWAY_TIMEOUT, halt=True)
+            except _UpstreamFailed as e:
+                if not e.retryable or has_body:
+                    break
+        if conn.started:
+            raise UpstreamError("Upstream failed mid response")
+        return await conn.send_resp(b"", HTTPStatus.BAD_GATEWAY, halt=True)
+
+    async def forward(self, conn: Conn, upstream: Upstream, has_body: bool):
+        upstream.requests += 1
+        upstream.active += 1
+        try:
+            try:
+                reader, writer, reused = await upstream.connect(self.timeout)
+            except OSError:
+                upstream.mark_failure()
+                raise _UpstreamFailed(retryable=True)
+            try:
+                reusable = await self._exchange(
+                    conn, upstream, reader, writer, has_body
+                )
+            except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                writer.close()
+                if conn.started:
+                    upstream.mark_failure()
+                    raise UpstreamError("Upstream connection lost mid response")
+                if not reused:
+                    upstream.mark_failure()
+                # a stale keep-alive connection is worth another try
+                raise _UpstreamFailed(retryable=True)
+            except BaseException:
+                writer.close()
+                raise
+            upstream.mark_success()
+            upstream.release(reader, writer, reusable)
+            return conn
+        finally:
+            upstream.active -= 1
+
+    async def _exchange(self, conn, upstream, reader, writer, has_body) -> bool:
+        chunked = has_body and "content-length" not in conn.req_headers
+        writer.write(self.request_head(conn, upstream, chunked))
+        if has_body:
+            async for chunk in conn.body_iter(retain=False):
+                if not chunk:
+                    continue
+                if chunked:
+                    writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                else:
+                    writer.write(chunk)
+                await writer.drain()
+            if chunked:
+                writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+        status = 100
+        while 100 <= status < 200 and status != 101:
+            # interim responses (100 Continue, 103 Early Hints) are not relayed
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.timeout)
+            status_line, *header_lines = head[:-4].decode("latin-1").split("\r\n")
+            version, status = status_line.split(" ", 2)[:2]
+            status = int(status)
+        keep_alive = version == "HTTP/1.1"
+        transfer_chunked = False
+        length = None
+        headers = []
+        for line in header_lines:
+            key, _, value = line.partition(":")
+            headers.append((key.strip(), value.strip()))
+        skipped = hop_by_hop(v for k, v in headers if k.lower() == "connection")
+        relayed = []
+        for key, value in headers:
+            lower = key.lower()
+            if lower == "connection":
+                tokens = {token.strip().lower() for token in value.split(",")}
+                keep_alive = "close" not in tokens and (
+                    keep_alive or "keep-alive" in tokens
+                )
+            elif lower == "transfer-encoding":
+                transfer_chunked = value.lower() == "chunked"
+            elif lower == "content-length":
+                try:
+                    length = int(value)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # malformed: nothing is relayed yet, so this becomes a 502
+                    upstream.mark_failure()
+                    raise _UpstreamFailed(retryable=False)
+            if lower not in skipped:
+                relayed.append((key, value))
+        conn.status = status
+        conn.resp_headers.extend(relayed)
+        await conn.start_resp()
+
+        no_body = conn.scope.get("method") == "HEAD" or conn.status in (204, 304)
+        if no_body or conn.status < 200:
+            pass
+        elif transfer_chunked:
+            await self._stream_chunked(conn, reader)
+        elif length is not None:
+            await self._stream_length(conn, reader, length)
+        else:
+            keep_alive = False
+            await self._stream_until_eof(conn, reader)
+        await conn.halt()
+        return keep_alive
+
+    async def _send_chunk(self, conn, chunk):
+        await conn.send(
+            {"type": "http.response.body", "body": chunk, "more_body": True}
+        )
+
+    async def _stream_length(self, conn, reader, length):
+        while length > 0:
+            chunk = await asyncio.wait_for(
+                reader.read(min(length, self.chunk_size)), self.timeout
+            )
+            if not chunk:
+                raise asyncio.IncompleteReadError(b"", length)
+            length -= len(chunk)
+            await self._send_chunk(conn, chunk)
+
+    async def _stream_chunked(self, conn, reader):
+        while True:
+            size_line = await asyncio.wait_for(reader.readuntil(b"\r\n"), self.timeout)
+            size = int(size_line.split(b";", 1)[0], 16)
+            if not size:
+                # skip trailers
+                while (
+                    await asyncio.wait_for(reader.readuntil(b"\r\n"), self.timeout)
+                    != b"\r\n"
+                ):
+                    pass
+                return
+            await self._stream_length(conn, reader, size)
+            await asyncio.wait_for(reader.readexactly(2), self.timeout)
+
+    async def _stream_until_eof(self, conn, reader):
+        while True:
+            chunk = await asyncio.wait_for(reader.read(self.chunk_size), self.timeout)
+            if not chunk:
+                return
+            await self._send_chunk(conn, chunk)
+
+    def close(self):
+        for upstream in self.upstreams:
+            upstream.close()
+
+    def stats(self) -> List[dict]:
+        return [upstream.stats() for upstream in self.upstreams]
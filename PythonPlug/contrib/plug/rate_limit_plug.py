@@ -0,0 +1,163 @@
+import hashlib
+import math
+import mmap
+import os
+import struct
+import time
+from http import HTTPStatus
+from typing import Callable, Dict, Optional, Union
+
+from PythonPlug.conn import Conn
+from PythonPlug.plug import Plug
+
+
+class MemoryBackend:
+    """
+    Per-process GCRA state: the theoretical arrival time of every key. Keys
+    whose bucket has refilled are dropped every ``compact_interval`` seconds.
+    """
+
+    def __init__(self, compact_interval: float = 60.0):
+        self.tats: Dict[str, float] = {}
+        self.compact_interval = compact_interval
+        self.next_compaction = 0.0
+
+    def hit(self, key: str, interval: float, tolerance: float, now: float) -> float:
+        """
+        Counts one request for ``key`` and returns 0 when it is allowed, or
+        the seconds until it would be.
+        """
+        if now >= self.next_compaction:
+            self.compact(now)
+        tat = max(self.tats.get(key, now), now)
+        retry_after = tat - tolerance - now
+        if retry_after > 0:
+            return retry_after
+        self.tats[key] = tat + interval
+        return 0.0
+
+    def compact(self, now: float):
+        self.tats = {key: tat for key, tat in self.tats.items() if tat > now}
+        self.next_compaction = now + self.compact_interval
+
+
+class SharedMemoryBackend:
+    """
+    GCRA state in a memory mapped file, so all workers on a host that open
+    the same ``path`` enforce one limit. The file is a fixed hash table of
+    ``slots`` entries; a key probes ``max_probe`` slots and, when they are
+    all taken, replaces the one closest to refilled. Updates are serialised
+    with ``fcntl`` locks, so this is Unix only.
+    """
+
+    SLOT = struct.Struct("<Qd")  # key hash, theoretical arrival time
+
+    def __init__(self, path: str, slots: int = 65536, max_probe: int = 8):
+        import fcntl  # pylint: disable=import-outside-toplevel
+
+        self._fcntl = fcntl
+        self.slots = slots
+        self.max_probe = max_probe
+        size = slots * self.SLOT.size
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self.fd).st_size < size:
+            os.ftruncate(self.fd, size)
+        self.map = mmap.mmap(self.fd, size)
+
+    @staticmethod
+    def key_hash(key: str) -> int:
+        # stable across processes, unlike hash(); 0 marks an empty slot
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little") or 1
+
+    def hit(self, key: str, interval: float, tolerance: float, now: float) -> float:
+        key_hash = self.key_hash(key)
+        start = key_hash % self.slots
+        self._fcntl.lockf(self.fd, self._fcntl.LOCK_EX)
+        try:
+            victim, victim_tat, tat = None, math.inf, now
+            for probe in range(self.max_probe):
+                offset = ((start + probe) % self.slots) * self.SLOT.size
+                slot_hash, slot_tat = self.SLOT.unpack_from(self.map, offset)
+                if slot_hash == key_hash:
+                    victim, tat = offset, max(slot_tat, now)
+                    break
+                if slot_hash == 0 or slot_tat <= now:
+                    # empty or refilled, free to take
+                    if victim_tat > -math.inf:
+                        victim, victim_tat = offset, -math.inf
+                elif slot_tat < victim_tat:
+                    victim, victim_tat = offset, slot_tat
+            retry_after = tat - tolerance - now
+            if retry_after > 0:
+                return retry_after
+            self.SLOT.pack_into(self.map, victim, key_hash, tat + interval)
+            return 0.0
+        finally:
+            self._fcntl.lockf(self.fd, self._fcntl.LOCK_UN)
+
+    def close(self):
+        self.map.close()
+        os.close(self.fd)
+
+
+def client_ip(conn: Conn) -> Optional[str]:
+    client = conn.scope.get("client")
+    return client[0] if client else None
+
+
+def _key_func(key: Union[str, Callable[[Conn], Optional[str]]]):
+    if callable(key):
+        return key
+    if key == "ip":
+        return client_ip
+    if key == "endpoint":
+        return lambda conn: conn.private.get("endpoint") or conn.scope.get("path")
+    if key.startswith("header:"):
+        header = key[len("header:") :]
+        return lambda conn: conn.req_headers.get(header)
+    raise ValueError(f"Unknown rate limit key: {key}")
+
+
+class RateLimitPlug(Plug):
+    """
+    Allows ``limit`` requests per ``period`` seconds per key, with bursts of
+    up to ``burst`` requests (default ``limit``), and responds 429 with a
+    ``retry-after`` header otherwise.
+
+    ``key`` is ``"ip"``, ``"header:<name>"``, ``"endpoint"`` or a function
+    of the conn; requests without a key are not limited. The ``"endpoint"``
+    key is set by ``RouterPlug``, so put the plug after the router has
+    matched, e.g. in the ``plugs`` of the routed plug.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        period: float = 1.0,
+        *,
+        burst: Optional[int] = None,
+        key: Union[str, Callable[[Conn], Optional[str]]] = "ip",
+        backend=None,
+        namespace: str = "",
+        clock: Callable[[], float] = time.time,
+    ):
+        super().__init__()
+        self.interval = period / limit
+        self.tolerance = self.interval * ((burst or limit) - 1)
+        self.key_func = _key_func(key)
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.namespace = namespace
+        self.clock = clock
+
+    async def call(self, conn: Conn):
+        key = self.key_func(conn)
+        if key is None:
+            return conn
+        if self.namespace:
+            key = f"{self.namespace}:{key}"
+        retry_after = self.backend.hit(key, self.interval, self.tolerance, self.clock())
+        if retry_after:
+            conn.put_resp_header("retry-after", str(math.ceil(retry_after)))
+            await conn.send_resp(b"", HTTPStatus.TOO_MANY_REQUESTS, halt=True)
+        return conn
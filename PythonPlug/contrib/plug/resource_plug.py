@@ -0,0 +1,203 @@
+import asyncio
+import inspect
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from PythonPlug.conn import Conn
+from PythonPlug.exception import PythonPlugRuntimeError
+from PythonPlug.plug import Plug
+
+
+async def _maybe_await(value):
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+class ResourcePool:  # pylint: disable=too-many-instance-attributes
+    """
+    Keeps up to ``size`` clients made by ``factory`` and lends them out one
+    request at a time. ``factory`` and ``close`` may be plain or coroutine
+    functions.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        *,
+        size: int = 10,
+        min_size: int = 0,
+        close: Optional[Callable[[Any], Any]] = None,
+    ):
+        self.name = name
+        self.factory = factory
+        self.size = size
+        self.min_size = min_size
+        self.close_client = close
+        self.idle: deque = deque()
+        self.waiters: deque = deque()
+        self.closed = False
+
+        self.created = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    async def open(self):
+        self.closed = False
+        while self.created < self.min_size:
+            self.idle.append(await self._create())
+
+    async def _create(self):
+        self.created += 1
+        try:
+            return await _maybe_await(self.factory())
+        except BaseException:
+            self.created -= 1
+            raise
+
+    async def acquire(self):
+        if self.closed:
+            raise PythonPlugRuntimeError(f"Resource pool {self.name} is closed")
+        if self.idle:
+            client = self.idle.pop()
+        elif self.created < self.size:
+            client = await self._create()
+        else:
+            self.waits += 1
+            started = time.monotonic()
+            waiter = asyncio.get_event_loop().create_future()
+            self.waiters.append(waiter)
+            try:
+                client = await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # handed a client just as we were cancelled, pass it on
+                    self.in_use += 1
+                    await self.release(waiter.result())
+                raise
+            finally:
+                self.wait_seconds += time.monotonic() - started
+        self.checkouts += 1
+        self.in_use += 1
+        self.max_in_use = max(self.max_in_use, self.in_use)
+        return client
+
+    async def release(self, client):
+        self.in_use -= 1
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                # hand over directly, the waiter counts it as checked out
+                waiter.set_result(client)
+                return
+        if self.closed:
+            await self._close(client)
+        else:
+            self.idle.append(client)
+
+    async def _close(self, client):
+        self.created -= 1
+        if self.close_client is not None:
+            await _maybe_await(self.close_client(client))
+
+    async def close(self):
+        self.closed = True
+        while self.idle:
+            await self._close(self.idle.pop())
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "size": self.size,
+            "created": self.created,
+            "idle": len(self.idle),
+            "in_use": self.in_use,
+            "max_in_use": self.max_in_use,
+            "waiting": len(self.waiters),
+            "checkouts": self.checkouts,
+            "waits": self.waits,
+            "wait_seconds": self.wait_seconds,
+        }
+
+
+class ResourceRegistry:
+    """
+    Named resource pools opened and closed with the app's lifespan:
+
+        registry = ResourceRegistry()
+        registry.register("db", connect, close=disconnect, size=20)
+        registry.install(adapter)
+    """
+
+    def __init__(self):
+        self.pools: Dict[str, ResourcePool] = {}
+
+    def register(self, name: str, factory: Callable[[], Any], **kwargs):
+        assert name not in self.pools, "resource already registered: %s" % name
+        pool = self.pools[name] = ResourcePool(name, factory, **kwargs)
+        return pool
+
+    def __getitem__(self, name: str) -> ResourcePool:
+        return self.pools[name]
+
+    async def startup(self):
+        for pool in self.pools.values():
+            await pool.open()
+
+    async def shutdown(self):
+        for pool in self.pools.values():
+            await pool.close()
+
+    def install(self, adapter):
+        adapter.on_startup(self.startup)
+        adapter.on_shutdown(self.shutdown)
+        return adapter
+
+    def stats(self) -> Dict[str, dict]:
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+
+class Checkout:
+    """
+    The resources a single conn borrowed. Each resource is acquired at most
+    once per conn and returned when the conn is cleaned up.
+    """
+
+    def __init__(self, registry: ResourceRegistry, conn: Conn):
+        self.registry = registry
+        self.borrowed: Dict[str, Any] = {}
+        conn.register_cleanup(self.release_all)
+
+    async def get(self, name: str):
+        if name not in self.borrowed:
+            self.borrowed[name] = await self.registry[name].acquire()
+        return self.borrowed[name]
+
+    async def release_all(self, conn):  # pylint: disable=unused-argument
+        borrowed, self.borrowed = self.borrowed, {}
+        for name, client in borrowed.items():
+            await self.registry[name].release(client)
+
+
+class ResourcePlug(Plug):
+    """
+    Puts a ``Checkout`` in ``conn.private["resources"]``; handlers borrow
+    clients with ``await conn.resources.get("db")``. Resources listed in
+    ``checkout`` are borrowed right away into ``conn.private[name]``.
+    """
+
+    def __init__(self, registry: ResourceRegistry, checkout: Iterable[str] = ()):
+        super().__init__()
+        self.registry = registry
+        self.checkout = list(checkout)
+
+    async def call(self, conn: Conn):
+        resources = conn.private["resources"] = Checkout(self.registry, conn)
+        for name in self.checkout:
+            conn.private[name] = await resources.get(name)
+        return conn
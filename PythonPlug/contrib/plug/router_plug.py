@@ -1,15 +1,227 @@
+import asyncio
 import functools
+import inspect
+import os
+import time
 from collections import OrderedDict, namedtuple
 from http import HTTPStatus
 from types import FunctionType
-from typing import Callable, Iterable, Optional
+from typing import Callable, Iterable, List, Optional, Tuple, Union
 
 from werkzeug.routing import Map, MethodNotAllowed, NotFound, RequestRedirect, Rule
 
 from PythonPlug import Conn
+from PythonPlug.deadline import call_with_deadline
+from PythonPlug.exception import PythonPlugRuntimeError
 from PythonPlug.plug import Plug
+from PythonPlug.tracing import traced
 
 Forward = namedtuple("Forward", ["to", "change_path"])
+Mount = namedtuple("Mount", ["app", "interface", "lifespan"])
+Preload = namedtuple("Preload", ["paths", "links"])
+
+PRELOAD_TYPES = {
+    ".css": "style",
+    ".js": "script",
+    ".mjs": "script",
+    ".woff": "font",
+    ".woff2": "font",
+    ".ttf": "font",
+    ".otf": "font",
+    ".png": "image",
+    ".jpg": "image",
+    ".jpeg": "image",
+    ".gif": "image",
+    ".svg": "image",
+    ".webp": "image",
+    ".avif": "image",
+}
+
+
+def preload_link(resource: Union[str, Tuple[str, str]]) -> str:
+    """
+    ``link`` header value preloading ``resource``, a path or a
+    ``(path, as)`` pair. ``as`` is guessed from the extension of a bare path.
+    """
+    if isinstance(resource, tuple):
+        path, as_ = resource
+    else:
+        path = resource
+        as_ = PRELOAD_TYPES.get(os.path.splitext(path)[1].lower(), "fetch")
+    link = f"<{path}>; rel=preload; as={as_}"
+    if as_ in ("font", "fetch"):
+        link += "; crossorigin"
+    return link
+
+
+class MountedLifespan:
+    """
+    Drives the lifespan protocol of a mounted ASGI app. Apps that raise or
+    return before answering ``lifespan.startup`` are taken as not supporting
+    lifespan, as the spec allows.
+    """
+
+    def __init__(self, app, interface=Conn.ASGI3):
+        self.app = app
+        self.interface = interface
+        self.task: Optional[asyncio.Future] = None
+        self.receive_queue: Optional[asyncio.Queue] = None
+        self.send_queue: Optional[asyncio.Queue] = None
+
+    async def run(self):
+        scope = {"type": "lifespan", "asgi": {"version": "3.0"}}
+        if self.interface == Conn.ASGI2:
+            return await self.app(scope)(self.receive_queue.get, self.send_queue.put)
+        return await self.app(scope, self.receive_queue.get, self.send_queue.put)
+
+    async def step(self, message_type: str):
+        await self.receive_queue.put({"type": message_type})
+        reply = asyncio.ensure_future(self.send_queue.get())
+        await asyncio.wait([reply, self.task], return_when=asyncio.FIRST_COMPLETED)
+        if not reply.done():
+            # the app finished without replying: lifespan is not supported
+            reply.cancel()
+            if not self.task.cancelled():
+                self.task.exception()  # retrieved, so it is not logged
+            self.task = None
+            return
+        message = reply.result()
+        if message.get("type") == f"{message_type}.failed":
+            raise PythonPlugRuntimeError(
+                f"{message_type} failed: {message.get('message', '')}"
+            )
+
+    async def startup(self):
+        self.receive_queue = asyncio.Queue()
+        self.send_queue = asyncio.Queue()
+        self.task = asyncio.ensure_future(self.run())
+        await self.step("lifespan.startup")
+
+    async def shutdown(self):
+        if self.task is None:
+            return
+        await self.step("lifespan.shutdown")
+        if self.task is not None:
+            await self.task
+            self.task = None
+
+
+def has_resp_state(conn: Conn) -> bool:
+    """
+    Whether earlier plugs set headers, cookies or trailers on the response.
+    """
+    # pylint: disable=protected-access
+    return bool(
+        conn.resp_headers or conn._resp_cookies or conn.resp_trailers is not None
+    )
+
+
+def merge_resp_state(conn: Conn, start_message: dict) -> dict:
+    """
+    A copy of ``start_message`` with the headers, cookies and trailers
+    earlier plugs set on ``conn``. Headers already in the message win.
+    """
+    own = {k.lower() for k, _ in start_message.get("headers", [])}
+    headers = list(start_message.get("headers", []))
+    for k, v in conn.resp_headers.items():
+        key = k.encode("ascii")
+        if key.lower() not in own:
+            headers.append([key, v.encode("ascii")])
+    # pylint: disable=protected-access
+    for value in (conn._resp_cookies or {}).values():
+        headers.append([b"Set-Cookie", value.OutputString().encode("ascii")])
+    message = dict(start_message, headers=headers)
+    if conn.resp_trailers is not None:
+        message["trailers"] = True
+    return message
+
+
+class PrecomputedResponse:
+    """
+    A response kept as ready-made ASGI messages, so serving it is two
+    ``send`` calls with nothing encoded per request.
+
+    With ``refresh`` (a plain or coroutine function returning ``body`` or
+    ``(body, status, headers)``) the messages are rebuilt every ``interval``
+    seconds: in the background on the first request after they expire, while
+    the stale response keeps being served. ``RouterPlug.startup`` computes
+    them before the first request.
+
+    Headers, cookies and trailers earlier plugs put on the conn are added to
+    the response; its own headers win when both set one.
+    """
+
+    def __init__(
+        self,
+        body: bytes = b"",
+        status: int = 200,
+        headers: Optional[Iterable] = None,
+        *,
+        refresh: Optional[Callable] = None,
+        interval: Optional[float] = None,
+    ):
+        self.refresh = refresh
+        self.interval = interval
+        self.expires = float("inf")
+        self.refreshing: Optional[asyncio.Future] = None
+        self.start_message: Optional[dict] = None
+        self.body_message: Optional[dict] = None
+        self.status = status
+        if refresh is None:
+            self.set(body, status, headers)
+
+    def set(self, body: bytes, status: int = 200, headers: Optional[Iterable] = None):
+        encoded = [
+            [k.encode("ascii"), v.encode("ascii")]
+            for k, v in (
+                headers.items() if hasattr(headers, "items") else headers or []
+            )
+        ]
+        encoded.append([b"content-length", str(len(body)).encode("ascii")])
+        self.status = int(status)
+        # replaced, never mutated, so requests in flight keep a consistent pair
+        self.start_message, self.body_message = (
+            {"type": "http.response.start", "status": self.status, "headers": encoded},
+            {"type": "http.response.body", "body": body, "more_body": False},
+        )
+
+    async def update(self):
+        result = self.refresh()
+        if inspect.isawaitable(result):
+            result = await result
+        if isinstance(result, tuple):
+            self.set(*result)
+        else:
+            self.set(result)
+        if self.interval is not None:
+            self.expires = time.monotonic() + self.interval
+
+    async def _update_in_background(self):
+        try:
+            await self.update()
+        finally:
+            self.refreshing = None
+
+    async def __call__(self, conn: Conn):
+        if self.start_message is None:
+            await self.update()
+        elif self.refreshing is None and time.monotonic() >= self.expires:
+            self.refreshing = asyncio.ensure_future(self._update_in_background())
+        start_message, body_message = self.start_message, self.body_message
+        conn.status = self.status
+        if has_resp_state(conn):
+            start_message = merge_resp_state(conn, start_message)
+        await conn.send(start_message)
+        await conn.send(body_message)
+        return conn
+
+    async def startup(self):
+        if self.refresh is not None:
+            await self.update()
+
+    async def shutdown(self):
+        if self.refreshing is not None:
+            self.refreshing.cancel()
 
 
 class RouterPlug(Plug):
@@ -17,15 +229,55 @@ class RouterPlug(Plug):
         super().__init__()
         self.url_map = Map()
         self.endpoint_to_plug = {}
+        self.endpoint_timeouts = {}
+        self.endpoint_preloads = {}
         self.forwards = OrderedDict()
+        self.mounts = OrderedDict()
+
+    def route(
+        self,
+        rule,
+        methods=None,
+        name="",
+        timeout=None,
+        response: Union[bytes, PrecomputedResponse, None] = None,
+        preload: Optional[List[Union[str, Tuple[str, str]]]] = None,
+    ):
+        """
+        Decorates the plug handling ``rule``. With ``response`` (bytes or a
+        ``PrecomputedResponse``) the route is added right away and always
+        answers with it; ``timeout`` and ``preload`` still apply.
 
-    def route(self, rule, methods=None, name=""):
+        ``preload`` lists assets the page needs (paths or ``(path, as)``
+        pairs). Before the plug runs they are pushed over HTTP/2, or
+        announced in a 103 Early Hints response, when the server supports
+        it; the response also carries them in a ``link`` header.
+        """
         methods = set(methods) if methods is not None else None
         if methods and not "OPTIONS" in methods:
             methods.add("OPTIONS")
+        if response is not None:
+            if not isinstance(response, PrecomputedResponse):
+                response = PrecomputedResponse(response)
+            self.add_route(
+                rule_string=rule,
+                plug=response,
+                methods=methods,
+                name=name or rule,
+                timeout=timeout,
+                preload=preload,
+            )
+            return response
 
         def decorator(name: Optional[str], plug: Callable):
-            self.add_route(rule_string=rule, plug=plug, methods=methods, name=name)
+            self.add_route(
+                rule_string=rule,
+                plug=plug,
+                methods=methods,
+                name=name,
+                timeout=timeout,
+                preload=preload,
+            )
             return plug
 
         return functools.partial(decorator, name)
@@ -55,11 +307,48 @@ class RouterPlug(Plug):
                 if change_path:
                     conn._scope["path"] = conn.private["remaining_path"]
                 return await router(conn)
+            mount_matches = [
+                prefix
+                for prefix in self.mounts
+                if conn.private["remaining_path"] == prefix
+                or conn.private["remaining_path"].startswith(prefix + "/")
+            ]
+            if mount_matches:
+                return await self.call_mount(conn, max(mount_matches, key=len))
             return conn
         else:
-            plug = self.endpoint_to_plug.get(rule.endpoint)
             conn.private.setdefault("router_args", {}).update(args)
-            return await plug(conn)
+            conn.private["endpoint"] = rule.endpoint
+            if conn.span is not None:
+                return await traced(
+                    conn,
+                    f"route {rule.endpoint}",
+                    self.call_endpoint,
+                    conn,
+                    rule.endpoint,
+                    rule=rule.rule,
+                )
+            return await self.call_endpoint(conn, rule.endpoint)
+
+    async def call_endpoint(self, conn: Conn, endpoint: str):
+        plug = self.endpoint_to_plug.get(endpoint)
+        preload = self.endpoint_preloads.get(endpoint)
+        if preload is not None:
+            await self.send_preloads(conn, preload)
+        timeout = self.endpoint_timeouts.get(endpoint)
+        if timeout is not None:
+            conn.set_timeout(timeout)
+            return await call_with_deadline(conn, plug)
+        return await plug(conn)
+
+    @staticmethod
+    async def send_preloads(conn: Conn, preload: Preload):
+        if conn.has_extension("http.response.push"):
+            for path in preload.paths:
+                await conn.push(path)
+        else:
+            await conn.send_early_hints(preload.links)
+        conn.put_resp_header("link", ", ".join(preload.links))
 
     def url_adapter(self, conn: Conn):
         scope = conn.scope
@@ -81,6 +370,8 @@ class RouterPlug(Plug):
         plug: Callable,
         name: Optional[str] = None,
         methods: Optional[Iterable[str]] = None,
+        timeout: Optional[float] = None,
+        preload: Optional[List[Union[str, Tuple[str, str]]]] = None,
     ):
         if not name:
             if isinstance(plug, FunctionType):
@@ -92,6 +383,95 @@ class RouterPlug(Plug):
         )
         self.url_map.add(Rule(rule_string, endpoint=name, methods=methods))
         self.endpoint_to_plug[name] = plug
+        if timeout is not None:
+            self.endpoint_timeouts[name] = timeout
+        if preload:
+            self.endpoint_preloads[name] = Preload(
+                [r[0] if isinstance(r, tuple) else r for r in preload],
+                [preload_link(r) for r in preload],
+            )
+
+    async def call_mount(self, conn: Conn, prefix: str):
+        app = self.mounts[prefix].app
+        scope = conn.scope
+        remaining_path = conn.private["remaining_path"]
+        # prefixes earlier routers forwarded on, whether or not they changed
+        # the path
+        consumed = "".join(conn.private.get("consumed_path", []))
+        sub_scope = dict(scope)
+        sub_scope["root_path"] = scope.get("root_path", "") + consumed + prefix
+        sub_scope["path"] = remaining_path[len(prefix) :] or "/"
+        # pylint: disable=protected-access
+        if (
+            conn._after_start
+            or conn._before_send
+            or conn._after_send
+            or has_resp_state(conn)
+        ):
+            receive, send = conn.receive, self.mounted_send(conn)
+        else:
+            # nothing to observe the response: hand over the server's callables
+            receive, send = conn._receive, conn._send
+        if self.mounts[prefix].interface == Conn.ASGI2:
+            await app(sub_scope)(receive, send)
+        else:
+            await app(sub_scope, receive, send)
+        conn.started = conn.halted = True
+        return conn
+
+    @staticmethod
+    def mounted_send(conn: Conn):
+        """
+        ``send`` for a mounted app, going through ``conn.send`` and adding
+        the response state earlier plugs set to the app's start message.
+        """
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                conn.status = message.get("status", 200)
+                if has_resp_state(conn):
+                    message = merge_resp_state(conn, message)
+            return await conn.send(message)
+
+        return send
+
+    def mount(self, prefix: str, app, interface=Conn.ASGI3, lifespan: bool = True):
+        """
+        Hands requests under ``prefix`` to the ASGI ``app`` with ``root_path``
+        and ``path`` adjusted in a copy of the scope. The app is created once,
+        not per request. With ``lifespan`` the app's lifespan events are
+        forwarded by ``startup``/``shutdown`` (see ``install``).
+        """
+        prefix = prefix.rstrip("/")
+        assert prefix not in self.mounts, "Cannot mount same prefix twice: %s" % prefix
+        self.mounts[prefix] = Mount(
+            app, interface, MountedLifespan(app, interface) if lifespan else None
+        )
+        return app
+
+    def _lifespan_targets(self):
+        for mount in self.mounts.values():
+            if mount.lifespan is not None:
+                yield mount.lifespan
+        for forward in self.forwards.values():
+            if isinstance(forward.to, RouterPlug):
+                yield forward.to
+        for plug in self.endpoint_to_plug.values():
+            if isinstance(plug, (RouterPlug, PrecomputedResponse)):
+                yield plug
+
+    async def startup(self):
+        for target in self._lifespan_targets():
+            await target.startup()
+
+    async def shutdown(self):
+        for target in reversed(list(self._lifespan_targets())):
+            await target.shutdown()
+
+    def install(self, adapter):
+        adapter.on_startup(self.startup)
+        adapter.on_shutdown(self.shutdown)
+        return adapter
 
     def forward(self, prefix, router=None, change_path=False):
         assert prefix not in self.forwards, (
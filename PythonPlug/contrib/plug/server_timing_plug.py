@@ -0,0 +1,73 @@
+import base64
+import hashlib
+import time
+from typing import Optional
+
+from PythonPlug.conn import Conn
+from PythonPlug.plug import Plug
+
+DIGEST_NAMES = {"sha256": "sha-256", "sha512": "sha-512", "md5": "md5"}
+
+
+def server_timing(conn: Conn, now: float) -> str:
+    """
+    ``server-timing`` value with the duration of every plug timed on the
+    conn. Plugs still running (the ones that sent the body) report the time
+    elapsed so far.
+    """
+    return ", ".join(
+        "%s;dur=%.3f" % (name, ((end or now) - start) * 1000)
+        for name, start, end in conn.plug_timings
+    )
+
+
+class ServerTimingPlug(Plug):
+    """
+    Times every plug after it and sends the timings as a ``server-timing``
+    trailer, plus a ``content-digest`` trailer over the body when
+    ``checksum`` names a hashlib algorithm. Needs a server supporting the
+    ``http.response.trailers`` extension; on other servers the conn is left
+    untouched. Because the values go in trailers, streamed responses do not
+    need to be buffered to report them.
+    """
+
+    def __init__(self, checksum: Optional[str] = "sha256"):
+        super().__init__()
+        assert checksum is None or checksum in DIGEST_NAMES, checksum
+        self.checksum = checksum
+
+    async def call(self, conn: Conn):
+        names = ["server-timing"] + (["content-digest"] if self.checksum else [])
+        if not conn.enable_trailers(*names):
+            return conn
+        conn.plug_timings = []
+        conn.private["server_timing_start"] = time.perf_counter()
+        if self.checksum:
+            digest = conn.private["server_timing_digest"] = hashlib.new(self.checksum)
+
+            async def update_digest(conn, message):  # pylint: disable=unused-argument
+                if message["type"] == "http.response.body":
+                    digest.update(message.get("body", b""))
+
+            conn.register_before_send(update_digest)
+        conn.register_before_trailers(self.put_trailers)
+        return conn
+
+    async def put_trailers(self, conn: Conn):
+        now = time.perf_counter()
+        total = (now - conn.private["server_timing_start"]) * 1000
+        timings = server_timing(conn, now)
+        conn.put_resp_trailer(
+            "server-timing",
+            (
+                f"{timings}, total;dur={total:.3f}"
+                if timings
+                else f"total;dur={total:.3f}"
+            ),
+        )
+        if self.checksum:
+            digest = conn.private["server_timing_digest"].digest()
+            conn.put_resp_trailer(
+                "content-digest",
+                f"{DIGEST_NAMES[self.checksum]}=:{base64.b64encode(digest).decode()}:",
+            )
@@ -0,0 +1,231 @@
+import asyncio
+from collections import deque
+from typing import Callable, Dict, List, Optional, Union
+
+from PythonPlug.conn import Conn
+from PythonPlug.plug import Plug
+
+KEEPALIVE = b": keepalive\n\n"
+
+
+def encode_event(
+    data: Union[str, bytes],
+    *,
+    event: Optional[str] = None,
+    event_id: Optional[str] = None,
+    retry: Optional[int] = None,
+) -> bytes:
+    """
+    One event in the ``text/event-stream`` format. Multi-line ``data`` is
+    split over several ``data:`` fields.
+    """
+    if isinstance(data, bytes):
+        data = data.decode("utf-8")
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    if retry is not None:
+        lines.append(f"retry: {retry}")
+    lines.extend("data: " + line for line in data.splitlines() or [""])
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+async def start_event_stream(conn: Conn, retry: Optional[int] = None):
+    """
+    Starts a ``text/event-stream`` response on ``conn``; events are then
+    sent with ``send_event``. ``retry`` is the reconnection delay, in
+    milliseconds, suggested to the client.
+    """
+    conn.put_resp_header("content-type", "text/event-stream; charset=utf-8")
+    conn.put_resp_header("cache-control", "no-cache")
+    # keep nginx from buffering the stream
+    conn.put_resp_header("x-accel-buffering", "no")
+    await conn.start_resp()
+    if retry is not None:
+        await conn.send_resp(f"retry: {retry}\n\n".encode("ascii"))
+    return conn
+
+
+async def send_event(conn: Conn, data: Union[str, bytes], **fields):
+    return await conn.send_resp(encode_event(data, **fields))
+
+
+class Subscriber:
+    """
+    Events waiting to be written to one stream. When more than ``limit``
+    are pending the subscriber is dropped rather than buffering without
+    bound; the client reconnects and catches up from the channel's buffer.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.pending: deque = deque()
+        self.closed = False
+        self.wakeup = asyncio.Event()
+
+    def put(self, payload: bytes):
+        if len(self.pending) >= self.limit:
+            self.close()
+            return
+        self.pending.append(payload)
+        self.wakeup.set()
+
+    def close(self):
+        self.closed = True
+        self.wakeup.set()
+
+
+class Channel:
+    """
+    A named event stream. ``publish`` encodes each event once and hands the
+    same bytes to every subscriber. The last ``buffer_size`` events are kept
+    so reconnecting clients can replay what they missed from their
+    ``last-event-id``.
+    """
+
+    def __init__(self, name: str, buffer_size: int = 1000):
+        self.name = name
+        self.buffer: deque = deque(maxlen=buffer_size)
+        self.last_id = 0
+        self.subscribers: List[Subscriber] = []
+
+    def publish(self, data: Union[str, bytes], event: Optional[str] = None) -> int:
+        self.last_id += 1
+        payload = encode_event(data, event=event, event_id=str(self.last_id))
+        self.buffer.append((self.last_id, payload))
+        for subscriber in self.subscribers:
+            subscriber.put(payload)
+        return self.last_id
+
+    def since(self, last_event_id: Optional[str]) -> List[bytes]:
+        try:
+            last_id = int(last_event_id or "")
+        except ValueError:
+            return []
+        if last_id > self.last_id:
+            # ids from before a restart, they cannot be matched up
+            return []
+        return [payload for event_id, payload in self.buffer if event_id > last_id]
+
+    def subscribe(self, limit: int) -> Subscriber:
+        subscriber = Subscriber(limit)
+        self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+
+    def close(self):
+        for subscriber in self.subscribers:
+            subscriber.close()
+
+
+class EventBroker:
+    """
+    The channels of an app, created on first use.
+    """
+
+    def __init__(self, buffer_size: int = 1000):
+        self.buffer_size = buffer_size
+        self.channels: Dict[str, Channel] = {}
+
+    def channel(self, name: str) -> Channel:
+        channel = self.channels.get(name)
+        if channel is None:
+            channel = self.channels[name] = Channel(name, self.buffer_size)
+        return channel
+
+    def publish(self, name: str, data: Union[str, bytes], event=None) -> int:
+        return self.channel(name).publish(data, event)
+
+    def close(self):
+        for channel in self.channels.values():
+            channel.close()
+
+    def stats(self) -> List[dict]:
+        return [
+            {
+                "channel": name,
+                "subscribers": len(channel.subscribers),
+                "last_id": channel.last_id,
+                "buffered": len(channel.buffer),
+            }
+            for name, channel in self.channels.items()
+        ]
+
+
+class SSEPlug(Plug):
+    """
+    Streams a channel of ``broker`` as Server-Sent Events. ``channel`` is a
+    channel name or a function of the conn returning one (e.g. from
+    ``router_args``). Events published while the client was away are
+    replayed from its ``last-event-id``, and a comment is sent every
+    ``keepalive`` seconds of silence so proxies keep the connection open.
+    Events published in a burst are written in one message. The stream
+    ends when the client disconnects or the broker is closed.
+    """
+
+    def __init__(
+        self,
+        broker: EventBroker,
+        channel: Union[str, Callable[[Conn], str]],
+        *,
+        keepalive: float = 15.0,
+        retry: Optional[int] = None,
+        max_pending: int = 1000,
+    ):
+        super().__init__()
+        self.broker = broker
+        self.channel = channel
+        self.keepalive = keepalive
+        self.retry = retry
+        self.max_pending = max_pending
+
+    async def call(self, conn: Conn):
+        name = self.channel(conn) if callable(self.channel) else self.channel
+        channel = self.broker.channel(name)
+        # no await in between, so no event is both replayed and pending
+        missed = channel.since(conn.req_headers.get("last-event-id"))
+        subscriber = channel.subscribe(self.max_pending)
+        watcher = asyncio.ensure_future(self.watch_disconnect(conn, subscriber))
+        try:
+            await start_event_stream(conn, self.retry)
+            if missed:
+                await conn.send_resp(b"".join(missed))
+            await self.stream(conn, subscriber)
+        finally:
+            channel.unsubscribe(subscriber)
+            watcher.cancel()
+        if not conn.halted and not conn.client_disconnected:
+            await conn.halt()
+        return conn
+
+    async def stream(self, conn: Conn, subscriber: Subscriber):
+        while True:
+            try:
+                await asyncio.wait_for(subscriber.wakeup.wait(), self.keepalive)
+            except asyncio.TimeoutError:
+                await conn.send_resp(KEEPALIVE)
+                continue
+            subscriber.wakeup.clear()
+            if subscriber.pending:
+                pending = subscriber.pending
+                # a lone event is sent as the bytes shared by all subscribers
+                payload = pending[0] if len(pending) == 1 else b"".join(pending)
+                subscriber.pending.clear()
+                await conn.send_resp(payload)
+            if subscriber.closed:
+                return
+
+    @staticmethod
+    async def watch_disconnect(conn: Conn, subscriber: Subscriber):
+        while True:
+            message = await conn.receive()
+            if message.get("type") == "http.disconnect":
+                conn.client_disconnected = True
+                subscriber.pending.clear()
+                subscriber.close()
+                return
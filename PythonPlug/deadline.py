@@ -0,0 +1,38 @@
+import asyncio
+from http import HTTPStatus
+
+from .exception import RequestTimeout
+
+
+async def deadline_exceeded(conn):
+    """
+    Responds 504 when the deadline passes before the response started. A
+    started response cannot be fixed up, so ``RequestTimeout`` is raised to
+    let the server abort it. Websockets are closed with code 1011 instead.
+    """
+    if conn.scope.get("type") == "websocket":
+        await conn.send({"type": "websocket.close", "code": 1011})
+        return conn
+    if not conn.started:
+        return await conn.send_resp(b"", HTTPStatus.GATEWAY_TIMEOUT, halt=True)
+    if not conn.halted:
+        raise RequestTimeout("Deadline exceeded after the response started")
+    return conn
+
+
+async def call_with_deadline(conn, plug):
+    """
+    Calls ``plug(conn)``, cancelling it when ``conn.deadline`` passes.
+    """
+    remaining = conn.time_remaining()
+    if remaining is None:
+        return await plug(conn)
+    if remaining <= 0:
+        return await deadline_exceeded(conn)
+    try:
+        return await asyncio.wait_for(plug(conn), remaining)
+    except asyncio.TimeoutError:
+        if conn.time_remaining() > 0:
+            # raised by the plug itself, not by our deadline
+            raise
+        return await deadline_exceeded(conn)
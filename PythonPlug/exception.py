@@ -6,9 +6,25 @@ class HTTPRequestError(PythonPlugException):
     pass
 
 
+class RequestBodyTooLarge(HTTPRequestError):
+    pass
+
+
+class RequestTimeout(HTTPRequestError):
+    pass
+
+
 class HTTPStateError(PythonPlugException):
     pass
 
 
+class ExecutorRejected(PythonPlugException):
+    pass
+
+
+class UpstreamError(PythonPlugException):
+    pass
+
+
 class PythonPlugRuntimeError(RuntimeError):
     pass
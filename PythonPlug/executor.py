@@ -0,0 +1,272 @@
+import asyncio
+import functools
+import importlib
+from http import HTTPStatus
+from typing import Callable, Dict, Optional
+
+from .exception import ExecutorRejected
+
+
+class Pool:  # pylint: disable=too-many-instance-attributes
+    """
+    A bounded executor. At most ``max_workers`` calls run at once and at most
+    ``max_queue`` more wait for a worker; further calls are rejected with
+    ``ExecutorRejected`` instead of piling up.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        max_workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        process: bool = False,
+    ):
+        self.name = name
+        self.process = process
+        self.max_workers = max_workers or 4
+        self.max_queue = max_queue
+        self._executor = None
+
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            # concurrent.futures loads the process pool (and multiprocessing)
+            # only when asked for it
+            from concurrent import futures  # pylint: disable=import-outside-toplevel
+
+            executor_class = (
+                futures.ProcessPoolExecutor
+                if self.process
+                else futures.ThreadPoolExecutor
+            )
+            self._executor = executor_class(max_workers=self.max_workers)
+        return self._executor
+
+    @property
+    def running(self) -> int:
+        return min(self.in_flight, self.max_workers)
+
+    @property
+    def queued(self) -> int:
+        return self.in_flight - self.running
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None):
+        if (
+            self.max_queue is not None
+            and self.in_flight >= self.max_workers + self.max_queue
+        ):
+            self.rejected += 1
+            raise ExecutorRejected(f"Pool {self.name} is full")
+        loop = asyncio.get_event_loop()
+        future = self.executor.submit(fn, *args)
+        self.submitted += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        # counted when the work is really done, not when the caller gives up
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(self._on_done, f))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+    def _on_done(self, future):
+        self.in_flight -= 1
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "kind": "process" if self.process else "thread",
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "queued": self.queued,
+            "max_in_flight": self.max_in_flight,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+_pools: Dict[str, Pool] = {}
+
+
+def configure_pool(name: str, **kwargs) -> Pool:
+    """
+    Creates or replaces the pool called ``name``. ``"default"`` is used by
+    ``blocking`` plugs and ``"process"`` by ``cpu_bound`` plugs.
+    """
+    if name in _pools:
+        _pools[name].shutdown(wait=False)
+    pool = _pools[name] = Pool(name, **kwargs)
+    return pool
+
+
+def get_pool(name: str = "default") -> Pool:
+    if name not in _pools:
+        configure_pool(name, process=name == "process")
+    return _pools[name]
+
+
+def pool_stats() -> Dict[str, dict]:
+    return {name: pool.stats() for name, pool in _pools.items()}
+
+
+def shutdown_pools(wait: bool = True):
+    for pool in _pools.values():
+        pool.shutdown(wait=wait)
+    _pools.clear()
+
+
+async def respond_unavailable(conn):
+    if not conn.started and not conn.halted:
+        await conn.send_resp(b"", HTTPStatus.SERVICE_UNAVAILABLE, halt=True)
+    return conn
+
+
+async def _apply_result(conn, result, result_key: Optional[str]):
+    if isinstance(result, bytes):
+        if not conn.halted:
+            await conn.send_resp(result, halt=True)
+    elif result is not None and result is not conn and result_key:
+        conn.private[result_key] = result
+    return conn
+
+
+async def run_blocking(
+    conn,
+    fn: Callable,
+    *args,
+    pool: str = "default",
+    timeout: Optional[float] = None,
+    result_key: Optional[str] = None,
+):
+    """
+    Runs ``fn(*args)`` in ``pool``. Returned bytes are sent as the response;
+    any other value is stored in ``conn.private[result_key]``. Responds 503
+    when the call times out or the pool is full. A timed out call is not
+    interrupted, its result is dropped.
+    """
+    try:
+        result = await get_pool(pool).run(fn, *args, timeout=timeout)
+    except (asyncio.TimeoutError, ExecutorRejected):
+        return await respond_unavailable(conn)
+    return await _apply_result(conn, result, result_key)
+
+
+def blocking(fn=None, *, pool: str = "default", timeout: Optional[float] = None):
+    """
+    Turns a synchronous ``fn(conn)`` into a plug that runs in a thread pool.
+    ``fn`` may change the conn's fields and return bytes to respond with.
+    """
+    if fn is None:
+        return functools.partial(blocking, pool=pool, timeout=timeout)
+
+    @functools.wraps(fn)
+    async def plug(conn):
+        return await run_blocking(
+            conn, fn, conn, pool=pool, timeout=timeout, result_key=fn.__name__
+        )
+
+    return plug
+
+
+class ConnSnapshot:  # pylint: disable=too-many-instance-attributes
+    """
+    Picklable copy of the request parts of a conn, passed to ``cpu_bound``
+    functions in other processes.
+    """
+
+    __slots__ = (
+        "method",
+        "scheme",
+        "path",
+        "root_path",
+        "query_string",
+        "headers",
+        "client",
+        "router_args",
+        "body",
+    )
+
+    def __init__(self, conn, body: Optional[bytes] = None):
+        scope = conn.scope
+        self.method = scope.get("method")
+        self.scheme = scope.get("scheme")
+        self.path = scope.get("path")
+        self.root_path = scope.get("root_path", "")
+        self.query_string = scope.get("query_string", b"")
+        self.headers = list(conn.req_headers.items())
+        self.client = scope.get("client")
+        self.router_args = dict(conn.private.get("router_args", {}))
+        self.body = body
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+def _call_by_reference(module: str, qualname: str, snapshot: ConnSnapshot):
+    # decorated functions are replaced by their plug, so they cannot be
+    # pickled by reference; look the original up in the worker instead
+    obj = importlib.import_module(module)
+    for name in qualname.split("."):
+        obj = getattr(obj, name)
+    return getattr(obj, "__wrapped__", obj)(snapshot)
+
+
+def cpu_bound(
+    fn=None,
+    *,
+    pool: str = "process",
+    timeout: Optional[float] = None,
+    with_body: bool = False,
+):
+    """
+    Turns a module level ``fn(snapshot)`` into a plug that runs it in a
+    process pool with a ``ConnSnapshot`` of the conn. Returned bytes are sent
+    as the response, other values are stored in ``conn.private[fn.__name__]``.
+    """
+    if fn is None:
+        return functools.partial(
+            cpu_bound, pool=pool, timeout=timeout, with_body=with_body
+        )
+
+    @functools.wraps(fn)
+    async def plug(conn):
+        body = await conn.body() if with_body else None
+        return await run_blocking(
+            conn,
+            _call_by_reference,
+            fn.__module__,
+            fn.__qualname__,
+            ConnSnapshot(conn, body),
+            pool=pool,
+            timeout=timeout,
+            result_key=fn.__name__,
+        )
+
+    return plug
@@ -0,0 +1,217 @@
+import gc
+import os
+import time
+import tracemalloc
+import types
+import weakref
+from collections import deque
+from typing import Dict, List, Optional
+
+from .conn import ALLOCATIONS_KEY
+
+
+def traced_memory() -> int:
+    return tracemalloc.get_traced_memory()[0]
+
+
+def _attribute_name(owner, target) -> str:
+    return next((k for k, v in vars(owner).items() if v is target), "<attribute>")
+
+
+def _dict_owner(referrer: dict, target) -> str:
+    for owner in gc.get_referrers(referrer):
+        if getattr(owner, "__dict__", None) is referrer:
+            return f"{type(owner).__name__}.{_attribute_name(owner, target)}"
+    return "dict"
+
+
+def _cell_owner(referrer) -> str:
+    # cell <- function.__closure__ tuple <- function
+    for closure in gc.get_referrers(referrer):
+        for function in gc.get_referrers(closure):
+            if getattr(function, "__closure__", None) is closure:
+                return f"closure {function.__qualname__}"
+    return "closure"
+
+
+def describe_referrer(referrer, target) -> str:
+    """
+    A readable name for what holds ``target``: ``Class.attribute`` for an
+    instance attribute, ``closure <function>`` for a closure cell...
+    """
+    if isinstance(referrer, dict):
+        return _dict_owner(referrer, target)
+    if type(referrer).__name__ == "cell":
+        return _cell_owner(referrer)
+    if isinstance(referrer, types.FrameType):
+        return f"frame {referrer.f_code.co_name}"
+    if isinstance(referrer, types.MethodType):
+        return f"bound method {referrer.__func__.__qualname__}"
+    if hasattr(referrer, "__dict__") and not isinstance(referrer, type):
+        # instances whose attributes are not kept in a separate dict
+        return f"{type(referrer).__name__}.{_attribute_name(referrer, target)}"
+    return type(referrer).__name__
+
+
+class AllocationTracker:  # pylint: disable=too-many-instance-attributes
+    """
+    Debug mode for memory growth, enabled with
+    ``ASGIAdapter(plug, allocation_tracker=AllocationTracker())``.
+
+    Every ``sample_every`` requests, the bytes a request still holds when
+    each plug returns, and when the request finishes, are recorded per plug
+    and per ``RouterPlug`` endpoint. These are ``tracemalloc`` deltas, so
+    requests running concurrently blur them; compare averages. Sampled conns
+    are then watched to report the ones still alive after they finished, with
+    what holds them. ``report()`` also lists the source lines whose traced
+    memory grew the most since tracking started.
+
+    Tracing every allocation slows the worker down; keep this for debugging.
+    """
+
+    def __init__(
+        self,
+        sample_every: int = 100,
+        *,
+        frames: int = 1,
+        max_watched: int = 100,
+    ):
+        self.sample_every = sample_every
+        self.frames = frames
+        self.requests = 0
+        self.samples = 0
+        self.plugs: Dict[str, List[int]] = {}
+        self.endpoints: Dict[str, List[int]] = {}
+        self.watched: deque = deque(maxlen=max_watched)
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.started_tracing = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self.started_tracing = True
+        self.baseline = tracemalloc.take_snapshot()
+
+    def start_request(self, conn) -> bool:
+        self.requests += 1
+        if self.requests % self.sample_every:
+            return False
+        if self.baseline is None or not tracemalloc.is_tracing():
+            self.start()
+        conn.private[ALLOCATIONS_KEY] = []
+        conn.private["allocations_start"] = traced_memory()
+        return True
+
+    def finish_request(self, conn):
+        allocated = traced_memory() - conn.private.pop("allocations_start")
+        self.samples += 1
+        for name, start, end in conn.private.pop(ALLOCATIONS_KEY):
+            self.record(self.plugs, name, (end or start) - start)
+        endpoint = conn.private.get("endpoint")
+        if endpoint is not None:
+            self.record(self.endpoints, endpoint, allocated)
+        self.watched.append(
+            (
+                weakref.ref(conn),
+                endpoint or conn.scope.get("path"),
+                time.monotonic(),
+                len(conn._after_send),  # pylint: disable=protected-access
+            )
+        )
+
+    @staticmethod
+    def record(table: Dict[str, List[int]], name: str, size: int):
+        stats = table.get(name)
+        if stats is None:
+            stats = table[name] = [0, 0, size]
+        stats[0] += 1
+        stats[1] += size
+        stats[2] = max(stats[2], size)
+
+    def retained(self) -> List[dict]:
+        """
+        Sampled conns still alive after a full collection, with what holds
+        them.
+        """
+        gc.collect()
+        now = time.monotonic()
+        retained = []
+        for ref, name, finished, callbacks in self.watched:
+            conn = ref()
+            if conn is None:
+                continue
+            # a plain loop: a comprehension would close over conn itself
+            holders, referrer = set(), None
+            for referrer in gc.get_referrers(conn):
+                if not (
+                    isinstance(referrer, types.FrameType)
+                    and referrer.f_code.co_filename == __file__
+                ):
+                    holders.add(describe_referrer(referrer, conn))
+            del conn, referrer
+            retained.append(
+                {
+                    "conn": name,
+                    "finished_seconds_ago": round(now - finished, 3),
+                    "after_send_callbacks": callbacks,
+                    "held_by": sorted(holders),
+                }
+            )
+        return retained
+
+    def growth(self, limit: int = 20) -> List[dict]:
+        if self.baseline is None or not tracemalloc.is_tracing():
+            return []
+        ignored = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ]
+        snapshot = tracemalloc.take_snapshot().filter_traces(ignored)
+        stats = snapshot.compare_to(self.baseline.filter_traces(ignored), "lineno")
+        return [
+            {
+                "site": f"{os.path.relpath(stat.traceback[0].filename)}:"
+                f"{stat.traceback[0].lineno}",
+                "size_diff": stat.size_diff,
+                "count_diff": stat.count_diff,
+                "size": stat.size,
+            }
+            for stat in stats[:limit]
+            if stat.size_diff > 0
+        ]
+
+    @staticmethod
+    def summary(table: Dict[str, List[int]], key: str) -> List[dict]:
+        rows = [
+            {
+                key: name,
+                "samples": samples,
+                "avg_bytes": total // samples,
+                "max_bytes": largest,
+            }
+            for name, (samples, total, largest) in table.items()
+        ]
+        return sorted(rows, key=lambda row: row["avg_bytes"], reverse=True)
+
+    def report(self, limit: int = 20) -> dict:
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "requests": self.requests,
+            "samples": self.samples,
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "plugs": self.summary(self.plugs, "plug")[:limit],
+            "endpoints": self.summary(self.endpoints, "endpoint")[:limit],
+            "retained_conns": self.retained(),
+            "growth": self.growth(limit),
+        }
+
+    def stop(self):
+        """
+        Stops tracing, unless it was already on when this tracker started.
+        """
+        self.baseline = None
+        if self.started_tracing:
+            self.started_tracing = False
+            tracemalloc.stop()
@@ -1,10 +1,24 @@
+import time
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Optional
+
+from .conn import ALLOCATIONS_KEY
+
+# deadlines, executors, tracing and allocation tracking are opt-in, so their
+# modules are imported where they are used rather than here
 
 
 class Plug(ABC):
     plugs: List["Plug"] = []
 
+    # set blocking to run a synchronous call(conn) in an executor pool
+    blocking: bool = False
+    blocking_pool: str = "default"
+    blocking_timeout: Optional[float] = None
+
+    # seconds the plug and its plugs may take before responding 504
+    request_timeout: Optional[float] = None
+
     def __init__(self):
         pass
 
@@ -13,8 +27,63 @@ class Plug(ABC):
         "abstract call"
 
     async def __call__(self, conn):
+        if (
+            conn.span is None
+            and conn.plug_timings is None
+            and ALLOCATIONS_KEY not in conn.private
+        ):
+            return await self.call_plug(conn)
+        return await self.call_instrumented(conn)
+
+    async def call_instrumented(self, conn):
+        timing = allocation = None
+        if conn.plug_timings is not None:
+            timing = [type(self).__name__, time.perf_counter(), None]
+            conn.plug_timings.append(timing)
+        # set by the adapter's AllocationTracker on sampled requests
+        allocations = conn.private.get(ALLOCATIONS_KEY)
+        if allocations is not None:
+            from .memory import traced_memory  # pylint: disable=import-outside-toplevel
+
+            allocation = [type(self).__name__, traced_memory(), None]
+            allocations.append(allocation)
+        try:
+            if conn.span is not None:
+                from .tracing import traced  # pylint: disable=import-outside-toplevel
+
+                return await traced(conn, type(self).__name__, self.call_plug, conn)
+            return await self.call_plug(conn)
+        finally:
+            if timing is not None:
+                timing[2] = time.perf_counter()
+            if allocation is not None:
+                allocation[2] = traced_memory()
+
+    async def call_plug(self, conn):
+        if self.request_timeout is not None:
+            from .deadline import (  # pylint: disable=import-outside-toplevel
+                call_with_deadline,
+            )
+
+            conn.set_timeout(self.request_timeout)
+            return await call_with_deadline(conn, self.run_pipeline)
+        return await self.run_pipeline(conn)
+
+    async def run_pipeline(self, conn):
         for plug in self.plugs:
             await plug(conn)
             if conn.halted:
                 return conn
+        if self.blocking:
+            from .executor import (  # pylint: disable=import-outside-toplevel
+                run_blocking,
+            )
+
+            return await run_blocking(
+                conn,
+                self.call,
+                conn,
+                pool=self.blocking_pool,
+                timeout=self.blocking_timeout,
+            )
         return await self.call(conn)
@@ -0,0 +1,393 @@
+import asyncio
+import importlib
+import os
+import random
+import signal
+import socket
+import time
+from typing import Dict, Optional
+
+from .exception import PythonPlugRuntimeError
+
+
+def import_from_string(path: str):
+    """
+    Imports ``"package.module:attribute"``.
+    """
+    module_name, _, attribute = path.partition(":")
+    if not module_name or not attribute:
+        raise PythonPlugRuntimeError(f"Expecting 'module:attribute', got {path!r}")
+    obj = importlib.import_module(module_name)
+    for name in attribute.split("."):
+        obj = getattr(obj, name)
+    return obj
+
+
+def current_rss_kib() -> int:
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        import resource  # pylint: disable=import-outside-toplevel
+
+        # peak, not current, but the best we have without /proc
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def bind_socket(
+    host: str, port: int, reuse_port: bool = False, backlog: Optional[int] = 2048
+):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        if not hasattr(socket, "SO_REUSEPORT"):
+            raise PythonPlugRuntimeError("SO_REUSEPORT is not supported here")
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    if backlog is not None:
+        sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class RecyclingApp:
+    """
+    ASGI 3 wrapper that asks the worker's server to stop gracefully once the
+    worker has served ``max_requests`` requests or grown past ``max_rss_kib``.
+    """
+
+    def __init__(
+        self,
+        app,
+        stop,
+        *,
+        max_requests: Optional[int] = None,
+        max_rss_kib: Optional[int] = None,
+        rss_check_interval: int = 100,
+    ):
+        self.app = app
+        self.stop = stop
+        self.max_requests = max_requests
+        self.max_rss_kib = max_rss_kib
+        self.rss_check_interval = rss_check_interval
+        self.requests = 0
+        self.recycling = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "lifespan" and not self.recycling:
+            self.requests += 1
+            if self.should_recycle():
+                self.recycling = True
+                self.stop()
+        return await self.app(scope, receive, send)
+
+    def should_recycle(self) -> bool:
+        if self.max_requests and self.requests >= self.max_requests:
+            return True
+        return bool(
+            self.max_rss_kib
+            and self.requests % self.rss_check_interval == 0
+            and current_rss_kib() > self.max_rss_kib
+        )
+
+
+def _require(package: str):
+    try:
+        return importlib.import_module(package)
+    except ImportError as exc:
+        raise PythonPlugRuntimeError(
+            f"The {package} server is not installed, try: pip install {package}"
+        ) from exc
+
+
+class UvicornRunner:
+    def __init__(self, app, sock, **options):
+        uvicorn = _require("uvicorn")
+        self.server = uvicorn.Server(uvicorn.Config(app, **options))
+        self.sock = sock
+
+    def run(self):
+        self.server.run(sockets=[self.sock])
+
+    def stop(self):
+        self.server.should_exit = True
+
+
+class HypercornRunner:
+    def __init__(self, app, sock, **options):
+        _require("hypercorn")
+        self.config = importlib.import_module("hypercorn.config").Config()
+        for key, value in options.items():
+            setattr(self.config, key, value)
+        self.config.bind = [f"fd://{sock.fileno()}"]
+        self.app = app
+        self.shutdown: Optional[asyncio.Event] = None
+
+    def run(self):
+        serve = importlib.import_module("hypercorn.asyncio").serve
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self.shutdown = asyncio.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, self.stop)
+        loop.run_until_complete(
+            serve(self.app, self.config, shutdown_trigger=self.shutdown.wait)
+        )
+        loop.close()
+
+    def stop(self):
+        self.shutdown.set()
+
+
+SERVERS = {"uvicorn": UvicornRunner, "hypercorn": HypercornRunner}
+
+
+class Worker:  # pylint: disable=too-few-public-methods
+    def __init__(self, pid: int, generation: int):
+        self.pid = pid
+        self.generation = generation
+        self.started = time.monotonic()
+        self.stopping = False
+
+
+class SupervisorConfig:  # pylint: disable=too-few-public-methods
+    """
+    Options of a ``Supervisor``. ``app`` is the ``module:attribute`` to
+    serve; keyword arguments override the defaults below.
+
+    A worker exiting with an error within ``min_uptime`` seconds of its
+    start counts as a crash. Consecutive crashes delay the next spawn, from
+    half a second doubling up to ``max_backoff`` seconds, so an app failing
+    on import does not make the supervisor fork in a loop.
+    """
+
+    host = "127.0.0.1"
+    port = 8000
+    workers = 1
+    server = "uvicorn"
+    server_options: Optional[dict] = None
+    preload = True
+    reuse_port = False
+    max_requests: Optional[int] = None
+    max_requests_jitter = 0
+    max_rss_kib: Optional[int] = None
+    graceful_timeout = 30.0
+    reload_delay = 1.0
+    min_uptime = 5.0
+    max_backoff = 30.0
+
+    def __init__(self, app: str, **options):
+        self.app = app
+        for key, value in options.items():
+            if not hasattr(SupervisorConfig, key):
+                raise TypeError(f"Unknown supervisor option: {key}")
+            setattr(self, key, value)
+
+
+class Supervisor:  # pylint: disable=too-many-instance-attributes
+    """
+    Pre-forking process manager, configured with a ``SupervisorConfig``.
+    The app is imported once in the supervisor (when ``preload`` is set) so
+    workers share its memory copy-on-write, and all workers accept on one
+    listening socket: either inherited from the supervisor or, with
+    ``reuse_port``, bound by each worker with ``SO_REUSEPORT``.
+
+    Signals: ``SIGHUP`` starts a new generation of workers and then stops the
+    old one gracefully; ``SIGTERM``/``SIGINT`` stop all workers gracefully;
+    ``SIGTTIN``/``SIGTTOU`` add or remove a worker. Code is only re-imported
+    on reload when ``preload`` is off.
+
+    Reloads and recycling are only seamless with the inherited socket: with
+    ``reuse_port``, connections queued on a worker's socket are dropped when
+    the worker exits.
+    """
+
+    def __init__(self, config: SupervisorConfig):
+        self.config = config
+        self.port = config.port
+        self.num_workers = config.workers
+        server = config.server
+        self.runner_class = (
+            import_from_string(server) if ":" in server else SERVERS[server]
+        )
+
+        self.app = None
+        self.sock: Optional[socket.socket] = None
+        self.workers: Dict[int, Worker] = {}
+        self.generation = 0
+        self.crashes = 0
+        self.spawn_after = 0.0
+        self._signals = []
+
+    def run(self):
+        config = self.config
+        if config.preload:
+            self.app = import_from_string(config.app)
+        # with reuse_port the supervisor only binds, so that the port stays
+        # reserved and port=0 resolves to the same port for every worker
+        self.sock = bind_socket(
+            config.host,
+            self.port,
+            reuse_port=config.reuse_port,
+            backlog=None if config.reuse_port else 2048,
+        )
+        self.port = self.sock.getsockname()[1]
+        for signum in (
+            signal.SIGTERM,
+            signal.SIGINT,
+            signal.SIGHUP,
+            signal.SIGTTIN,
+            signal.SIGTTOU,
+        ):
+            signal.signal(signum, self._on_signal)
+        try:
+            self._loop()
+        finally:
+            self.sock.close()
+
+    def _on_signal(self, signum, frame):  # pylint: disable=unused-argument
+        self._signals.append(signum)
+
+    def _loop(self):
+        self._spawn_missing()
+        while True:
+            while self._signals:
+                signum = self._signals.pop(0)
+                if signum in (signal.SIGTERM, signal.SIGINT):
+                    self.stop()
+                    return
+                if signum == signal.SIGHUP:
+                    self.reload()
+                elif signum == signal.SIGTTIN:
+                    self.num_workers += 1
+                elif signum == signal.SIGTTOU and self.num_workers > 1:
+                    self.num_workers -= 1
+                    self._stop_workers(self._current_workers()[-1:])
+            self._reap()
+            self._spawn_missing()
+            time.sleep(0.1)
+
+    def _current_workers(self):
+        return [
+            worker
+            for worker in self.workers.values()
+            if worker.generation == self.generation and not worker.stopping
+        ]
+
+    def _spawn_missing(self):
+        if time.monotonic() < self.spawn_after:
+            return
+        for _ in range(self.num_workers - len(self._current_workers())):
+            self.spawn()
+
+    def _reap(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            worker = self.workers.pop(pid, None)
+            if worker is not None:
+                self.worker_exited(worker, status)
+
+    def worker_exited(self, worker: Worker, status: int):
+        """
+        Backs off respawning after consecutive crashes; see
+        ``SupervisorConfig``.
+        """
+        if worker.stopping:
+            return
+        uptime = time.monotonic() - worker.started
+        if status == 0 or uptime >= self.config.min_uptime:
+            self.crashes = 0
+            return
+        self.crashes += 1
+        delay = min(0.5 * 2 ** (self.crashes - 1), self.config.max_backoff)
+        self.spawn_after = time.monotonic() + delay
+
+    def _stop_workers(self, workers, signum=signal.SIGTERM):
+        for worker in workers:
+            worker.stopping = True
+            try:
+                os.kill(worker.pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def spawn(self) -> int:
+        pid = os.fork()
+        if not pid:
+            self._worker_main()
+        self.workers[pid] = Worker(pid, self.generation)
+        return pid
+
+    def _worker_main(self):
+        # worker process, never returns
+        code = 0
+        try:
+            self._run_worker()
+        except BaseException:  # pylint: disable=broad-except
+            code = 1
+            import traceback  # pylint: disable=import-outside-toplevel
+
+            traceback.print_exc()
+        finally:
+            os._exit(code)  # pylint: disable=protected-access
+
+    def _run_worker(self):
+        for signum in (signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(signum, signal.SIG_IGN)
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, signal.SIG_DFL)
+        random.seed()
+        config = self.config
+        app = self.app if config.preload else import_from_string(config.app)
+        sock = self.sock
+        if config.reuse_port:
+            sock.close()
+            sock = bind_socket(config.host, self.port, reuse_port=True)
+        max_requests = config.max_requests
+        if max_requests and config.max_requests_jitter:
+            max_requests += random.randint(0, config.max_requests_jitter)
+        runner = None
+
+        def stop():
+            runner.stop()
+
+        if max_requests or config.max_rss_kib:
+            app = RecyclingApp(
+                app, stop, max_requests=max_requests, max_rss_kib=config.max_rss_kib
+            )
+        runner = self.runner_class(app, sock, **(config.server_options or {}))
+        runner.run()
+
+    def reload(self):
+        """
+        Starts a new generation of workers, then gracefully stops the old one.
+        The shared socket keeps accepting in between, so no connection is
+        refused.
+        """
+        old = [worker for worker in self.workers.values() if not worker.stopping]
+        self.generation += 1
+        # new code deserves a fresh start
+        self.crashes, self.spawn_after = 0, 0.0
+        self._spawn_missing()
+        time.sleep(self.config.reload_delay)
+        self._stop_workers(old)
+
+    def stop(self):
+        self._stop_workers(list(self.workers.values()))
+        deadline = time.monotonic() + self.config.graceful_timeout
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.05)
+        self._stop_workers(list(self.workers.values()), signal.SIGKILL)
+        while self.workers:
+            try:
+                pid, _ = os.waitpid(-1, 0)
+            except ChildProcessError:
+                break
+            self.workers.pop(pid, None)
@@ -0,0 +1,334 @@
+"""
+In-process client for tests and benchmarks. Drives an ASGI app (usually an
+``ASGIAdapter``) with explicit ``receive`` messages and records every
+message it sends, without a server, sockets or third party packages:
+
+    client = Client(ASGIAdapter(App()))
+    exchange = client.run(client.post("/upload", [b"part 1", b"part 2"]))
+    assert exchange.status == 200
+
+Nothing waits on the clock: the app only gets the messages it is given, and
+tests step a long lived exchange forward with ``Exchange.feed`` and
+``Exchange.wait_until``. Thousands of exchanges can run concurrently in one
+loop with ``Client.gather``.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Iterable, List, Optional, Tuple, Union
+
+from .conn import Conn
+
+Headers = Iterable[Tuple[str, str]]
+Body = Union[bytes, Iterable[bytes]]
+
+
+def http_scope(
+    method: str = "GET", path: str = "/", *, headers: Headers = (), **fields
+):
+    """
+    An HTTP scope for ``path``, which may end with a query string.
+    ``fields`` override scope keys, e.g. ``scheme`` or ``extensions``.
+    """
+    path, _, query_string = path.partition("?")
+    raw_headers = [
+        (k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers
+    ]
+    if not any(k == b"host" for k, _ in raw_headers):
+        raw_headers.insert(0, (b"host", b"testserver"))
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method.upper(),
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("latin-1"),
+        "root_path": "",
+        "query_string": query_string.encode("latin-1"),
+        "headers": raw_headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+        "extensions": {},
+        **fields,
+    }
+
+
+def websocket_scope(path: str = "/", *, headers: Headers = (), **fields) -> dict:
+    scope = http_scope("GET", path, headers=headers, scheme="ws", **fields)
+    scope["type"] = "websocket"
+    del scope["method"]
+    return scope
+
+
+def body_length(body: Body) -> int:
+    return len(body) if isinstance(body, bytes) else sum(map(len, body))
+
+
+def body_messages(body: Body = b"") -> List[dict]:
+    """
+    ``http.request`` messages carrying ``body``: one for bytes, one per
+    chunk for a list of chunks.
+    """
+    if isinstance(body, bytes):
+        return [{"type": "http.request", "body": body, "more_body": False}]
+    return [
+        {"type": "http.request", "body": chunk, "more_body": True} for chunk in body
+    ] + [{"type": "http.request", "body": b"", "more_body": False}]
+
+
+def websocket_messages(*frames: Union[str, bytes], close_code: int = 1000):
+    """
+    A WebSocket session: connect, one ``websocket.receive`` per frame, then
+    disconnect with ``close_code``.
+    """
+    messages: List[dict] = [{"type": "websocket.connect"}]
+    for frame in frames:
+        key = "bytes" if isinstance(frame, bytes) else "text"
+        messages.append({"type": "websocket.receive", key: frame})
+    messages.append({"type": "websocket.disconnect", "code": close_code})
+    return messages
+
+
+class Exchange:  # pylint: disable=too-many-instance-attributes
+    """
+    One simulated connection. ``receive`` hands out ``messages`` in order,
+    then waits for more to be given with ``feed``. Once the response is
+    complete it reports a disconnect, as a server does. Sent messages are
+    kept in ``sent`` as ``(seconds since the exchange started, message)``.
+    """
+
+    def __init__(self, scope: dict, messages: Iterable[dict] = ()):
+        self.scope = scope
+        self.pending = deque(messages)
+        self.received: List[Tuple[float, dict]] = []
+        self.sent: List[Tuple[float, dict]] = []
+        self.error: Optional[BaseException] = None
+        self.started_at = 0.0
+        self.finished_at: Optional[float] = None
+        self.complete = False
+        self._waiters: List[asyncio.Future] = []
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    async def _changed(self):
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters.append(waiter)
+        await waiter
+
+    def _notify(self):
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def feed(self, *messages: dict):
+        self.pending.extend(messages)
+        self._notify()
+
+    async def receive(self) -> dict:
+        while not self.pending:
+            await self._changed()
+        message = self.pending.popleft()
+        self.received.append((self.elapsed(), message))
+        self._notify()
+        return message
+
+    async def send(self, message: dict):
+        self.sent.append((self.elapsed(), message))
+        message_type = message["type"]
+        if (
+            message_type == "http.response.body" and not message.get("more_body")
+        ) or message_type == "websocket.close":
+            self.mark_complete()
+        self._notify()
+
+    async def wait_until(self, condition: Callable[["Exchange"], bool]):
+        """
+        Waits until ``condition(exchange)`` holds, checking it again after
+        every message the app receives or sends. Raises ``AssertionError`` if the app
+        finishes first.
+        """
+        while not condition(self):
+            if self.finished_at is not None:
+                raise AssertionError("The exchange finished before the condition")
+            await self._changed()
+
+    def mark_complete(self):
+        if not self.complete:
+            self.complete = True
+            self.release()
+
+    def release(self):
+        # a receive() waiting for more messages gets the disconnect
+        if self.scope["type"] == "websocket":
+            self.feed({"type": "websocket.disconnect", "code": 1000})
+        else:
+            self.feed({"type": "http.disconnect"})
+
+    def messages(self, message_type: str) -> List[dict]:
+        return [message for _, message in self.sent if message["type"] == message_type]
+
+    @property
+    def start(self) -> Optional[dict]:
+        starts = self.messages("http.response.start")
+        return starts[0] if starts else None
+
+    @property
+    def status(self) -> Optional[int]:
+        return self.start["status"] if self.start else None
+
+    @property
+    def headers(self) -> List[Tuple[str, str]]:
+        if self.start is None:
+            return []
+        return [
+            (k.decode("latin-1").lower(), v.decode("latin-1"))
+            for k, v in self.start.get("headers", [])
+        ]
+
+    def header(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        name = name.lower()
+        return next((v for k, v in self.headers if k == name), default)
+
+    @property
+    def body(self) -> bytes:
+        return b"".join(m.get("body", b"") for m in self.messages("http.response.body"))
+
+    @property
+    def trailers(self) -> List[Tuple[bytes, bytes]]:
+        return [
+            tuple(header)
+            for m in self.messages("http.response.trailers")
+            for header in m.get("headers", [])
+        ]
+
+    @property
+    def frames(self) -> List[Union[str, bytes]]:
+        return [
+            m.get("bytes") if m.get("bytes") is not None else m.get("text")
+            for m in self.messages("websocket.send")
+        ]
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+
+class Client:
+    """
+    Runs exchanges against ``app``. ``in_flight`` and ``max_in_flight``
+    count the exchanges running at once. Errors raised by the app are
+    re-raised unless ``raise_app_exceptions`` is off, in which case they
+    are kept on ``Exchange.error``.
+    """
+
+    def __init__(
+        self, app, *, interface: str = Conn.ASGI3, raise_app_exceptions: bool = True
+    ):
+        self.app = app
+        self.interface = interface
+        self.raise_app_exceptions = raise_app_exceptions
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def run_exchange(self, exchange: Exchange) -> Exchange:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        exchange.started_at = time.perf_counter()
+        try:
+            if self.interface == Conn.ASGI2:
+                await self.app(exchange.scope)(exchange.receive, exchange.send)
+            else:
+                await self.app(exchange.scope, exchange.receive, exchange.send)
+        except Exception as e:  # pylint: disable=broad-except
+            exchange.error = e
+            if self.raise_app_exceptions:
+                raise
+        finally:
+            self.in_flight -= 1
+            exchange.finished_at = time.perf_counter()
+            exchange.release()
+        return exchange
+
+    @staticmethod
+    def exchange(
+        method: str,
+        path: str,
+        *,
+        body: Body = b"",
+        messages: Optional[Iterable[dict]] = None,
+        **scope_fields,
+    ) -> Exchange:
+        """
+        Builds an HTTP exchange to run with ``run_exchange``. ``messages``
+        replaces the ``receive`` messages generated from ``body``, e.g. to
+        disconnect half way through it; ``scope_fields`` (``headers``...)
+        go to ``http_scope``.
+        """
+        headers = list(scope_fields.pop("headers", ()))
+        if body and not any(k.lower() == "content-length" for k, _ in headers):
+            headers.append(("content-length", str(body_length(body))))
+        scope = http_scope(method, path, headers=headers, **scope_fields)
+        if messages is None:
+            messages = body_messages(body)
+        return Exchange(scope, messages)
+
+    async def request(self, method: str, path: str, **kwargs) -> Exchange:
+        """
+        Sends an HTTP request; ``kwargs`` are those of ``exchange``.
+        """
+        return await self.run_exchange(self.exchange(method, path, **kwargs))
+
+    async def get(self, path: str, **kwargs) -> Exchange:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, body: Body = b"", **kwargs) -> Exchange:
+        return await self.request("POST", path, body=body, **kwargs)
+
+    async def websocket(
+        self,
+        path: str,
+        frames: Iterable[Union[str, bytes]] = (),
+        *,
+        messages: Optional[Iterable[dict]] = None,
+        close_code: int = 1000,
+        **scope_fields,
+    ) -> Exchange:
+        scope = websocket_scope(path, **scope_fields)
+        if messages is None:
+            messages = websocket_messages(*frames, close_code=close_code)
+        return await self.run_exchange(Exchange(scope, messages))
+
+    async def gather(self, exchanges, concurrency: Optional[int] = None) -> list:
+        """
+        Awaits the ``exchanges`` coroutines, at most ``concurrency`` at a
+        time, and returns their results in order.
+        """
+        if concurrency is None:
+            return await asyncio.gather(*exchanges)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited(exchange):
+            async with semaphore:
+                return await exchange
+
+        return await asyncio.gather(*(limited(exchange) for exchange in exchanges))
+
+    def run(self, coroutine):
+        """
+        Runs ``coroutine`` to completion on the client's own event loop.
+        """
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(coroutine)
+
+    def close(self):
+        if self._loop is not None:
+            self._loop.close()
+            self._loop = None
@@ -0,0 +1,236 @@
+import abc
+import json
+import random
+import time
+from typing import Callable, List, Optional
+
+from .utils.batch import BatchWriter
+
+TRACEPARENT_VERSION = "00"
+
+
+def parse_traceparent(value: Optional[str]):
+    """
+    Returns ``(trace_id, parent_id, sampled)`` from a W3C ``traceparent``
+    header, or None when it is missing or malformed.
+    """
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) < 4 or parts[0] == "ff":
+        return None
+    _, trace_id, parent_id, flags = parts[:4]
+    if len(trace_id) != 32 or len(parent_id) != 16 or len(flags) != 2:
+        return None
+    try:
+        if not int(trace_id, 16) or not int(parent_id, 16):
+            return None
+        sampled = bool(int(flags, 16) & 1)
+    except ValueError:
+        return None
+    return trace_id, parent_id, sampled
+
+
+class Span:  # pylint: disable=too-many-instance-attributes
+    __slots__ = (
+        "tracer",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "name",
+        "start",
+        "end",
+        "attributes",
+        "events",
+        "error",
+    )
+
+    def __init__(
+        self, tracer, name: str, trace_id: str, parent_id: Optional[str] = None
+    ):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.attributes: dict = {}
+        self.events: List[tuple] = []
+        self.error: Optional[str] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"{TRACEPARENT_VERSION}-{self.trace_id}-{self.span_id}-01"
+
+    def child(self, name: str, **attributes) -> "Span":
+        span = Span(self.tracer, name, self.trace_id, self.span_id)
+        span.attributes.update(attributes)
+        return span
+
+    def add_event(self, name: str, **attributes):
+        self.events.append((name, time.time(), attributes))
+
+    def finish(self):
+        self.end = time.time()
+        self.tracer.export(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "end": self.end,
+            "duration_ms": ((self.end or self.start) - self.start) * 1000,
+            "attributes": self.attributes,
+            "events": [
+                {"name": name, "time": at, "attributes": attributes}
+                for name, at, attributes in self.events
+            ],
+            "error": self.error,
+        }
+
+
+async def traced(conn, name: str, fn: Callable, *args, **attributes):
+    """
+    Awaits ``fn(*args)`` inside a child span of ``conn.span``.
+    """
+    parent = conn.span
+    span = conn.span = parent.child(name, **attributes)
+    try:
+        return await fn(*args)
+    except BaseException as e:
+        span.error = repr(e)
+        raise
+    finally:
+        conn.span = parent
+        span.finish()
+
+
+class Tracer:
+    """
+    Starts a root span for every sampled request. Requests carrying a
+    ``traceparent`` header join that trace and follow its sampling flag;
+    others are sampled at ``sample_rate``. Finished spans go to ``exporter``.
+    """
+
+    def __init__(self, exporter, sample_rate: float = 1.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    def start_request(self, scope: dict, traceparent: Optional[str] = None):
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+            sampled = self.sample_rate >= 1.0 or random.random() < self.sample_rate
+        if not sampled:
+            return None
+        span = Span(self, f"{scope.get('method', 'WS')} {scope.get('path')}", trace_id)
+        span.parent_id = parent_id
+        client = scope.get("client")
+        span.attributes.update(
+            {
+                "type": scope.get("type"),
+                "method": scope.get("method"),
+                "path": scope.get("path"),
+                "scheme": scope.get("scheme"),
+                "client": client[0] if client else None,
+            }
+        )
+        return span
+
+    def export(self, span: Span):
+        self.exporter.export(span)
+
+
+class BatchExporter(abc.ABC):
+    """
+    Buffers finished spans in a bounded ``BatchWriter`` and hands them to
+    ``write_batch`` from its background thread.
+    """
+
+    def __init__(
+        self,
+        *,
+        buffer_size: int = 8192,
+        batch_size: int = 512,
+        flush_interval: float = 1.0,
+    ):
+        self.batches = BatchWriter(
+            self._write,
+            name="span-exporter",
+            buffer_size=buffer_size,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+        )
+
+    @property
+    def dropped(self) -> int:
+        return self.batches.dropped
+
+    @property
+    def exported(self) -> int:
+        return self.batches.written
+
+    def export(self, span: Span):
+        self.batches.put(span)
+
+    def _write(self, spans: List[Span]):
+        self.write_batch([span.to_dict() for span in spans])
+
+    @abc.abstractmethod
+    def write_batch(self, spans: List[dict]):
+        pass
+
+    def flush(self):
+        self.batches.flush()
+
+    def close(self):
+        self.batches.close()
+
+
+class FileExporter(BatchExporter):
+    """
+    Appends spans to ``path`` as JSON lines.
+    """
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+
+    def write_batch(self, spans: List[dict]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(span) + "\n" for span in spans))
+
+
+class CollectorExporter(BatchExporter):
+    """
+    POSTs each batch as ``{"spans": [...]}`` JSON to a collector ``url``.
+    Batches that cannot be delivered are counted in ``failed`` and dropped.
+    """
+
+    def __init__(self, url: str, *, timeout: float = 5.0, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+        self.timeout = timeout
+        self.failed = 0
+
+    def write_batch(self, spans: List[dict]):
+        # urllib.request pulls in http.client and email, keep it off import
+        import urllib.request  # pylint: disable=import-outside-toplevel
+
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({"spans": spans}).encode("utf-8"),
+            headers={"content-type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout):
+                pass
+        except OSError:
+            self.failed += 1
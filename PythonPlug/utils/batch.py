@@ -0,0 +1,81 @@
+import threading
+from collections import deque
+from typing import Any, Callable, List, Optional
+
+
+class BatchWriter:  # pylint: disable=too-many-instance-attributes
+    """
+    A bounded ring buffer drained by a background thread, which hands
+    ``write`` up to ``batch_size`` items every ``flush_interval`` seconds.
+    ``put`` only appends, so it is cheap enough for the event loop; when
+    the buffer is full the oldest items are dropped and counted in
+    ``dropped``; items of batches ``write`` raised on are counted in
+    ``failed``. The thread starts on the first ``put``.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[List[Any]], None],
+        *,
+        name: str = "batch-writer",
+        buffer_size: int = 8192,
+        batch_size: int = 512,
+        flush_interval: float = 1.0,
+    ):
+        self.write = write
+        self.name = name
+        self.buffer: deque = deque(maxlen=buffer_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def put(self, item):
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(item)
+        if self._thread is None:
+            self.start()
+
+    def start(self):
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopping.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        """
+        Writes out everything buffered so far. Called by the background
+        thread; safe to call from anywhere.
+        """
+        with self._lock:
+            while self.buffer:
+                batch = []
+                while self.buffer and len(batch) < self.batch_size:
+                    batch.append(self.buffer.popleft())
+                try:
+                    self.write(batch)
+                except Exception:  # pylint: disable=broad-except
+                    # keep the thread alive for the batches that follow
+                    self.failed += len(batch)
+                    continue
+                self.written += len(batch)
+
+    def close(self):
+        """
+        Stops the thread after a last flush. A later ``put`` starts it again.
+        """
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+        else:
+            self.flush()
@@ -0,0 +1,281 @@
+"""
+Micro-benchmarks for the request hot path.
+
+Drives ``ASGIAdapter`` directly with synthetic ``scope``/``receive``/``send``
+callables, no server or network involved, and prints the results as JSON:
+
+    python benchmarks/hot_path.py --requests 5000 --output results.json
+    python benchmarks/hot_path.py --only router send_resp
+    python benchmarks/hot_path.py --adapters ASGIAdapter ASGI3Adapter
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# pylint: disable=wrong-import-position
+from PythonPlug import ASGI3Adapter, ASGIAdapter, ConnWithWS
+from PythonPlug.contrib.plug.router_plug import PrecomputedResponse, RouterPlug
+
+
+def http_scope(path="/", method="GET", headers=None, query_string=b""):
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "root_path": "",
+        "query_string": query_string,
+        "headers": headers or [(b"host", b"bench")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+
+
+def ws_scope(path="/"):
+    scope = http_scope(path)
+    scope["type"] = "websocket"
+    del scope["method"]
+    return scope
+
+
+def make_receive(messages):
+    messages = iter(messages)
+
+    async def receive():
+        return next(messages)
+
+    return receive
+
+
+async def send(message):  # pylint: disable=unused-argument
+    pass
+
+
+def body_messages(size, chunk_size=64 * 1024):
+    body = b"x" * chunk_size
+    messages = []
+    remaining = size
+    while remaining > chunk_size:
+        messages.append({"type": "http.request", "body": body, "more_body": True})
+        remaining -= chunk_size
+    messages.append({"type": "http.request", "body": b"x" * remaining})
+    return messages
+
+
+class Case:
+    def __init__(self, name, app, scope, messages=()):
+        self.name = name
+        self.app = app
+        self.scope = scope
+        self.messages = list(messages)
+
+    async def request(self):
+        await self.app(dict(self.scope), make_receive(self.messages), send)
+
+
+def empty_plug_case(adapter):
+    async def plug(conn):
+        return conn
+
+    return Case("empty_plug", adapter(plug), http_scope())
+
+
+def router_case(adapter, routes):
+    router = RouterPlug()
+
+    async def endpoint(conn):
+        return await conn.send_resp(b"ok", halt=True)
+
+    for i in range(routes):
+        router.add_route(
+            rule_string=f"/route{i}/<int:item>", plug=endpoint, name=f"route{i}"
+        )
+    return Case(
+        f"router_{routes}",
+        adapter(router),
+        http_scope(f"/route{routes - 1}/42"),
+    )
+
+
+def conn_access_case(adapter):
+    async def plug(conn):
+        conn.req_headers.get("user-agent")
+        conn.req_cookies_dict.get("session")
+        conn.query_params.get("page")
+        return conn
+
+    headers = [
+        (b"host", b"bench"),
+        (b"user-agent", b"bench/1.0"),
+        (b"accept", b"*/*"),
+        (b"cookie", b"session=abc; theme=dark"),
+    ]
+    return Case(
+        "conn_access",
+        adapter(plug),
+        http_scope(headers=headers, query_string=b"page=2&sort=name&filter=a"),
+    )
+
+
+def send_resp_case(adapter):
+    async def plug(conn):
+        conn.put_resp_header("content-type", "text/plain")
+        return await conn.send_resp(b"hello world", halt=True)
+
+    return Case("send_resp", adapter(plug), http_scope())
+
+
+def precomputed_case(adapter, precomputed):
+    router = RouterPlug()
+    if precomputed:
+        router.route(
+            "/health",
+            response=PrecomputedResponse(b"ok", headers={"content-type": "text/plain"}),
+        )
+    else:
+
+        @router.route("/health")
+        async def health(conn):
+            conn.put_resp_header("content-type", "text/plain")
+            return await conn.send_resp(b"ok", halt=True)
+
+    name = "precomputed_route" if precomputed else "send_resp_route"
+    return Case(name, adapter(router), http_scope("/health"))
+
+
+def halt_case(adapter):
+    async def plug(conn):
+        return await conn.halt()
+
+    return Case("halt", adapter(plug), http_scope())
+
+
+def body_iter_case(adapter, size):
+    async def plug(conn):
+        async for _ in conn.body_iter():
+            pass
+        return await conn.halt()
+
+    headers = [(b"host", b"bench"), (b"content-length", str(size).encode())]
+    return Case(
+        f"body_iter_{size}",
+        adapter(plug),
+        http_scope(method="POST", headers=headers),
+        body_messages(size),
+    )
+
+
+def websocket_echo_case(adapter, frames):
+    async def plug(conn: ConnWithWS):
+        await conn.ws_accept()
+        async for message in conn.ws_iter_messages():
+            await conn.ws_send(message)
+        return conn
+
+    messages = [{"type": "websocket.connect"}]
+    messages += [{"type": "websocket.receive", "text": "ping"}] * frames
+    messages.append({"type": "websocket.disconnect", "code": 1000})
+    return Case(f"websocket_echo_{frames}", adapter(plug), ws_scope(), messages)
+
+
+ADAPTERS = {"ASGIAdapter": ASGIAdapter, "ASGI3Adapter": ASGI3Adapter}
+
+CASES = [
+    empty_plug_case,
+    lambda adapter: router_case(adapter, 10),
+    lambda adapter: router_case(adapter, 100),
+    conn_access_case,
+    send_resp_case,
+    lambda adapter: precomputed_case(adapter, False),
+    lambda adapter: precomputed_case(adapter, True),
+    halt_case,
+    lambda adapter: body_iter_case(adapter, 1024),
+    lambda adapter: body_iter_case(adapter, 64 * 1024),
+    lambda adapter: body_iter_case(adapter, 1024 * 1024),
+    lambda adapter: websocket_echo_case(adapter, 10),
+]
+
+
+async def run_requests(case, requests):
+    for _ in range(requests):
+        await case.request()
+
+
+def measure(case, requests, loop):
+    # warm up caches (werkzeug compiles rules on first bind)
+    loop.run_until_complete(run_requests(case, min(requests, 100)))
+
+    start = time.perf_counter()
+    loop.run_until_complete(run_requests(case, requests))
+    elapsed = time.perf_counter() - start
+
+    alloc_requests = max(1, requests // 10)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.clear_traces()
+    loop.run_until_complete(run_requests(case, alloc_requests))
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+    return {
+        "name": case.name,
+        "requests": requests,
+        "seconds": elapsed,
+        "requests_per_second": requests / elapsed,
+        "usec_per_request": elapsed / requests * 1e6,
+        "peak_traced_bytes": peak,
+        "retained_bytes_per_request": retained / alloc_requests,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--only", nargs="*", help="run cases whose name contains")
+    parser.add_argument(
+        "--adapters", nargs="*", choices=sorted(ADAPTERS), default=["ASGIAdapter"]
+    )
+    parser.add_argument("--output", help="write JSON to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    loop = asyncio.new_event_loop()
+    results = []
+    for adapter_name in args.adapters:
+        for factory in CASES:
+            case = factory(ADAPTERS[adapter_name])
+            if args.only and not any(name in case.name for name in args.only):
+                continue
+            result = measure(case, args.requests, loop)
+            result["adapter"] = adapter_name
+            results.append(result)
+    loop.close()
+
+    report = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Cold-start benchmark: import cost of PythonPlug modules and router build time.
+
+Every measurement runs in a fresh interpreter. Imports are measured with
+``python -X importtime``, reporting the cumulative time of each module and
+the slowest modules it pulled in; the router case times adding ``--routes``
+rules to a ``RouterPlug`` and matching the first request. Prints JSON:
+
+    python benchmarks/import_time.py --runs 10
+    python benchmarks/import_time.py --modules PythonPlug --routes 1000
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+MODULES = ["PythonPlug", "PythonPlug.contrib.plug.router_plug"]
+
+ROUTER_SCRIPT = """
+import time
+start = time.perf_counter()
+from PythonPlug.contrib.plug.router_plug import RouterPlug
+imported = time.perf_counter()
+
+async def endpoint(conn):
+    return conn
+
+router = RouterPlug()
+for i in range({routes}):
+    router.add_route(
+        rule_string="/api/resource%d/<int:id>/items/<name>" % i,
+        plug=endpoint,
+        name="route%d" % i,
+    )
+built = time.perf_counter()
+router.url_map.bind("bench").match("/api/resource0/1/items/a")
+matched = time.perf_counter()
+print(imported - start, built - imported, matched - built)
+"""
+
+
+def run_python(args):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    return subprocess.run(
+        [sys.executable] + args,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+
+
+def parse_importtime(stderr):
+    """
+    ``(name, depth, self_us, cumulative_us)`` for every line of
+    ``-X importtime`` output, in output order (children before parents).
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def subtree(entries, module):
+    for index, (name, depth, _, cumulative_us) in enumerate(entries):
+        if name == module:
+            children = []
+            for child in reversed(entries[:index]):
+                if child[1] <= depth:
+                    break
+                children.append(child)
+            return cumulative_us, children
+    return 0, []
+
+
+def measure_import(module, runs, top):
+    totals = []
+    self_times = {}
+    for _ in range(runs):
+        entries = parse_importtime(
+            run_python(["-X", "importtime", "-c", f"import {module}"]).stderr
+        )
+        total, children = subtree(entries, module)
+        totals.append(total)
+        for name, _, self_us, _ in children:
+            self_times.setdefault(name, []).append(self_us)
+    slowest = sorted(
+        ((statistics.median(times), name) for name, times in self_times.items()),
+        reverse=True,
+    )[:top]
+    return {
+        "name": f"import {module}",
+        "runs": runs,
+        "median_ms": statistics.median(totals) / 1000,
+        "min_ms": min(totals) / 1000,
+        "modules": len(self_times),
+        "slowest": [{"module": name, "self_ms": us / 1000} for us, name in slowest],
+    }
+
+
+def measure_router(routes, runs):
+    timings = [
+        [
+            float(value)
+            for value in run_python(
+                ["-c", ROUTER_SCRIPT.format(routes=routes)]
+            ).stdout.split()
+        ]
+        for _ in range(runs)
+    ]
+    imported, built, matched = (
+        statistics.median(column) * 1000 for column in zip(*timings)
+    )
+    return {
+        "name": f"router with {routes} routes",
+        "runs": runs,
+        "import_ms": imported,
+        "build_ms": built,
+        "first_match_ms": matched,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modules", nargs="*", default=MODULES)
+    parser.add_argument("--routes", type=int, default=200)
+    parser.add_argument("--top", type=int, default=10, help="slowest modules shown")
+    parser.add_argument("--output", help="write JSON to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = [measure_import(module, args.runs, args.top) for module in args.modules]
+    if args.routes:
+        results.append(measure_router(args.routes, args.runs))
+
+    report = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+Load test against an app served by a real ASGI server on loopback.
+
+Starts the server in a subprocess, drives it with concurrent keep-alive HTTP
+or WebSocket clients, and prints latency percentiles, throughput and the
+server's RSS over time as JSON:
+
+    python benchmarks/load_test.py --server uvicorn --app hello:app \\
+        --app-dir examples --path /foo/bar/ --concurrency 50 --duration 10
+    python benchmarks/load_test.py --ws --path /ws --concurrency 20
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+SERVERS = {
+    "uvicorn": ["-m", "uvicorn", "{app}", "--host", "{host}", "--port", "{port}"],
+    "hypercorn": ["-m", "hypercorn", "{app}", "--bind", "{host}:{port}"],
+    "daphne": ["-m", "daphne", "-b", "{host}", "-p", "{port}", "{app}"],
+}
+
+
+def free_port(host):
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args):
+    command = [sys.executable] + [
+        part.format(app=args.app, host=args.host, port=args.port)
+        for part in SERVERS[args.server]
+    ]
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [ROOT, os.path.abspath(args.app_dir), env.get("PYTHONPATH")])
+    )
+    return subprocess.Popen(
+        command,
+        cwd=args.app_dir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=None if args.verbose else subprocess.DEVNULL,
+    )
+
+
+async def wait_for_port(server, host, port, timeout):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+        except OSError:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with code {server.returncode}")
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"server did not listen on {host}:{port}")
+            await asyncio.sleep(0.05)
+        else:
+            writer.close()
+            return
+
+
+def process_tree(pid):
+    """pid and its descendants, read from /proc (Linux only)."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    pids, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        pids.append(current)
+        stack.extend(children.get(current, []))
+    return pids
+
+
+def rss_kib(pid):
+    total = 0
+    for child in process_tree(pid):
+        try:
+            with open(f"/proc/{child}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+        except OSError:
+            continue
+    return total
+
+
+async def sample_rss(pid, interval, samples, start):
+    if not os.path.isdir("/proc"):
+        return
+    while True:
+        samples.append({"t": time.monotonic() - start, "rss_kib": rss_kib(pid)})
+        await asyncio.sleep(interval)
+
+
+async def read_http_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+    if headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    elif "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    return status, headers.get("connection") == "close"
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.statuses = {}
+
+
+async def http_worker(args, stats, deadline, budget):
+    body = b"x" * args.body_size
+    request = (
+        f"{args.method} {args.path} HTTP/1.1\r\n"
+        f"host: {args.host}:{args.port}\r\n"
+        f"content-length: {len(body)}\r\n\r\n"
+    ).encode() + body
+    reader = writer = None
+    while time.monotonic() < deadline and budget.take():
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(args.host, args.port)
+            start = time.perf_counter()
+            writer.write(request)
+            status, close = await read_http_response(reader)
+            stats.latencies.append(time.perf_counter() - start)
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            if close:
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            stats.errors += 1
+            if writer is not None:
+                writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+def ws_frame(payload, opcode=0x1):
+    mask = os.urandom(4)
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, 0x80 | length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 0x80 | 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 0x80 | 127, length)
+    masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return header + mask + masked
+
+
+async def read_ws_frame(reader):
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        (length,) = struct.unpack("!H", await reader.readexactly(2))
+    elif length == 127:
+        (length,) = struct.unpack("!Q", await reader.readexactly(8))
+    return first & 0x0F, await reader.readexactly(length)
+
+
+async def ws_worker(args, stats, deadline, budget):
+    try:
+        reader, writer = await asyncio.open_connection(args.host, args.port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write(
+            (
+                f"GET {args.path} HTTP/1.1\r\nhost: {args.host}:{args.port}\r\n"
+                "upgrade: websocket\r\nconnection: Upgrade\r\n"
+                f"sec-websocket-key: {key}\r\nsec-websocket-version: 13\r\n\r\n"
+            ).encode()
+        )
+        head = await reader.readuntil(b"\r\n\r\n")
+        if b" 101 " not in head.split(b"\r\n", 1)[0]:
+            raise ValueError("websocket upgrade refused")
+    except (OSError, asyncio.IncompleteReadError, ValueError):
+        stats.errors += 1
+        return
+    frame = ws_frame(b"x" * args.body_size)
+    try:
+        while time.monotonic() < deadline and budget.take():
+            start = time.perf_counter()
+            writer.write(frame)
+            opcode, _ = await read_ws_frame(reader)
+            if opcode == 0x8:
+                stats.errors += 1
+                break
+            stats.latencies.append(time.perf_counter() - start)
+        writer.write(ws_frame(struct.pack("!H", 1000), opcode=0x8))
+    except (OSError, asyncio.IncompleteReadError):
+        stats.errors += 1
+    writer.close()
+
+
+class Budget:
+    def __init__(self, requests):
+        self.remaining = requests
+
+    def take(self):
+        if self.remaining is None:
+            return True
+        if self.remaining <= 0:
+            return False
+        self.remaining -= 1
+        return True
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(fraction * len(sorted_values))))
+    return sorted_values[index]
+
+
+async def run_load(args, server):
+    await wait_for_port(server, args.host, args.port, args.startup_timeout)
+    stats = Stats()
+    rss_samples = []
+    start = time.monotonic()
+    sampler = asyncio.ensure_future(
+        sample_rss(server.pid, args.rss_interval, rss_samples, start)
+    )
+    worker = ws_worker if args.ws else http_worker
+    deadline = start + args.duration
+    budget = Budget(args.requests)
+    await asyncio.gather(
+        *[worker(args, stats, deadline, budget) for _ in range(args.concurrency)]
+    )
+    elapsed = time.monotonic() - start
+    sampler.cancel()
+    if os.path.isdir("/proc"):
+        rss_samples.append({"t": elapsed, "rss_kib": rss_kib(server.pid)})
+
+    latencies = sorted(stats.latencies)
+    return {
+        "server": args.server,
+        "app": args.app,
+        "mode": "websocket" if args.ws else "http",
+        "path": args.path,
+        "concurrency": args.concurrency,
+        "body_size": args.body_size,
+        "python": platform.python_version(),
+        "seconds": elapsed,
+        "completed": len(latencies),
+        "errors": stats.errors,
+        "statuses": stats.statuses,
+        "throughput": len(latencies) / elapsed if elapsed else 0,
+        "latency_ms": {
+            name: (percentile(latencies, fraction) or 0) * 1000
+            for name, fraction in [
+                ("p50", 0.5),
+                ("p95", 0.95),
+                ("p99", 0.99),
+                ("p999", 0.999),
+                ("max", 1.0),
+            ]
+        },
+        "rss": rss_samples,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--server", choices=sorted(SERVERS), default="uvicorn")
+    parser.add_argument("--app", default="hello:app")
+    parser.add_argument("--app-dir", default=os.path.join(ROOT, "examples"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--path", default="/")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--body-size", type=int, default=0)
+    parser.add_argument("--ws", action="store_true", help="websocket echo workload")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--requests", type=int, help="stop after this many")
+    parser.add_argument("--rss-interval", type=float, default=0.5)
+    parser.add_argument("--startup-timeout", type=float, default=10.0)
+    parser.add_argument("--output", help="write JSON to this file instead of stdout")
+    parser.add_argument("--verbose", action="store_true", help="show server stderr")
+    args = parser.parse_args(argv)
+    args.port = args.port or free_port(args.host)
+
+    server = start_server(args)
+    loop = asyncio.new_event_loop()
+    try:
+        report = loop.run_until_complete(run_load(args, server))
+    finally:
+        loop.close()
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,15 +9,10 @@ from PythonPlug.contrib.plug.router_plug import RouterPlug
 from logger_plug import LoggerPlug
 
 my_router = RouterPlug()
-
-
-async def handle_static(conn: Conn):
-    await conn.call_asgi_app(
-        StaticFiles(directory=os.path.join(os.path.dirname(__file__), "./static"))
-    )
-
-
-my_router.forward("/static/foo", handle_static, change_path=True)
+my_router.mount(
+    "/static/foo",
+    StaticFiles(directory=os.path.join(os.path.dirname(__file__), "./static")),
+)
 
 
 @my_router.route("/foo/<name>/")
@@ -35,9 +30,8 @@ async def plug(conn):
 @my_router.route("/ws")
 async def ws_plug(conn: ConnWithWS):
     await conn.ws_accept()
-    async for message in conn.iter_messages():
-        await conn.send_message(message)
-    await conn.ws_close()
+    async for message in conn.ws_iter_messages():
+        await conn.ws_send(message)
     return conn
 
 
@@ -51,4 +45,4 @@ class Entry(Plug):
         return conn
 
 
-app = ASGIAdapter(Entry())
+app = my_router.install(ASGIAdapter(Entry()))
@@ -1,4 +1,11 @@
-from PythonPlug.adapter import ASGIAdapter
+import asyncio
+
+import pytest
+from starlette.testclient import TestClient
+
+from PythonPlug.adapter import ASGI3Adapter, ASGIAdapter
+from PythonPlug.conn import ConnType
+from PythonPlug.exception import PythonPlugRuntimeError
 
 
 def test_adapter():
@@ -6,3 +13,113 @@ def test_adapter():
         await conn.send_resp(b"foo", halt=True)
 
     app = ASGIAdapter(plug)
+
+
+def _run_lifespan(app, messages):
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message["type"])
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(app({"type": "lifespan"}, receive, send))
+    loop.close()
+    return sent
+
+
+def test_lifespan():
+    calls = []
+
+    async def plug(conn):
+        raise AssertionError("plug called for lifespan")
+
+    app = ASGIAdapter(plug)
+
+    @app.on_startup
+    async def first():
+        calls.append("startup 1")
+
+    @app.on_startup
+    async def second():
+        calls.append("startup 2")
+
+    @app.on_shutdown
+    async def closing():
+        calls.append("shutdown")
+
+    sent = _run_lifespan(
+        app, [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+    )
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+    assert calls == ["startup 1", "startup 2", "shutdown"]
+
+
+def test_lifespan_startup_failed():
+    app = ASGIAdapter(None)
+
+    @app.on_startup
+    async def fail():
+        raise ValueError("no database")
+
+    sent = _run_lifespan(app, [{"type": "lifespan.startup"}])
+    assert sent == ["lifespan.startup.failed"]
+
+
+def test_cleanup_runs_on_error(adapter):
+    cleaned = []
+
+    async def cleanup(conn):
+        cleaned.append(conn)
+
+    async def plug(conn):
+        conn.register_cleanup(cleanup)
+        raise ValueError()
+
+    app = adapter(plug)
+    with pytest.raises(ValueError):
+        app.test_client.get("/")
+    assert len(cleaned) == 1
+
+
+def test_asgi3_adapter():
+    cleaned = []
+
+    async def cleanup(conn):
+        cleaned.append(conn.type)
+
+    async def plug(conn):
+        conn.register_cleanup(cleanup)
+        if conn.type == ConnType.ws:
+            await conn.ws_accept()
+            await conn.ws_send(await conn.ws_receive())
+            return await conn.ws_close()
+        return await conn.send_resp(await conn.body(), halt=True)
+
+    app = ASGI3Adapter(plug)
+
+    @app.on_startup
+    async def startup():
+        cleaned.append("startup")
+
+    client = TestClient(app)
+    assert client.post("/", data=b"echo").content == b"echo"
+    with client.websocket_connect("/ws") as ws:
+        ws.send_text("ping")
+        assert ws.receive_text() == "ping"
+    assert cleaned == [ConnType.http, ConnType.ws]
+    # the app is shared between requests, so no conn is kept on it, also
+    # when requests go through the ASGIHandler path
+    assert not hasattr(app, "conn")
+    watched = ASGI3Adapter(plug, watch_disconnect=True)
+    assert TestClient(watched).post("/", data=b"echo").content == b"echo"
+    assert not hasattr(watched, "conn")
+    sent = _run_lifespan(
+        app, [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+    )
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+    assert cleaned[-1] == "startup"
+    with pytest.raises(PythonPlugRuntimeError):
+        asyncio.new_event_loop().run_until_complete(app({"type": "other"}, None, None))
@@ -1,4 +1,5 @@
 import asyncio
+from http.cookies import SimpleCookie
 from unittest.mock import MagicMock
 
 import pytest
@@ -26,6 +27,32 @@ def test_conn_query_params(app):
     assert app.conn.query_params == {"a": "foo", "b": "bar"}
 
 
+def test_conn_query_params_case_sensitive_and_cached(app):
+    app.test_client.get("/?a=foo&A=bar&a=baz")
+    params = app.conn.query_params
+    assert params.getall("a") == ["foo", "baz"]
+    assert params.get("A") == "bar"
+    assert app.conn.query_params is params
+
+
+def test_conn_query_param_scan():
+    conn = Conn(scope={"query_string": b"a=1&b%20c=x+y&empty=&flag=on&n=oops&a=2"})
+    assert conn.query_param("a") == "1"
+    assert conn.query_param("b c") == "x y"
+    assert conn.query_param("empty") is None
+    assert conn.query_param("missing", "default") == "default"
+    assert conn._query_params is None
+    assert conn.query_int("a") == 1
+    assert conn.query_int("missing", 3) == 3
+    assert conn.query_bool("flag") is True
+    assert conn.query_bool("missing") is False
+    assert conn.query_list("a") == ["1", "2"]
+    with pytest.raises(HTTPRequestError):
+        conn.query_int("n")
+    with pytest.raises(HTTPRequestError):
+        conn.query_bool("n")
+
+
 def test_conn_path(app):
     app.test_client.get("/foo")
     assert app.conn.scope.get("path") == "/foo"
@@ -167,6 +194,18 @@ def test_response_cookie(adapter):
     assert set(cookies.list_paths()) == {"/", "/test"}
 
 
+def test_assign_response_cookies(adapter):
+    async def plug(conn):
+        cookies = SimpleCookie()
+        cookies["session"] = "abc"
+        conn.resp_cookies = cookies
+        await conn.halt()
+
+    app = adapter(plug)
+    app.test_client.get("/")
+    assert app.test_client.cookies.get_dict() == {"session": "abc"}
+
+
 # test exceptions
 def test_request_type_exception(echo_app):
 
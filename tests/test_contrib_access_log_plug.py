@@ -0,0 +1,68 @@
+import io
+import json
+
+from PythonPlug.contrib.plug.access_log_plug import AccessLogPlug
+from PythonPlug.contrib.plug.router_plug import RouterPlug
+from PythonPlug.plug import Plug
+
+
+def logged_app(adapter, access_log):
+    router = RouterPlug()
+
+    @router.route("/hello")
+    async def hello(conn):
+        await conn.send_resp(b"hello", halt=True)
+        return conn
+
+    @router.route("/noisy")
+    async def noisy(conn):
+        await conn.send_resp(b"", halt=True)
+        return conn
+
+    @router.route("/error")
+    async def error(conn):
+        await conn.send_resp(b"oops", 500, halt=True)
+        return conn
+
+    class App(Plug):
+        plugs = [access_log, router]
+
+        async def call(self, conn):
+            return conn
+
+    return adapter(App()).test_client
+
+
+def test_access_log(adapter):
+    output = io.StringIO()
+    access_log = AccessLogPlug(output, flush_interval=0.01)
+    client = logged_app(adapter, access_log)
+    client.get("/hello?x=1")
+    client.get("/error")
+    access_log.close()
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [r["path"] for r in records] == ["/hello", "/error"]
+    assert records[0]["query"] == "x=1"
+    assert records[0]["status"] == 200
+    assert records[0]["bytes"] == 5
+    assert records[0]["endpoint"] == "hello"
+    assert records[0]["duration_ms"] >= 0
+    assert records[1]["status"] == 500
+
+
+def test_access_log_sampling_and_drops(adapter, tmpdir):
+    path = str(tmpdir.join("access.log"))
+    access_log = AccessLogPlug(
+        path, buffer_size=2, flush_interval=60, endpoint_sample_rates={"noisy": 0}
+    )
+    client = logged_app(adapter, access_log)
+    for _ in range(5):
+        client.get("/noisy")
+    client.get("/error")
+    for _ in range(3):
+        client.get("/hello")
+    access_log.close()
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert [r["path"] for r in records] == ["/hello", "/hello"]
+    assert access_log.dropped == 2
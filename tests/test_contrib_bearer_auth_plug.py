@@ -0,0 +1,28 @@
+from PythonPlug.contrib.plug.bearer_auth_plug import BearerAuthPlug
+from PythonPlug.plug import Plug
+
+
+def guarded(adapter, **options):
+    class Admin(Plug):
+        plugs = [BearerAuthPlug(**options)]
+
+        async def call(self, conn):
+            return await conn.send_resp(b"admin", halt=True)
+
+    return adapter(Admin()).test_client
+
+
+def test_bearer_token(adapter):
+    client = guarded(adapter, token="secret")
+    res = client.get("/")
+    assert res.status_code == 401
+    assert res.headers["www-authenticate"] == "Bearer"
+    assert client.get("/", headers={"authorization": "Bearer nope"}).status_code == 403
+    res = client.get("/", headers={"authorization": "bearer secret"})
+    assert res.content == b"admin"
+
+
+def test_authorize_function(adapter):
+    client = guarded(adapter, authorize=lambda conn: "x-admin" in conn.req_headers)
+    assert client.get("/").status_code == 403
+    assert client.get("/", headers={"x-admin": "1"}).content == b"admin"
@@ -0,0 +1,146 @@
+import asyncio
+
+from PythonPlug.contrib.plug.conditional_plug import (
+    ConditionalGetPlug,
+    negotiate,
+    not_modified,
+)
+from PythonPlug.contrib.plug.router_plug import RouterPlug
+from PythonPlug.contrib.plug.sse_plug import EventBroker, SSEPlug
+from PythonPlug.plug import Plug
+from PythonPlug.testing import Client
+
+
+def conditional_app(adapter, buffer_limit=1024):
+    router = RouterPlug()
+    rendered = []
+
+    @router.route("/page")
+    async def page(conn):
+        conn.put_resp_header("last-modified", "Wed, 21 Oct 2015 07:28:00 GMT")
+        await conn.send_resp(b"hello world", halt=True)
+        return conn
+
+    @router.route("/streamed")
+    async def streamed(conn):
+        await conn.send_resp(b"hello ")
+        await conn.send_resp(b"world", halt=True)
+        return conn
+
+    @router.route("/big")
+    async def big(conn):
+        await conn.send_resp(b"x" * 600)
+        await conn.send_resp(b"y" * 600, halt=True)
+        return conn
+
+    @router.route("/versioned")
+    async def versioned(conn):
+        if await not_modified(conn, etag='"v42"'):
+            return conn
+        rendered.append(conn)
+        await conn.send_resp(b"rendered", halt=True)
+        return conn
+
+    @router.route("/negotiated")
+    async def negotiated(conn):
+        offer = negotiate(conn, ["application/json", "text/html"])
+        await conn.send_resp((offer or "none").encode(), halt=True)
+        return conn
+
+    class App(Plug):
+        plugs = [ConditionalGetPlug(buffer_limit=buffer_limit), router]
+
+        async def call(self, conn):
+            return conn
+
+    return adapter(App()), rendered
+
+
+def test_etag_and_not_modified(adapter):
+    client = conditional_app(adapter)[0].test_client
+    res = client.get("/page")
+    assert res.content == b"hello world"
+    etag = res.headers["etag"]
+    assert etag.startswith('W/"b-')
+    assert client.get("/page").headers["etag"] == etag
+
+    res = client.get("/page", headers={"if-none-match": f'"other", {etag[2:]}'})
+    assert res.status_code == 304
+    assert res.content == b""
+    assert res.headers["etag"] == etag
+
+    res = client.get("/page", headers={"if-none-match": '"other"'})
+    assert res.status_code == 200
+
+    res = client.get(
+        "/page", headers={"if-modified-since": "Wed, 21 Oct 2015 08:00:00 GMT"}
+    )
+    assert res.status_code == 304
+    res = client.get(
+        "/page", headers={"if-modified-since": "Wed, 21 Oct 2015 07:00:00 GMT"}
+    )
+    assert res.status_code == 200
+
+
+def test_not_modified_sends_no_bytes(adapter):
+    app, _ = conditional_app(adapter)
+    client = app.test_client
+    etag = client.get("/page").headers["etag"]
+    assert app.conn.resp_body_length == 11
+    assert client.get("/page", headers={"if-none-match": etag}).status_code == 304
+    assert app.conn.resp_body_length == 0
+
+
+def test_streamed_and_large_bodies_pass_through(adapter):
+    client = conditional_app(adapter, buffer_limit=100)[0].test_client
+    for path in ("/streamed", "/big"):
+        res = client.get(path, headers={"if-none-match": "*"})
+        assert res.status_code == 200
+        assert "etag" not in res.headers
+    assert res.content == b"x" * 600 + b"y" * 600
+
+
+def test_event_streams_are_not_held_back(adapter):
+    broker = EventBroker()
+
+    class App(Plug):
+        plugs = [ConditionalGetPlug(), SSEPlug(broker, "news")]
+
+        async def call(self, conn):
+            return conn
+
+    client = Client(adapter(App()))
+
+    async def scenario():
+        exchange = client.exchange("GET", "/")
+        done = asyncio.ensure_future(client.run_exchange(exchange))
+        await exchange.wait_until(lambda exchange: exchange.status == 200)
+        broker.publish("news", "one")
+        await exchange.wait_until(lambda exchange: b"data: one" in exchange.body)
+        exchange.feed({"type": "http.disconnect"})
+        return await done
+
+    assert "etag" not in client.run(scenario()).start["headers"]
+
+
+def test_version_token_skips_rendering(adapter):
+    app, rendered = conditional_app(adapter)
+    client = app.test_client
+    res = client.get("/versioned")
+    assert res.headers["etag"] == '"v42"'
+    assert len(rendered) == 1
+    res = client.get("/versioned", headers={"if-none-match": 'W/"v42"'})
+    assert res.status_code == 304
+    assert len(rendered) == 1
+
+
+def test_negotiate(adapter):
+    client = conditional_app(adapter)[0].test_client
+    assert client.get("/negotiated").content == b"application/json"
+    res = client.get(
+        "/negotiated", headers={"accept": "text/*;q=0.9, application/json;q=0.5"}
+    )
+    assert res.content == b"text/html"
+    assert res.headers["vary"] == "accept"
+    res = client.get("/negotiated", headers={"accept": "image/png"})
+    assert res.content == b"none"
@@ -0,0 +1,169 @@
+import tempfile
+
+import pytest
+
+from PythonPlug.contrib.parser.form_parser import (
+    PART_BEGIN,
+    PART_DATA,
+    PART_END,
+    MultipartParser,
+    URLEncodedParser,
+    parse_form,
+    parse_options_header,
+)
+from PythonPlug.exception import HTTPRequestError, RequestBodyTooLarge
+from PythonPlug.utils.conn import send_json
+
+BODY = (
+    b"preamble\r\n"
+    b"--xyz\r\n"
+    b'Content-Disposition: form-data; name="a"\r\n'
+    b"\r\n"
+    b"1\r\n--x\r\n"
+    b"--xyz\r\n"
+    b'Content-Disposition: form-data; name="f"; filename="f.txt"\r\n'
+    b"Content-Type: text/plain\r\n"
+    b"\r\n"
+    b"\r\n--xy\r\n"
+    b"--xyz--\r\n"
+    b"epilogue"
+)
+
+
+def _collect(parser, chunks):
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    parser.close()
+    parts = []
+    for event, value in events:
+        if event == PART_BEGIN:
+            parts.append([value["content-disposition"], b""])
+        elif event == PART_DATA:
+            parts[-1][1] += value
+    assert [e for e, _ in events].count(PART_END) == len(parts)
+    return parts
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, len(BODY)])
+def test_multipart_parser_chunked(chunk_size):
+    chunks = [BODY[i : i + chunk_size] for i in range(0, len(BODY), chunk_size)]
+    parts = _collect(MultipartParser(b"xyz"), chunks)
+    assert parts == [
+        ['form-data; name="a"', b"1\r\n--x"],
+        ['form-data; name="f"; filename="f.txt"', b"\r\n--xy"],
+    ]
+
+
+def test_multipart_parser_incomplete():
+    parser = MultipartParser(b"xyz")
+    parser.feed(BODY[:40])
+    with pytest.raises(HTTPRequestError):
+        parser.close()
+
+
+def test_urlencoded_parser():
+    parser = URLEncodedParser()
+    assert parser.feed(b"a=1&b=") == [("a", "1")]
+    assert parser.feed(b"x+y&c=%41") == [("b", "x y")]
+    assert parser.close() == [("c", "A")]
+    with pytest.raises(RequestBodyTooLarge):
+        URLEncodedParser(max_field_size=3).feed(b"abcd")
+
+
+def test_parse_options_header():
+    assert parse_options_header('form-data; name="a;b"; filename="c\\"d"') == (
+        "form-data",
+        {"name": "a;b", "filename": 'c"d'},
+    )
+
+
+def test_parse_form_multipart(adapter):
+    async def plug(conn):
+        await parse_form(conn)
+        upload = conn.files["file"]
+        await send_json(
+            conn,
+            {
+                "form": dict(conn.form),
+                "filename": upload.filename,
+                "content": upload.file.read().decode(),
+                "size": upload.size,
+            },
+        )
+
+    app = adapter(plug)
+    res = app.test_client.post(
+        "/", data={"a": "1"}, files={"file": ("f.txt", b"hello" * 1000)}
+    )
+    assert res.json() == {
+        "form": {"a": "1"},
+        "filename": "f.txt",
+        "content": "hello" * 1000,
+        "size": 5000,
+    }
+    assert app.conn.http_body == b""
+
+
+def test_parse_form_on_file(adapter):
+    received = []
+
+    async def on_file(upload, chunk):
+        received.append(chunk)
+
+    async def plug(conn):
+        await parse_form(conn, on_file=on_file)
+        await conn.send_resp(b"", halt=True)
+
+    app = adapter(plug)
+    app.test_client.post("/", files={"file": ("f.txt", b"hello")})
+    assert b"".join(received) == b"hello"
+    assert received[-1] == b""
+
+
+def test_parse_form_urlencoded(adapter):
+    async def plug(conn):
+        await parse_form(conn)
+        await send_json(conn, conn.form.getall("a"))
+
+    app = adapter(plug)
+    res = app.test_client.post("/", data={"a": ["1", "2"]})
+    assert res.json() == ["1", "2"]
+
+
+def test_parse_form_limits(adapter):
+    async def plug(conn):
+        await parse_form(conn, max_part_size=10)
+
+    app = adapter(plug)
+    with pytest.raises(RequestBodyTooLarge):
+        app.test_client.post("/", files={"file": ("f.txt", b"1" * 11)})
+
+    async def plug_total(conn):
+        await parse_form(conn, max_body_size=10)
+
+    app = adapter(plug_total)
+    with pytest.raises(RequestBodyTooLarge):
+        app.test_client.post("/", data={"a": "1" * 11})
+
+
+def test_parse_form_closes_uploads_on_error(adapter, monkeypatch):
+    opened = []
+
+    def temporary_file(**kwargs):
+        opened.append(make_temporary_file(**kwargs))
+        return opened[-1]
+
+    make_temporary_file = tempfile.TemporaryFile
+    monkeypatch.setattr(tempfile, "TemporaryFile", temporary_file)
+
+    async def plug(conn):
+        await parse_form(conn, max_part_size=10)
+
+    app = adapter(plug)
+    with pytest.raises(RequestBodyTooLarge):
+        app.test_client.post(
+            "/", files={"a": ("a.txt", b"1" * 5), "b": ("b.txt", b"2" * 11)}
+        )
+    assert len(opened) == 2
+    assert all(file.closed for file in opened)
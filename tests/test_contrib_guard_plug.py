@@ -1,4 +1,17 @@
-from PythonPlug.contrib.plug.guard_plug import GuardPlug
+import pytest
+
+from PythonPlug.contrib.plug.guard_plug import (
+    GuardPlug,
+    Predicate,
+    header_is,
+    host_is,
+    is_http,
+    is_websocket,
+    method_is,
+    path_is,
+    path_prefix,
+)
+from PythonPlug.plug import Plug
 
 
 def test_guard_plug(adapter):
@@ -13,3 +26,102 @@ def test_guard_plug(adapter):
     app = adapter(guard)
     res = app.test_client.get("/foo")
     assert res.content == b"foo"
+
+
+def test_guard_plug_compiled_dispatch(adapter):
+    guard = GuardPlug()
+
+    def respond(body):
+        async def plug(conn):
+            await conn.send_resp(body, halt=True)
+            return conn
+
+        plug.__name__ = body.decode()
+        return plug
+
+    guard.case(method_is("post") & path_prefix("/admin"))(respond(b"admin post"))
+    guard.case(lambda conn: conn.scope.get("path") == "/opaque")(respond(b"opaque"))
+    guard.case(host_is("api.example.com"))(respond(b"api"))
+    guard.case(method_is("GET") & path_is("/opaque"))(respond(b"shadowed"))
+    guard.case(header_is("X-Beta", "1"))(respond(b"beta"))
+    guard.case(is_websocket())(respond(b"ws"))
+
+    class App(Plug):
+        plugs = [guard]
+
+        async def call(self, conn):
+            await conn.send_resp(b"fallback", halt=True)
+            return conn
+
+    client = adapter(App()).test_client
+    assert client.post("/admin/users").content == b"admin post"
+    assert client.get("/admin/users", headers={"x-beta": "1"}).content == b"beta"
+    # the opaque case comes first and keeps its precedence
+    assert client.get("/opaque").content == b"opaque"
+    assert client.get("/", headers={"host": "api.example.com"}).content == b"api"
+    assert client.get("/nothing").content == b"fallback"
+
+    hits = {case["plug"]: case["hits"] for case in guard.stats()}
+    assert hits == {
+        "admin post": 1,
+        "opaque": 1,
+        "api": 1,
+        "shadowed": 0,
+        "beta": 1,
+        "ws": 0,
+    }
+    assert guard.stats()[0]["case"] == "method == 'POST' & path startswith '/admin'"
+
+
+def test_guard_plug_chained_predicates(adapter):
+    guard = GuardPlug()
+
+    @guard.case(method_is("GET") & header_is("x-role", "staff") & path_is("/admin"))
+    async def admin(conn):
+        await conn.send_resp(b"admin", halt=True)
+        return conn
+
+    @guard.case(method_is("GET") & path_prefix("/public") & is_http())
+    async def public(conn):
+        await conn.send_resp(b"public", halt=True)
+        return conn
+
+    class App(Plug):
+        plugs = [guard]
+
+        async def call(self, conn):
+            await conn.send_resp(b"fallback", halt=True)
+            return conn
+
+    client = adapter(App()).test_client
+    staff = {"x-role": "staff"}
+    assert client.get("/public", headers=staff).content == b"public"
+    assert client.get("/admin", headers=staff).content == b"admin"
+    assert client.get("/admin").content == b"fallback"
+    assert client.get("/other", headers=staff).content == b"fallback"
+    assert guard.stats()[0]["case"] == (
+        "method == 'GET' & header:x-role == 'staff' & path == '/admin'"
+    )
+
+
+def test_guard_plug_cases_appended_directly(adapter):
+    guard = GuardPlug()
+
+    async def foo(conn):
+        return await conn.send_resp(b"foo", halt=True)
+
+    async def bar(conn):
+        return await conn.send_resp(b"bar", halt=True)
+
+    guard.cases.append((path_is("/foo"), foo))
+    client = adapter(guard).test_client
+    assert client.get("/foo").content == b"foo"
+    # appended after the first request
+    guard.cases.append((lambda conn: conn.scope["path"] == "/bar", bar))
+    assert client.get("/bar").content == b"bar"
+    assert [case["hits"] for case in guard.stats()] == [1, 1]
+
+
+def test_predicate_is_abstract():
+    with pytest.raises(TypeError):
+        Predicate()
@@ -1,4 +1,14 @@
-from PythonPlug.contrib.parser.json_parser import parse_json
+import json
+
+import pytest
+
+from PythonPlug.contrib.parser.json_parser import (
+    JSONArrayParser,
+    iter_json_array,
+    iter_json_lines,
+    parse_json,
+)
+from PythonPlug.exception import HTTPRequestError, RequestBodyTooLarge
 from PythonPlug.utils.conn import send_json
 
 
@@ -21,3 +31,85 @@ def test_not_json_parse(adapter):
 
     app = adapter(plug)
     app.test_client.get("/")
+
+
+def test_not_json_content_type(adapter):
+    async def plug(conn):
+        await parse_json(conn)
+        assert conn.json is None
+        await conn.send_resp(b"foo", halt=True)
+
+    app = adapter(plug)
+    app.test_client.post(
+        "/", data=b'{"foo": "bar"}', headers={"content-type": "text/plain"}
+    )
+
+
+def test_json_parse_malformed(adapter):
+    async def plug(conn):
+        try:
+            await parse_json(conn)
+        except HTTPRequestError as e:
+            await conn.send_resp(str(e).encode(), 400, halt=True)
+
+    app = adapter(plug)
+    res = app.test_client.post(
+        "/", data=b'{"foo": ', headers={"content-type": "application/json"}
+    )
+    assert res.status_code == 400
+    assert res.content.startswith(b"Malformed JSON")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 1000])
+def test_json_array_parser(chunk_size):
+    data = json.dumps(
+        [1, 'a,]\\"[', {"b": [1, 2, {"c": "}"}]}, [], None, 1.5, "é"]
+    ).encode()
+    parser = JSONArrayParser()
+    items = []
+    for i in range(0, len(data), chunk_size):
+        items.extend(parser.feed(data[i : i + chunk_size]))
+    parser.close()
+    assert items == json.loads(data)
+
+
+@pytest.mark.parametrize("data", [b"{}", b"[1,,2]", b"[1,]", b"[1, 2", b"[1] 2"])
+def test_json_array_parser_invalid(data):
+    parser = JSONArrayParser()
+    with pytest.raises(HTTPRequestError):
+        parser.feed(data)
+        parser.close()
+
+
+def test_json_array_parser_max_item_size():
+    parser = JSONArrayParser(max_item_size=10)
+    assert parser.feed(b'[1, "short", ') == [1, "short"]
+    with pytest.raises(RequestBodyTooLarge):
+        parser.feed(b'"' + b"a" * 20)
+
+
+def test_iter_json_array(adapter):
+    async def plug(conn):
+        total = 0
+        async for item in iter_json_array(conn):
+            total += item["n"]
+        await send_json(conn, total)
+
+    def body():
+        yield b"["
+        for i in range(100):
+            yield json.dumps({"n": i}).encode() + (b"," if i < 99 else b"]")
+
+    app = adapter(plug)
+    res = app.test_client.post("/", data=body())
+    assert res.json() == sum(range(100))
+    assert app.conn.http_body == b""
+
+
+def test_iter_json_lines(adapter):
+    async def plug(conn):
+        await send_json(conn, [item async for item in iter_json_lines(conn)])
+
+    app = adapter(plug)
+    res = app.test_client.post("/", data=b'{"a": 1}\n\n[2]\n"3"')
+    assert res.json() == [{"a": 1}, [2], "3"]
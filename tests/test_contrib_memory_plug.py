@@ -0,0 +1,26 @@
+from PythonPlug.contrib.plug.memory_plug import MemoryReportPlug
+from PythonPlug.contrib.plug.router_plug import RouterPlug
+from PythonPlug.memory import AllocationTracker
+
+
+def test_memory_report(adapter):
+    tracker = AllocationTracker(sample_every=1)
+    router = RouterPlug()
+    router.add_route(
+        rule_string="/memory", plug=MemoryReportPlug(tracker, token="secret")
+    )
+    app = adapter(router)
+    app.allocation_tracker = tracker
+    client = app.test_client
+    try:
+        assert client.get("/memory").status_code == 401
+        res = client.get("/memory", headers={"authorization": "Bearer nope"})
+        assert res.status_code == 403
+        res = client.get("/memory?limit=5", headers={"authorization": "Bearer secret"})
+    finally:
+        tracker.stop()
+    assert res.status_code == 200
+    report = res.json()
+    assert report["requests"] == 3
+    assert report["endpoints"][0]["endpoint"] == "MemoryReportPlug"
+    assert len(report["growth"]) <= 5
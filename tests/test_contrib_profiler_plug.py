@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+from PythonPlug.contrib.plug.profiler_plug import ProfilerPlug
+from PythonPlug.contrib.plug.router_plug import RouterPlug
+from PythonPlug.plug import Plug
+
+
+class Busy(Plug):
+    async def call(self, conn):
+        await asyncio.sleep(0.05)
+        deadline = time.monotonic() + 0.3
+        while time.monotonic() < deadline:
+            pass
+        await conn.send_resp(b"done", halt=True)
+        return conn
+
+
+def profiled_router():
+    router = RouterPlug()
+    router.add_route(rule_string="/busy", plug=Busy(), name="busy")
+    router.add_route(
+        rule_string="/profile", plug=ProfilerPlug(token="secret"), name="profile"
+    )
+    return router
+
+
+def http_scope(path, query_string=b"", headers=()):
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": query_string,
+        "headers": [(b"host", b"testserver")] + list(headers),
+    }
+
+
+async def request(app, scope):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent
+
+
+def test_profile_annotates_plugs_and_routes(adapter):
+    app = adapter(profiled_router())
+
+    async def run():
+        return await asyncio.gather(
+            request(
+                app,
+                http_scope(
+                    "/profile",
+                    b"seconds=0.3&interval_ms=2",
+                    [(b"authorization", b"Bearer secret")],
+                ),
+            ),
+            request(app, http_scope("/busy")),
+        )
+
+    profile, busy = asyncio.new_event_loop().run_until_complete(run())
+    assert busy[-2]["body"] == b"done"
+    assert profile[0]["status"] == 200
+    stacks = profile[1]["body"].decode()
+    busy_lines = [line for line in stacks.splitlines() if "plug:Busy" in line]
+    assert busy_lines
+    assert all("route:busy" in line for line in busy_lines)
+    assert "plug:RouterPlug" in busy_lines[0]
+    assert busy_lines[0].rsplit(" ", 1)[1].isdigit()
+
+
+def test_profile_requires_token(adapter):
+    client = adapter(profiled_router()).test_client
+    res = client.get("/profile")
+    assert res.status_code == 401
+    assert res.headers["www-authenticate"] == "Bearer"
+    res = client.get("/profile", headers={"authorization": "Bearer nope"})
+    assert res.status_code == 403
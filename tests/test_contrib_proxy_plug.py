@@ -0,0 +1,215 @@
+import asyncio
+import json
+import socket
+import threading
+
+import pytest
+
+from PythonPlug.contrib.plug.proxy_plug import ProxyPlug, Upstream
+from PythonPlug.contrib.plug.router_plug import RouterPlug
+
+
+class StandInUpstream:
+    """
+    Minimal keep-alive HTTP/1.1 server on its own loop and thread. Echoes the
+    request as JSON, or answers ``/chunked`` with a chunked body, ``/continue``
+    after a ``100 Continue``, ``/private`` with a hop-by-hop header and
+    ``/malformed`` with a bad content-length.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.connections = 0
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(self.handle, "127.0.0.1", 0)
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.ready.set()
+        self.loop.run_forever()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                request_line, *lines = head[:-4].decode().split("\r\n")
+                method, target, _ = request_line.split(" ")
+                headers = dict(
+                    (k.strip().lower(), v.strip())
+                    for k, _, v in (line.partition(":") for line in lines)
+                )
+                body = b""
+                if "content-length" in headers:
+                    body = await reader.readexactly(int(headers["content-length"]))
+                elif headers.get("transfer-encoding") == "chunked":
+                    while True:
+                        size = int(await reader.readuntil(b"\r\n"), 16)
+                        body += (await reader.readexactly(size + 2))[:-2]
+                        if not size:
+                            break
+                if target == "/chunked":
+                    writer.write(
+                        b"HTTP/1.1 200 OK\r\ntransfer-encoding: chunked\r\n\r\n"
+                        b"5\r\nhello\r\n6\r\n world\r\n0\r\n\r\n"
+                    )
+                    continue
+                if target == "/continue":
+                    writer.write(
+                        b"HTTP/1.1 100 Continue\r\n\r\n"
+                        b"HTTP/1.1 200 OK\r\ncontent-length: 2\r\n\r\nok"
+                    )
+                    continue
+                if target == "/private":
+                    writer.write(
+                        b"HTTP/1.1 200 OK\r\nconnection: x-hop\r\nx-hop: 1\r\n"
+                        b"x-kept: 1\r\ncontent-length: 2\r\n\r\nok"
+                    )
+                    continue
+                if target == "/malformed":
+                    writer.write(
+                        b"HTTP/1.1 200 OK\r\nx-kept: 1\r\n"
+                        b"content-length: two\r\n\r\nok"
+                    )
+                    continue
+                payload = json.dumps(
+                    {
+                        "upstream": self.name,
+                        "method": method,
+                        "target": target,
+                        "headers": headers,
+                        "body": body.decode(),
+                    }
+                ).encode()
+                writer.write(
+                    b"HTTP/1.1 201 Created\r\ncontent-type: application/json\r\n"
+                    b"x-upstream: %s\r\ncontent-length: %d\r\n\r\n%s"
+                    % (self.name.encode(), len(payload), payload)
+                )
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.server.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+@pytest.fixture
+def upstreams():
+    servers = [StandInUpstream("a"), StandInUpstream("b")]
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def mounted(adapter, proxy):
+    router = RouterPlug()
+    router.forward("/api", proxy, change_path=True)
+    return adapter(router)
+
+
+def test_proxy_forwards_and_reuses_connections(adapter, upstreams):
+    proxy = ProxyPlug([upstreams[0].url])
+    client = mounted(adapter, proxy).test_client
+    res = client.get("/api/items/1?x=1", headers={"connection": "keep-alive"})
+    assert res.status_code == 201
+    assert res.headers["x-upstream"] == "a"
+    echoed = res.json()
+    assert echoed["target"] == "/items/1?x=1"
+    assert echoed["headers"]["host"] == f"127.0.0.1:{upstreams[0].port}"
+    assert echoed["headers"]["x-forwarded-host"] == "testserver"
+    assert "connection" not in echoed["headers"]
+
+    res = client.post("/api/upload", data=b"x" * 1000)
+    assert res.json()["body"] == "x" * 1000
+    assert res.json()["method"] == "POST"
+    stats = proxy.stats()[0]
+    assert stats["connects"] == 1
+    assert stats["reuses"] == 1
+    assert upstreams[0].connections == 1
+
+
+def test_proxy_streams_chunked_responses(adapter, upstreams):
+    proxy = ProxyPlug([upstreams[0].url])
+    res = mounted(adapter, proxy).test_client.get("/api/chunked")
+    assert res.status_code == 200
+    assert res.content == b"hello world"
+    assert proxy.stats()[0]["idle"] == 1
+
+
+def test_proxy_skips_interim_responses(adapter, upstreams):
+    proxy = ProxyPlug([upstreams[0].url])
+    res = mounted(adapter, proxy).test_client.post(
+        "/api/continue", data=b"body", headers={"expect": "100-continue"}
+    )
+    assert res.status_code == 200
+    assert res.content == b"ok"
+    assert proxy.stats()[0]["idle"] == 1
+
+
+def test_proxy_drops_headers_listed_in_connection(adapter, upstreams):
+    client = mounted(adapter, ProxyPlug([upstreams[0].url])).test_client
+    res = client.get(
+        "/api/echo", headers={"connection": "keep-alive, X-Hop", "x-hop": "1"}
+    )
+    assert "x-hop" not in res.json()["headers"]
+
+    res = client.get("/api/private")
+    assert res.headers["x-kept"] == "1"
+    assert "x-hop" not in res.headers
+
+
+def test_proxy_rejects_malformed_content_length(adapter, upstreams):
+    proxy = ProxyPlug([upstreams[0].url])
+    res = mounted(adapter, proxy).test_client.get("/api/malformed")
+    assert res.status_code == 502
+    assert "x-kept" not in res.headers
+    assert proxy.stats()[0]["failures"] == 1
+
+
+def test_weighted_round_robin():
+    proxy = ProxyPlug([Upstream("a:1", weight=2), Upstream("b:1")])
+    picks = [proxy.choose().host for _ in range(6)]
+    assert picks == ["a", "b", "a", "a", "b", "a"]
+
+
+def test_least_connections():
+    first, second = Upstream("a:1"), Upstream("b:1", weight=2)
+    proxy = ProxyPlug([first, second], balance="least_connections")
+    first.active, second.active = 1, 1
+    assert proxy.choose() is second
+    second.active = 3
+    assert proxy.choose() is first
+
+
+def test_proxy_fails_over_and_marks_down(adapter, upstreams):
+    dead = Upstream(f"127.0.0.1:{closed_port()}", max_fails=1, fail_timeout=60)
+    proxy = ProxyPlug([dead, upstreams[1].url])
+    client = mounted(adapter, proxy).test_client
+    assert client.get("/api/").json()["upstream"] == "b"
+    assert not dead.available
+    client.get("/api/")
+    assert dead.stats()["requests"] == 1
+
+
+def test_proxy_bad_gateway(adapter):
+    proxy = ProxyPlug([f"127.0.0.1:{closed_port()}"])
+    assert mounted(adapter, proxy).test_client.get("/api/").status_code == 502
@@ -0,0 +1,93 @@
+from PythonPlug.contrib.plug.rate_limit_plug import (
+    MemoryBackend,
+    RateLimitPlug,
+    SharedMemoryBackend,
+)
+from PythonPlug.contrib.plug.router_plug import RouterPlug
+from PythonPlug.plug import Plug
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def limited_app(adapter, limiter):
+    class App(Plug):
+        plugs = [limiter]
+
+        async def call(self, conn):
+            await conn.send_resp(b"ok", halt=True)
+            return conn
+
+    return adapter(App()).test_client
+
+
+def test_rate_limit_by_ip(adapter):
+    clock = Clock()
+    client = limited_app(adapter, RateLimitPlug(2, 10, clock=clock))
+    assert client.get("/").status_code == 200
+    assert client.get("/").status_code == 200
+    res = client.get("/")
+    assert res.status_code == 429
+    assert res.headers["retry-after"] == "5"
+    clock.now += 5
+    assert client.get("/").status_code == 200
+    assert client.get("/").status_code == 429
+
+
+def test_rate_limit_by_header_and_burst(adapter):
+    clock = Clock()
+    limiter = RateLimitPlug(1, 1, burst=3, key="header:x-api-key", clock=clock)
+    client = limited_app(adapter, limiter)
+    for _ in range(3):
+        assert client.get("/", headers={"x-api-key": "a"}).status_code == 200
+    assert client.get("/", headers={"x-api-key": "a"}).status_code == 429
+    assert client.get("/", headers={"x-api-key": "b"}).status_code == 200
+    # no key, not limited
+    assert client.get("/").status_code == 200
+
+
+def test_rate_limit_by_endpoint(adapter):
+    router = RouterPlug()
+    clock = Clock()
+    limiter = RateLimitPlug(1, 60, key="endpoint", clock=clock)
+
+    class Limited(Plug):
+        plugs = [limiter]
+
+        async def call(self, conn):
+            await conn.send_resp(b"ok", halt=True)
+            return conn
+
+    router.add_route(rule_string="/a/<int:id>", plug=Limited(), name="a")
+    client = adapter(router).test_client
+    assert client.get("/a/1").status_code == 200
+    assert client.get("/a/2").status_code == 429
+
+
+def test_memory_backend_compaction():
+    backend = MemoryBackend(compact_interval=10)
+    assert backend.hit("a", 1, 0, 0) == 0
+    assert backend.hit("b", 30, 0, 0) == 0
+    assert backend.hit("a", 1, 0, 0.5) == 0.5
+    backend.hit("c", 1, 0, 20)
+    assert set(backend.tats) == {"b", "c"}
+
+
+def test_shared_memory_backend(tmpdir):
+    path = str(tmpdir.join("limits"))
+    # two instances over one file stand in for two workers
+    first = SharedMemoryBackend(path, slots=4, max_probe=2)
+    second = SharedMemoryBackend(path, slots=4, max_probe=2)
+    assert first.hit("client", 10, 0, 100) == 0
+    assert second.hit("client", 10, 0, 101) == 9
+    for index in range(8):
+        assert second.hit(f"other{index}", 10, 0, 100) == 0
+    # full table: the entry closest to refilled was replaced
+    assert first.hit("client", 10, 0, 102) in (0, 8)
+    first.close()
+    second.close()
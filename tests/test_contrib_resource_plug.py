@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from PythonPlug.contrib.plug.resource_plug import (
+    ResourcePlug,
+    ResourcePool,
+    ResourceRegistry,
+)
+from PythonPlug.exception import PythonPlugRuntimeError
+from PythonPlug.plug import Plug
+
+
+class Client:
+    created = 0
+
+    def __init__(self):
+        Client.created += 1
+        self.id = Client.created
+        self.closed = False
+
+
+async def close(client):
+    client.closed = True
+
+
+def test_resource_pool_reuses_and_waits():
+    pool = ResourcePool("db", Client, size=1, close=close)
+
+    async def run():
+        first = await pool.acquire()
+        waiting = asyncio.ensure_future(pool.acquire())
+        await asyncio.sleep(0)
+        assert pool.stats()["waiting"] == 1
+        await pool.release(first)
+        second = await waiting
+        assert second is first
+        await pool.release(second)
+        await pool.close()
+        with pytest.raises(PythonPlugRuntimeError):
+            await pool.acquire()
+        return first
+
+    client = asyncio.new_event_loop().run_until_complete(run())
+    stats = pool.stats()
+    assert client.closed
+    assert stats["created"] == 0
+    assert stats["checkouts"] == 2
+    assert stats["waits"] == 1
+    assert stats["max_in_use"] == 1
+
+
+def test_resource_plug(adapter):
+    registry = ResourceRegistry()
+    registry.register("db", Client, size=2, min_size=1)
+    asyncio.new_event_loop().run_until_complete(registry.startup())
+
+    class App(Plug):
+        plugs = [ResourcePlug(registry, checkout=["db"])]
+
+        async def call(self, conn):
+            assert await conn.resources.get("db") is conn.db
+            assert registry.stats()["db"]["in_use"] == 1
+            await conn.send_resp(str(conn.db.id).encode(), halt=True)
+
+    app = adapter(App())
+    ids = {app.test_client.get("/").content for _ in range(3)}
+    assert len(ids) == 1
+    stats = registry.stats()["db"]
+    assert stats["in_use"] == 0
+    assert stats["created"] == 1
+    assert stats["checkouts"] == 3
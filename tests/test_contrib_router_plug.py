@@ -1,5 +1,13 @@
-from PythonPlug.contrib.plug.router_plug import RouterPlug
+import asyncio
+
+import pytest
+
+from PythonPlug.adapter import ASGI3Adapter
+from PythonPlug.contrib.plug.router_plug import PrecomputedResponse, RouterPlug
+from PythonPlug.contrib.plug.server_timing_plug import ServerTimingPlug
+from PythonPlug.exception import PythonPlugRuntimeError
 from PythonPlug.plug import Plug
+from PythonPlug.testing import Client
 
 
 def test_router_plug(adapter):
@@ -115,3 +123,206 @@ def test_sub_route_forwarding_change_path(adapter):
 
     app = adapter(my_router)
     assert app.test_client.get("/sub/nested/foo/bar").content == b"/bar"
+
+
+def test_mount_asgi_app(adapter):
+    seen = []
+    events = []
+
+    class App:
+        async def __call__(self, scope, receive, send):
+            if scope["type"] == "lifespan":
+                while True:
+                    message = await receive()
+                    events.append(message["type"])
+                    await send({"type": message["type"] + ".complete"})
+                    if message["type"] == "lifespan.shutdown":
+                        return
+            seen.append((scope["root_path"], scope["path"]))
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"mounted"})
+
+    async def no_lifespan(scope, receive, send):
+        assert scope["type"] == "http"
+
+    sub_router = RouterPlug()
+    sub_router.mount("/app", App())
+    router = RouterPlug()
+    router.forward("/sub", sub_router)
+    router.mount("/other", no_lifespan)
+
+    client = adapter(router).test_client
+    assert client.get("/sub/app/x/y").content == b"mounted"
+    assert client.get("/sub/app").content == b"mounted"
+    assert seen == [("/sub/app", "/x/y"), ("/sub/app", "/")]
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(router.startup())
+    loop.run_until_complete(router.shutdown())
+    loop.close()
+    assert events == ["lifespan.startup", "lifespan.shutdown"]
+
+
+def test_nested_mount_keeps_prefix_and_trailers():
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append((scope["root_path"], scope["path"]))
+        await send({"type": "http.response.start", "status": 201, "headers": []})
+        await send({"type": "http.response.body", "body": b"mounted"})
+
+    inner = RouterPlug()
+    inner.mount("/app", app, lifespan=False)
+    router = RouterPlug()
+    router.forward("/api", inner, change_path=True)
+
+    async def cors(conn):
+        conn.put_resp_header("access-control-allow-origin", "*")
+        return conn
+
+    class App(Plug):
+        plugs = [ServerTimingPlug(checksum=None), cors, router]
+
+        async def call(self, conn):
+            return conn
+
+    client = Client(ASGI3Adapter(App()))
+    extensions = {"http.response.trailers": {}}
+    exchange = client.run(client.get("/api/app/x", extensions=extensions))
+    assert seen == [("/api/app", "/x")]
+    assert (exchange.status, exchange.body) == (201, b"mounted")
+    assert exchange.header("access-control-allow-origin") == "*"
+    assert exchange.start["trailers"] is True
+    assert b"total;dur=" in dict(exchange.trailers)[b"server-timing"]
+
+
+def test_mount_lifespan_failure():
+    async def failing(scope, receive, send):
+        await receive()
+        await send({"type": "lifespan.startup.failed", "message": "boom"})
+
+    router = RouterPlug()
+    router.mount("/failing", failing)
+    with pytest.raises(PythonPlugRuntimeError):
+        asyncio.new_event_loop().run_until_complete(router.startup())
+
+
+def test_precomputed_responses(adapter):
+    router = RouterPlug()
+    router.route("/robots.txt", response=b"User-agent: *\n")
+    health = router.route(
+        "/health",
+        response=PrecomputedResponse(b"{}", 200, {"content-type": "application/json"}),
+    )
+    version = {"n": 0}
+
+    async def snapshot():
+        version["n"] += 1
+        return str(version["n"]).encode(), 201, [("x-version", str(version["n"]))]
+
+    flags = router.route(
+        "/flags", response=PrecomputedResponse(refresh=snapshot, interval=60)
+    )
+
+    client = adapter(router).test_client
+    res = client.get("/robots.txt")
+    assert res.content == b"User-agent: *\n"
+    assert res.headers["content-length"] == "14"
+    start_message = health.start_message
+    res = client.get("/health")
+    assert res.headers["content-type"] == "application/json"
+    # nothing is rebuilt per request
+    assert health.start_message is start_message
+
+    asyncio.new_event_loop().run_until_complete(router.startup())
+    res = client.get("/flags")
+    assert (res.status_code, res.content) == (201, b"1")
+    flags.expires = 0
+    # the expired response is served once more while it is rebuilt
+    assert client.get("/flags").content == b"1"
+    assert client.get("/flags").content == b"2"
+    assert client.get("/flags").headers["x-version"] == "2"
+
+
+def test_precomputed_response_keeps_conn_state():
+    router = RouterPlug()
+    router.route("/health", response=b"ok")
+    router.route("/page", response=b"page", preload=["/app.css"])
+
+    async def cors(conn):
+        conn.put_resp_header("access-control-allow-origin", "*")
+        conn.put_resp_cookie("seen", "1")
+        return conn
+
+    class App(Plug):
+        plugs = [ServerTimingPlug(), cors, router]
+
+        async def call(self, conn):
+            return conn
+
+    client = Client(ASGI3Adapter(App()))
+    extensions = {"http.response.trailers": {}}
+    exchange = client.run(client.get("/health", extensions=extensions))
+    assert exchange.body == b"ok"
+    assert exchange.header("access-control-allow-origin") == "*"
+    assert exchange.header("set-cookie") == "seen=1"
+    assert exchange.header("content-length") == "2"
+    assert exchange.start["trailers"] is True
+    assert b"total;dur=" in dict(exchange.trailers)[b"server-timing"]
+
+    exchange = client.run(client.get("/page"))
+    assert exchange.header("link") == "</app.css>; rel=preload; as=style"
+    # the shared messages are left untouched
+    assert router.endpoint_to_plug["/health"].start_message["headers"] == [
+        [b"content-length", b"2"]
+    ]
+
+
+def test_route_preloads(adapter):
+    router = RouterPlug()
+
+    @router.route("/page", preload=["/app.css", ("/data", "fetch"), "/font.woff2"])
+    async def page(conn):
+        return await conn.send_resp(b"page", halt=True)
+
+    async def request(extensions):
+        sent = []
+
+        async def receive():
+            return {"type": "http.request"}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/page",
+            "query_string": b"",
+            "headers": [(b"host", b"testserver")],
+            "extensions": extensions,
+        }
+        await adapter(router)(scope, receive, send)
+        return sent
+
+    loop = asyncio.new_event_loop()
+    sent = loop.run_until_complete(request({"http.response.early_hint": {}}))
+    assert sent[0] == {
+        "type": "http.response.early_hint",
+        "links": [
+            b"</app.css>; rel=preload; as=style",
+            b"</data>; rel=preload; as=fetch; crossorigin",
+            b"</font.woff2>; rel=preload; as=font; crossorigin",
+        ],
+    }
+    assert sent[1]["type"] == "http.response.start"
+    assert (b"link", b", ".join(sent[0]["links"])) in map(tuple, sent[1]["headers"])
+
+    sent = loop.run_until_complete(request({"http.response.push": {}}))
+    assert [m.get("path") for m in sent[:3]] == ["/app.css", "/data", "/font.woff2"]
+    assert {m["type"] for m in sent[:3]} == {"http.response.push"}
+
+    res = adapter(router).test_client.get("/page")
+    assert res.content == b"page"
+    assert res.headers["link"].startswith("</app.css>; rel=preload; as=style")
+
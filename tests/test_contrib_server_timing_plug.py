@@ -0,0 +1,74 @@
+import asyncio
+import base64
+import hashlib
+
+import pytest
+
+from PythonPlug.contrib.plug.server_timing_plug import ServerTimingPlug
+from PythonPlug.exception import HTTPStateError
+from PythonPlug.plug import Plug
+
+
+class Stream(Plug):
+    async def call(self, conn):
+        await conn.start_resp()
+        await conn.send_resp(b"hello ")
+        await asyncio.sleep(0.01)
+        await conn.send_resp(b"world", halt=True)
+        return conn
+
+
+class App(Plug):
+    plugs = [ServerTimingPlug(), Stream()]
+
+    async def call(self, conn):
+        return conn
+
+
+def request(adapter, extensions):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "query_string": b"",
+        "headers": [],
+        "extensions": extensions,
+    }
+    asyncio.new_event_loop().run_until_complete(adapter(App())(scope, receive, send))
+    return sent
+
+
+def test_server_timing_trailers(adapter):
+    sent = request(adapter, {"http.response.trailers": {}})
+    start, *bodies, trailers = sent
+    assert start["trailers"] is True
+    assert [b"trailer", b"server-timing, content-digest"] in start["headers"]
+    assert b"".join(m["body"] for m in bodies) == b"hello world"
+    assert trailers["type"] == "http.response.trailers"
+    trailer_headers = dict(trailers["headers"])
+    timings = trailer_headers[b"server-timing"].decode().split(", ")
+    assert timings[0].startswith("Stream;dur=")
+    assert float(timings[0].split("=")[1]) >= 10
+    assert timings[1].startswith("total;dur=")
+    digest = base64.b64encode(hashlib.sha256(b"hello world").digest())
+    assert trailer_headers[b"content-digest"] == b"sha-256=:" + digest + b":"
+
+
+def test_server_timing_needs_trailer_support(adapter):
+    sent = request(adapter, {})
+    assert "trailers" not in sent[0]
+    assert sent[-1]["type"] == "http.response.body"
+
+
+def test_trailers_must_be_enabled(app):
+    conn = app.ConnClass(scope={"type": "http"})
+    with pytest.raises(HTTPStateError):
+        conn.put_resp_trailer("x", "y")
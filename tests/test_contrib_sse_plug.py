@@ -0,0 +1,72 @@
+import asyncio
+
+from PythonPlug.adapter import ASGIAdapter
+from PythonPlug.contrib.plug.sse_plug import EventBroker, SSEPlug, encode_event
+from PythonPlug.testing import Client
+
+
+def listen(client, headers=()):
+    exchange = client.exchange("GET", "/", headers=headers)
+    return exchange, asyncio.ensure_future(client.run_exchange(exchange))
+
+
+def has_sent(data):
+    return lambda exchange: data in exchange.body
+
+
+def test_encode_event():
+    assert encode_event("a\nb", event="update", event_id="7") == (
+        b"id: 7\nevent: update\ndata: a\ndata: b\n\n"
+    )
+    assert encode_event(b"") == b"data: \n\n"
+
+
+def test_stream_replays_and_shares_events():
+    broker = EventBroker(buffer_size=2)
+    client = Client(ASGIAdapter(SSEPlug(broker, "news", retry=500)))
+    for data in ("one", "two", "three"):
+        broker.publish("news", data)
+
+    async def scenario():
+        first, first_done = listen(client, [("last-event-id", "1")])
+        second, second_done = listen(client)
+        for exchange in (first, second):
+            await exchange.wait_until(has_sent(b"retry: 500"))
+        assert broker.stats()[0]["subscribers"] == 2
+        broker.publish("news", "four", event="update")
+        for exchange in (first, second):
+            await exchange.wait_until(has_sent(b"data: four"))
+        broker.publish("news", "five")
+        for exchange in (first, second):
+            await exchange.wait_until(has_sent(b"data: five"))
+            exchange.feed({"type": "http.disconnect"})
+        return await first_done, await second_done
+
+    first, second = client.run(scenario())
+    assert first.status == 200
+    assert first.header("content-type") == "text/event-stream; charset=utf-8"
+    assert first.body == (
+        b"retry: 500\n\n"
+        b"id: 2\ndata: two\n\nid: 3\ndata: three\n\n"
+        b"id: 4\nevent: update\ndata: four\n\nid: 5\ndata: five\n\n"
+    )
+    assert second.body.endswith(first.body[-40:])
+    assert first.messages("http.response.body")[-1]["body"] is (
+        second.messages("http.response.body")[-1]["body"]
+    )
+    assert broker.stats()[0]["subscribers"] == 0
+
+
+def test_keepalive_and_broker_close():
+    broker = EventBroker()
+    client = Client(ASGIAdapter(SSEPlug(broker, lambda conn: "ticks", keepalive=0.01)))
+
+    async def scenario():
+        exchange, done = listen(client)
+        await exchange.wait_until(has_sent(b": keepalive"))
+        broker.close()
+        return await done
+
+    exchange = client.run(scenario())
+    assert exchange.body.startswith(b": keepalive\n\n")
+    assert exchange.complete
@@ -0,0 +1,195 @@
+import asyncio
+
+import pytest
+
+from PythonPlug.adapter import ASGI3Adapter, ASGIAdapter
+from PythonPlug.conn import Conn
+from PythonPlug.contrib.plug.router_plug import RouterPlug
+from PythonPlug.exception import RequestTimeout
+from PythonPlug.plug import Plug
+from PythonPlug.testing import Client
+
+
+def test_conn_set_timeout_keeps_earliest():
+    conn = Conn(scope={})
+    assert conn.time_remaining() is None
+    conn.set_timeout(10)
+    conn.set_timeout(20)
+    assert 9 < conn.time_remaining() <= 10
+    conn.set_timeout(1)
+    assert conn.time_remaining() <= 1
+
+
+def test_plug_request_timeout(adapter):
+    class Slow(Plug):
+        request_timeout = 0.05
+
+        async def call(self, conn):
+            await asyncio.sleep(1)
+            await conn.send_resp(b"late", halt=True)
+
+    app = adapter(Slow())
+    res = app.test_client.get("/")
+    assert res.status_code == 504
+
+
+def test_plug_request_timeout_after_start(adapter):
+    class Slow(Plug):
+        request_timeout = 0.05
+
+        async def call(self, conn):
+            await conn.send_resp(b"partial")
+            await asyncio.sleep(1)
+
+    app = adapter(Slow())
+    with pytest.raises(RequestTimeout):
+        app.test_client.get("/")
+
+
+def test_inner_timeout_is_not_a_deadline(adapter):
+    class Plugged(Plug):
+        request_timeout = 10
+
+        async def call(self, conn):
+            await asyncio.wait_for(asyncio.sleep(1), 0.01)
+
+    app = adapter(Plugged())
+    with pytest.raises(asyncio.TimeoutError):
+        app.test_client.get("/")
+
+
+def test_route_timeout(adapter):
+    router = RouterPlug()
+
+    @router.route("/slow", timeout=0.05)
+    async def slow(conn):
+        await asyncio.sleep(1)
+
+    @router.route("/fast", timeout=1)
+    async def fast(conn):
+        await conn.send_resp(b"fast", halt=True)
+
+    app = adapter(router)
+    assert app.test_client.get("/slow").status_code == 504
+    assert app.test_client.get("/fast").content == b"fast"
+
+
+def test_adapter_timeout():
+    async def plug(conn):
+        await asyncio.sleep(1)
+
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    app = ASGIAdapter(plug, timeout=0.05)
+    scope = {"type": "http", "headers": []}
+    asyncio.new_event_loop().run_until_complete(app(scope, receive, send))
+    assert sent[0]["status"] == 504
+
+
+@pytest.mark.parametrize("adapter_class", [ASGIAdapter, ASGI3Adapter])
+def test_adapter_timeout_skips_websockets(adapter_class):
+    async def plug(conn):
+        await conn.send({"type": "websocket.accept"})
+        await conn.receive()
+        await asyncio.sleep(0.1)
+        await conn.send({"type": "websocket.send", "text": "late"})
+        await conn.send({"type": "websocket.close", "code": 1000})
+        return conn
+
+    client = Client(adapter_class(plug, timeout=0.05))
+    exchange = client.run(client.websocket("/", ["hello"]))
+    assert exchange.frames == ["late"]
+    assert all(m["type"].startswith("websocket.") for _, m in exchange.sent)
+
+
+def test_plug_request_timeout_closes_websocket():
+    class Slow(Plug):
+        request_timeout = 0.05
+
+        async def call(self, conn):
+            await conn.send({"type": "websocket.accept"})
+            await asyncio.sleep(1)
+
+    client = Client(ASGI3Adapter(Slow()))
+    exchange = client.run(client.websocket("/"))
+    assert [m["type"] for _, m in exchange.sent] == [
+        "websocket.accept",
+        "websocket.close",
+    ]
+    assert exchange.sent[-1][1]["code"] == 1011
+
+
+def test_watch_disconnect_cancels_plug():
+    cancelled = []
+
+    async def plug(conn):
+        body = await conn.body()
+        assert body == b"body"
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    messages = [
+        {"type": "http.request", "body": b"bo", "more_body": True},
+        {"type": "http.request", "body": b"dy"},
+        {"type": "http.disconnect"},
+    ]
+
+    async def receive():
+        await asyncio.sleep(0.01)
+        return messages.pop(0)
+
+    async def send(message):
+        pass
+
+    app = ASGIAdapter(plug, watch_disconnect=True)
+    scope = {"type": "http", "headers": []}
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(asyncio.wait_for(app(scope, receive, send), 1))
+    assert cancelled == [True]
+    assert app.conn.client_disconnected is True
+
+
+def test_watch_disconnect_cancels_plug_not_reading_body():
+    async def plug(conn):
+        await asyncio.sleep(1)
+        return await conn.send_resp(b"late", halt=True)
+
+    chunk = {"type": "http.request", "body": b"chunk", "more_body": True}
+    client = Client(ASGIAdapter(plug, watch_disconnect=True))
+    exchange = client.run(
+        client.post("/", messages=[chunk, chunk, {"type": "http.disconnect"}])
+    )
+    assert exchange.sent == []
+    assert client.app.conn.client_disconnected is True
+
+
+def test_watch_disconnect_passes_messages(echo_plug):
+    messages = [
+        {"type": "http.request", "body": b"a", "more_body": True},
+        {"type": "http.request", "body": b"b"},
+    ]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.sleep(10)
+
+    async def send(message):
+        sent.append(message)
+
+    app = ASGIAdapter(echo_plug, watch_disconnect=True)
+    scope = {"type": "http", "headers": []}
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(asyncio.wait_for(app(scope, receive, send), 1))
+    assert sent[1]["body"] == b"ab"
+    assert app.conn.client_disconnected is False
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from PythonPlug.executor import (
+    ConnSnapshot,
+    blocking,
+    configure_pool,
+    cpu_bound,
+    get_pool,
+    pool_stats,
+    shutdown_pools,
+)
+from PythonPlug.plug import Plug
+
+
+@pytest.fixture(autouse=True)
+def pools():
+    yield
+    shutdown_pools()
+
+
+@cpu_bound(with_body=True)
+def reverse(snapshot: ConnSnapshot):
+    return snapshot.body[::-1] + snapshot.path.encode()
+
+
+def test_blocking_decorator(adapter):
+    main_thread = threading.get_ident()
+
+    @blocking
+    def plug(conn):
+        assert threading.get_ident() != main_thread
+        conn.put_resp_header("x-thread", "worker")
+        return b"done"
+
+    app = adapter(plug)
+    res = app.test_client.get("/")
+    assert res.content == b"done"
+    assert res.headers["x-thread"] == "worker"
+    assert pool_stats()["default"]["completed"] == 1
+
+
+def test_blocking_plug_flag(adapter):
+    class Slow(Plug):
+        blocking = True
+        blocking_timeout = 0.05
+
+        def call(self, conn):
+            time.sleep(0.2)
+            return b"late"
+
+    app = adapter(Slow())
+    res = app.test_client.get("/")
+    assert res.status_code == 503
+    assert get_pool().stats()["timeouts"] == 1
+
+
+def test_pool_rejects_when_full(adapter):
+    pool = configure_pool("default", max_workers=1, max_queue=0)
+
+    @blocking
+    def rejected(conn):
+        return b"ok"
+
+    async def plug(conn):
+        release = threading.Event()
+        busy = asyncio.ensure_future(pool.run(release.wait, 1))
+        await asyncio.sleep(0)
+        assert pool.running == 1
+        await rejected(conn)
+        release.set()
+        await busy
+
+    app = adapter(plug)
+    res = app.test_client.get("/")
+    assert res.status_code == 503
+    assert pool.stats()["rejected"] == 1
+    assert pool.stats()["completed"] == 1
+
+
+def test_cpu_bound(adapter):
+    app = adapter(reverse)
+    res = app.test_client.post("/path", data=b"abc")
+    assert res.content == b"cba/path"
+    assert pool_stats()["process"]["kind"] == "process"
@@ -0,0 +1,100 @@
+import tracemalloc
+
+from PythonPlug.adapter import ASGIAdapter
+from PythonPlug.contrib.plug.router_plug import RouterPlug
+from PythonPlug.memory import ALLOCATIONS_KEY, AllocationTracker
+from PythonPlug.plug import Plug
+from PythonPlug.testing import Client
+
+LEAKED = []
+
+
+def tracked_client(tracker):
+    router = RouterPlug()
+
+    @router.route("/big")
+    async def big(conn):
+        conn.private["cache"] = bytearray(256 * 1024)
+        await conn.send_resp(b"big", halt=True)
+        return conn
+
+    @router.route("/leak")
+    async def leak(conn):
+        async def after_send(_):
+            return conn
+
+        conn.register_after_send(after_send)
+        LEAKED.append(after_send)
+        await conn.send_resp(b"leak", halt=True)
+        return conn
+
+    class App(Plug):
+        plugs = [router]
+
+        async def call(self, conn):
+            return conn
+
+    return Client(ASGIAdapter(App(), allocation_tracker=tracker))
+
+
+def test_allocations_per_plug_and_endpoint():
+    tracker = AllocationTracker(sample_every=2)
+    client = tracked_client(tracker)
+    try:
+        for _ in range(4):
+            assert client.run(client.get("/big")).body == b"big"
+        report = tracker.report()
+    finally:
+        tracker.stop()
+        client.close()
+    assert report["requests"] == 4
+    assert report["samples"] == 2
+    (endpoint,) = report["endpoints"]
+    assert endpoint["endpoint"] == "big"
+    assert endpoint["samples"] == 2
+    assert endpoint["avg_bytes"] >= 256 * 1024
+    plugs = {row["plug"]: row for row in report["plugs"]}
+    assert plugs["RouterPlug"]["avg_bytes"] >= 256 * 1024
+    assert plugs["App"]["samples"] == 2
+
+
+def test_retained_conns():
+    tracker = AllocationTracker(sample_every=1)
+    client = tracked_client(tracker)
+    try:
+        client.run(client.get("/leak"))
+        client.run(client.get("/big"))
+        client.run(client.get("/big"))
+        report = tracker.report()
+    finally:
+        tracker.stop()
+        client.close()
+        LEAKED.clear()
+    retained = {row["conn"]: row for row in report["retained_conns"]}
+    assert set(retained) == {"leak", "big"}
+    assert retained["leak"]["after_send_callbacks"] == 1
+    assert any(h.startswith("closure ") for h in retained["leak"]["held_by"])
+    # the adapter keeps the last conn around
+    assert retained["big"]["held_by"] == ["ASGIAdapter.conn"]
+    assert report["growth"]
+
+
+def test_tracker_leaves_other_state_alone():
+    tracker = AllocationTracker(sample_every=1)
+    seen = []
+
+    async def plug(conn):
+        seen.append((conn.plug_timings, ALLOCATIONS_KEY in conn.private))
+        await conn.send_resp(b"ok", halt=True)
+
+    client = Client(ASGIAdapter(plug, allocation_tracker=tracker))
+    tracemalloc.start()
+    try:
+        client.run(client.get("/"))
+        tracker.stop()
+        # tracing was on before the tracker, so it stays on
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+        client.close()
+    assert seen == [(None, True)]
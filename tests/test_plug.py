@@ -1,3 +1,6 @@
+import subprocess
+import sys
+
 from PythonPlug.plug import Plug
 
 
@@ -18,3 +21,14 @@ def test_plug_plugs(adapter, echo_plug):
     assert res.content == b"foo"
     res = app.test_client.get("/")
     assert res.content == b"bar"
+
+
+def test_opt_in_modules_are_not_imported_eagerly():
+    code = (
+        "import sys, PythonPlug; "
+        "print(sorted(m for m in ('asyncio', 'tracemalloc', 'json', "
+        "'PythonPlug.tracing', 'PythonPlug.memory', 'PythonPlug.deadline', "
+        "'PythonPlug.executor') if m in sys.modules))"
+    )
+    output = subprocess.check_output([sys.executable, "-c", code])
+    assert output.strip() == b"[]"
@@ -0,0 +1,142 @@
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+
+from PythonPlug.exception import PythonPlugRuntimeError
+from PythonPlug.supervisor import (
+    RecyclingApp,
+    Supervisor,
+    SupervisorConfig,
+    Worker,
+    bind_socket,
+    import_from_string,
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APP = """
+import os
+from PythonPlug import ASGIAdapter
+
+async def plug(conn):
+    await conn.send_resp(str(os.getpid()).encode(), halt=True)
+
+app = ASGIAdapter(plug)
+"""
+
+
+def test_import_from_string():
+    assert import_from_string("os.path:join") is os.path.join
+    with pytest.raises(PythonPlugRuntimeError):
+        import_from_string("os.path")
+
+
+def test_recycling_app():
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["type"])
+
+    stops = []
+    recycling = RecyclingApp(app, lambda: stops.append(1), max_requests=2)
+    loop = asyncio.new_event_loop()
+    for scope_type in ["lifespan", "http", "websocket", "http"]:
+        loop.run_until_complete(recycling({"type": scope_type}, None, None))
+    loop.close()
+    assert calls == ["lifespan", "http", "websocket", "http"]
+    assert stops == [1]
+
+
+def test_supervisor_config():
+    config = SupervisorConfig("app:app", workers=4)
+    assert (config.app, config.workers, config.port) == ("app:app", 4, 8000)
+    with pytest.raises(TypeError):
+        SupervisorConfig("app:app", wokers=4)
+
+
+def test_supervisor_backs_off_crashing_workers(monkeypatch):
+    supervisor = Supervisor(SupervisorConfig("app:app", max_backoff=2))
+    spawned = []
+    monkeypatch.setattr(supervisor, "spawn", lambda: spawned.append(1))
+    delays = []
+    for pid in range(5):
+        supervisor.worker_exited(Worker(pid, 0), 1 << 8)
+        delays.append(round(supervisor.spawn_after - time.monotonic()))
+        supervisor._spawn_missing()
+    assert delays == [0, 1, 2, 2, 2]
+    assert not spawned
+
+    # a worker that ran for a while resets the backoff
+    long_lived = Worker(5, 0)
+    long_lived.started -= 10
+    supervisor.worker_exited(long_lived, 1 << 8)
+    assert supervisor.crashes == 0
+    supervisor.spawn_after = 0
+    supervisor._spawn_missing()
+    assert spawned == [1]
+
+
+def _get(port):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=5) as res:
+        return int(res.read())
+
+
+def _start(tmp_path, *args):
+    (tmp_path / "supervised_app.py").write_text(APP)
+    sock = bind_socket("127.0.0.1", 0)
+    port = sock.getsockname()[1]
+    sock.close()
+    command = [sys.executable, "-m", "PythonPlug", "supervised_app:app"]
+    command += ["--port", str(port), "--workers", "2"] + list(args)
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    process = subprocess.Popen(command, cwd=str(tmp_path), env=env)
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            _get(port)
+            return process, port
+        except OSError:
+            if time.monotonic() > deadline:
+                process.kill()
+                raise
+            time.sleep(0.1)
+
+
+def _stop(process):
+    process.send_signal(signal.SIGTERM)
+    assert process.wait(timeout=15) == 0
+
+
+def test_supervisor_recycles_and_reloads(tmp_path):
+    pytest.importorskip("uvicorn")
+    process, port = _start(tmp_path, "--max-requests", "3", "--reload-delay", "0.5")
+    try:
+        pids = set()
+        for _ in range(20):
+            pids.add(_get(port))
+            # uvicorn notices the stop request on its next tick
+            time.sleep(0.05)
+        # two workers recycled after three requests each
+        assert len(pids) > 2
+        process.send_signal(signal.SIGHUP)
+        for _ in range(20):
+            _get(port)
+            time.sleep(0.05)
+    finally:
+        _stop(process)
+
+
+def test_supervisor_reuse_port(tmp_path):
+    pytest.importorskip("uvicorn")
+    process, port = _start(tmp_path, "--reuse-port")
+    try:
+        for _ in range(5):
+            _get(port)
+    finally:
+        _stop(process)
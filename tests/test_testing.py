@@ -0,0 +1,92 @@
+import asyncio
+
+from PythonPlug.adapter import ASGIAdapter
+from PythonPlug.exception import HTTPRequestError
+from PythonPlug.plug import Plug
+from PythonPlug.testing import Client
+
+
+class Echo(Plug):
+    async def call(self, conn):
+        chunks = [chunk async for chunk in conn.body_iter()]
+        conn.put_resp_header("x-chunks", str(len(chunks)))
+        await conn.send_resp(b"".join(chunks), halt=True)
+        return conn
+
+
+def test_chunked_body():
+    client = Client(ASGIAdapter(Echo()))
+    exchange = client.run(client.post("/", [b"x" * 4096, b"x" * 4096, b"x" * 1808]))
+    assert exchange.status == 200
+    assert exchange.body == b"x" * 10000
+    assert exchange.header("x-chunks") == "4"
+    assert exchange.header("content-length") == "10000"
+    times = [t for t, _ in exchange.sent]
+    assert times == sorted(times)
+    assert exchange.duration >= times[-1]
+
+
+def test_disconnect_mid_body():
+    client = Client(ASGIAdapter(Echo()), raise_app_exceptions=False)
+    exchange = client.exchange(
+        "POST",
+        "/",
+        messages=[{"type": "http.request", "body": b"part", "more_body": True}],
+    )
+
+    async def scenario():
+        running = asyncio.ensure_future(client.run_exchange(exchange))
+        await exchange.wait_until(lambda e: len(e.received) == 1)
+        exchange.feed({"type": "http.disconnect"})
+        return await running
+
+    client.run(scenario())
+    assert isinstance(exchange.error, HTTPRequestError)
+    assert exchange.sent == []
+    assert [m["type"] for _, m in exchange.received] == [
+        "http.request",
+        "http.disconnect",
+    ]
+
+
+def test_websocket_frames():
+    async def ws_echo(conn):
+        await conn.ws_accept()
+        async for message in conn.ws_iter_messages():
+            await conn.send({"type": "websocket.send", "text": message.upper()})
+        return conn
+
+    client = Client(ASGIAdapter(ws_echo))
+    exchange = client.run(client.websocket("/ws", ["hello", "world"]))
+    assert exchange.messages("websocket.accept")
+    assert exchange.frames == ["HELLO", "WORLD"]
+
+
+def test_many_concurrent_connections():
+    active = {"now": 0, "max": 0}
+
+    class Limited(Plug):
+        semaphore = None
+
+        async def call(self, conn):
+            if self.semaphore is None:
+                self.semaphore = asyncio.Semaphore(50)
+            async with self.semaphore:
+                active["now"] += 1
+                active["max"] = max(active["max"], active["now"])
+                await asyncio.sleep(0.001)
+                active["now"] -= 1
+            await conn.send_resp(conn.scope["path"].encode(), halt=True)
+            return conn
+
+    client = Client(ASGIAdapter(Limited()))
+    exchanges = client.run(client.gather(client.get(f"/{i}") for i in range(2000)))
+    assert [e.body for e in exchanges] == [f"/{i}".encode() for i in range(2000)]
+    assert client.max_in_flight == 2000
+    assert active["max"] == 50
+
+    exchanges = client.run(
+        client.gather((client.get("/") for _ in range(100)), concurrency=10)
+    )
+    assert all(e.status == 200 for e in exchanges)
+    client.close()
@@ -0,0 +1,112 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from starlette.testclient import TestClient
+
+from PythonPlug.adapter import ASGIAdapter
+from PythonPlug.contrib.plug.router_plug import RouterPlug
+from PythonPlug.plug import Plug
+from PythonPlug.tracing import (
+    CollectorExporter,
+    FileExporter,
+    Tracer,
+    parse_traceparent,
+)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+def traced_client(tracer):
+    router = RouterPlug()
+
+    @router.route("/hello")
+    async def hello(conn):
+        await conn.send_resp(b"hello", halt=True)
+        return conn
+
+    class App(Plug):
+        plugs = [router]
+
+        async def call(self, conn):
+            return conn
+
+    return TestClient(ASGIAdapter(App(), tracer=tracer))
+
+
+def test_parse_traceparent():
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (
+        TRACE_ID,
+        PARENT_ID,
+        True,
+    )
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00")[2] is False
+    assert parse_traceparent(f"00-{'0' * 32}-{PARENT_ID}-01") is None
+    assert parse_traceparent("00-abc-def-01") is None
+    assert parse_traceparent(None) is None
+
+
+def test_spans_exported_to_file(tmpdir):
+    path = str(tmpdir.join("spans.jsonl"))
+    exporter = FileExporter(path, flush_interval=60)
+    client = traced_client(Tracer(exporter))
+    res = client.get("/hello", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+    assert res.content == b"hello"
+    client.get("/hello", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"})
+    exporter.close()
+
+    with open(path) as f:
+        spans = {span["name"]: span for span in map(json.loads, f)}
+    assert set(spans) == {"GET /hello", "App", "RouterPlug", "route hello"}
+    root = spans["GET /hello"]
+    assert root["trace_id"] == TRACE_ID
+    assert root["parent_id"] == PARENT_ID
+    assert root["attributes"]["status"] == 200
+    assert root["attributes"]["endpoint"] == "hello"
+    assert spans["App"]["parent_id"] == root["span_id"]
+    assert spans["RouterPlug"]["parent_id"] == spans["App"]["span_id"]
+    route = spans["route hello"]
+    assert route["parent_id"] == spans["RouterPlug"]["span_id"]
+    assert [event["name"] for event in route["events"]] == [
+        "http.response.start",
+        "http.response.body",
+        "http.response.body",
+    ]
+    assert route["events"][1]["attributes"]["bytes"] == 5
+
+
+def test_spans_exported_to_collector():
+    received = []
+
+    class Collector(BaseHTTPRequestHandler):
+        def do_POST(self):  # pylint: disable=invalid-name
+            length = int(self.headers["content-length"])
+            received.append(json.loads(self.rfile.read(length)))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):  # pylint: disable=arguments-differ
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Collector)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    exporter = CollectorExporter(
+        f"http://127.0.0.1:{server.server_port}/spans", flush_interval=60
+    )
+    traced_client(Tracer(exporter)).get("/hello")
+    exporter.close()
+    server.shutdown()
+    assert len(received) == 1
+    assert len(received[0]["spans"]) == 4
+    assert exporter.failed == 0
+
+
+def test_unsampled_requests_have_no_spans(tmpdir):
+    path = str(tmpdir.join("spans.jsonl"))
+    exporter = FileExporter(path)
+    client = traced_client(Tracer(exporter, sample_rate=0))
+    assert client.get("/hello").content == b"hello"
+    exporter.close()
+    assert not tmpdir.join("spans.jsonl").exists()
@@ -0,0 +1,39 @@
+import time
+
+from PythonPlug.utils.batch import BatchWriter
+
+
+def test_batch_writer():
+    batches = []
+    writer = BatchWriter(batches.append, buffer_size=5, batch_size=2, flush_interval=60)
+    for item in range(7):
+        writer.put(item)
+    writer.close()
+    assert batches == [[2, 3], [4, 5], [6]]
+    assert (writer.dropped, writer.written) == (2, 5)
+
+    # a put after close starts the thread again
+    writer.put(7)
+    writer.close()
+    assert batches[-1] == [7]
+
+
+def test_batch_writer_survives_write_errors():
+    batches = []
+
+    def write(batch):
+        if 0 in batch:
+            raise OSError("disk full")
+        batches.append(batch)
+
+    writer = BatchWriter(write, batch_size=2, flush_interval=0.01)
+    writer.put(0)
+    while not writer.failed:
+        time.sleep(0.01)
+    assert writer._thread.is_alive()
+    writer.put(1)
+    while not writer.written:
+        time.sleep(0.01)
+    writer.close()
+    assert batches == [[1]]
+    assert (writer.failed, writer.written) == (1, 1)